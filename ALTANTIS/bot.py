@@ -7,6 +7,7 @@ from discord.ext import commands
 
 from ALTANTIS.utils.bot import bot
 from ALTANTIS.utils.consts import ADMIN_NAME, TOKEN
+from ALTANTIS.utils.engine import enabled as engine_enabled, start_engine
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -50,6 +51,8 @@ bot.add_cog(UpgradeManagement())
 bot.add_cog(Weaponry())
 
 def run_bot():
+    if engine_enabled():
+        start_engine(bot)
     print("ALTANTIS READY")
     bot.run(TOKEN)
 
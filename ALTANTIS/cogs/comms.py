@@ -1,9 +1,10 @@
 from discord.ext import commands
 
-from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN
+from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, COMMS_COOLDOWN
 from ALTANTIS.utils.bot import perform, perform_async, perform_unsafe, perform_async_unsafe, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
 from ALTANTIS.subs.state import with_sub_async
+from ALTANTIS.utils.journal import journalled
 
 class Comms(commands.Cog):
     """
@@ -31,12 +32,13 @@ async def shout_at_team(team : str, message : str) -> DiscordAction:
         return OKAY_REACT
     return await with_sub_async(team, do_shout, FAIL_REACT)
 
+@journalled
 async def broadcast(team : str, message : str) -> DiscordAction:
     async def do_broadcast(sub):
         if sub.power.activated():
             result = await sub.comms.broadcast(message)
             if result:
                 return OKAY_REACT
-            return Message("The radio is still in use! (It has a thirty second cooldown.)")
+            return Message(f"The radio is still in use! (It has a {COMMS_COOLDOWN} turn cooldown.)")
         return FAIL_REACT
     return await with_sub_async(team, do_broadcast, FAIL_REACT)
\ No newline at end of file
@@ -3,7 +3,9 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, SCIENTIST
 from ALTANTIS.utils.bot import perform, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, FAIL_REACT
-from ALTANTIS.subs.state import with_sub
+from ALTANTIS.subs.state import with_sub, get_sub
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.utils.intents import queued
 
 class Crane(commands.Cog):
     """
@@ -17,6 +19,8 @@ class Crane(commands.Cog):
         """
         await perform(drop_crane, ctx, get_team(ctx.channel))
 
+@queued(lambda team: get_sub(team) is not None, collapse=lambda team: team)
+@journalled
 def drop_crane(team : str) -> DiscordAction:
     def do_crane(sub):
         return Message(sub.inventory.drop_crane())
@@ -4,6 +4,7 @@ from ALTANTIS.utils.consts import CONTROL_ROLE, ENGINEER
 from ALTANTIS.utils.bot import perform_async, get_team
 from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT
 from ALTANTIS.subs.state import with_sub_async
+from ALTANTIS.utils.journal import journalled
 
 class Engineering(commands.Cog):
     """
@@ -35,12 +36,14 @@ class Engineering(commands.Cog):
         """
         await perform_async(give_team_puzzle, ctx, get_team(ctx.channel), "fixing")
 
+@journalled
 async def give_team_puzzle(team : str, reason : str) -> DiscordAction:
     async def do_puzzle(sub):
         await sub.puzzles.send_puzzle(reason)
         return OKAY_REACT
     return await with_sub_async(team, do_puzzle, FAIL_REACT)
 
+@journalled
 async def answer_team_puzzle(team : str, answer : str) -> DiscordAction:
     async def do_answer(sub):
         await sub.puzzles.resolve_puzzle(answer)
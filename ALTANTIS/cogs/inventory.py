@@ -6,6 +6,8 @@ from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REAC
 from ALTANTIS.utils.text import to_pair_list
 from ALTANTIS.subs.state import with_sub, with_sub_async, get_sub
 from ALTANTIS.npcs.npc import interact_in_square
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.utils.intents import queued
 
 class Inventory(commands.Cog):
     """
@@ -93,6 +95,7 @@ class Inventory(commands.Cog):
         """
         await perform_async_unsafe(take_item_from_team, ctx, get_team(ctx.channel), CURRENCY_NAME, amount)
 
+@journalled
 async def arrange_trade(team : str, partner : str, items) -> DiscordAction:
     pair_list = []
     try:
@@ -105,6 +108,7 @@ async def arrange_trade(team : str, partner : str, items) -> DiscordAction:
         return Message(await sub.inventory.begin_trade(partner_sub, pair_list))
     return Message("Didn't recognise the submarine asked for.")
 
+@journalled
 async def make_offer(team : str, items) -> DiscordAction:
     pair_list = to_pair_list(items)
     if pair_list is None:
@@ -113,16 +117,19 @@ async def make_offer(team : str, items) -> DiscordAction:
         return Message(await sub.inventory.make_offer(pair_list))
     return await with_sub_async(team, do_offer, FAIL_REACT)
 
+@journalled
 async def accept_offer(team : str) -> DiscordAction:
     async def do_accept(sub):
         return Message(await sub.inventory.accept_trade())
     return await with_sub_async(team, do_accept, FAIL_REACT)
 
+@journalled
 async def reject_offer(team : str) -> DiscordAction:
     async def do_reject(sub):
         return Message(await sub.inventory.reject_trade())
     return await with_sub_async(team, do_reject, FAIL_REACT)
 
+@journalled
 async def sub_interacts(team : str, arg) -> DiscordAction:
     async def do_interact(sub):
         message = await interact_in_square(sub, sub.movement.get_position(), arg)
@@ -131,6 +138,8 @@ async def sub_interacts(team : str, arg) -> DiscordAction:
         return Message("Nothing to report.")
     return await with_sub_async(team, do_interact, FAIL_REACT)
 
+@queued(lambda team, item, quantity: get_sub(team) is not None and quantity > 0)
+@journalled
 async def give_item_to_team(team : str, item : str, quantity : int) -> DiscordAction:
     async def do_give(sub):
         if sub.inventory.add(item, quantity):
@@ -139,6 +148,7 @@ async def give_item_to_team(team : str, item : str, quantity : int) -> DiscordAc
         return FAIL_REACT
     return await with_sub_async(team, do_give, FAIL_REACT)
 
+@journalled
 async def take_item_from_team(team : str, item : str, quantity : int) -> DiscordAction:
     async def do_take(sub):
         if sub.inventory.remove(item, quantity):
@@ -147,6 +157,7 @@ async def take_item_from_team(team : str, item : str, quantity : int) -> Discord
         return FAIL_REACT
     return await with_sub_async(team, do_take, FAIL_REACT)
 
+@journalled
 def drop_item(team : str, item : str) -> DiscordAction:
     def drop(sub):
         return Message(sub.inventory.drop(item))
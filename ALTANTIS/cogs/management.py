@@ -1,13 +1,18 @@
 import discord
+from typing import Optional
 from discord.ext import commands
 
 from ALTANTIS.utils.consts import CONTROL_ROLE
 from ALTANTIS.utils.bot import perform_unsafe, perform_async_unsafe, bot, main_loop
-from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT
+from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT, to_react
 from ALTANTIS.utils.roles import create_or_return_role
 from ALTANTIS.utils.control import init_control_notifs, init_news_notifs
+from ALTANTIS.utils.feed import start_feed, stop_feed
+from ALTANTIS.utils.engine import gateway, call, teams, restart_engine
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.utils import history
 from ALTANTIS.subs.state import add_team, get_sub
-from ALTANTIS.game import load_game, save_game
+from ALTANTIS.game import load_game, save_game, recover_game
 
 class GameManagement(commands.Cog):
     """
@@ -17,21 +22,69 @@ class GameManagement(commands.Cog):
     @commands.has_role(CONTROL_ROLE)
     async def load(self, ctx, arg, offset: int = 0):
         """
-        (CONTROL) Loads some combination of the map, state and/or npcs from file. You must specify "map", "state", "npcs" or "all" as the single argument. Also takes an optional offset, which is the number of saves to go back in time - e.g. specifying offset=2 will give you the third newest save (as 0 is the latest save).
+        (CONTROL) Loads some combination of the map, state and/or npcs from file. You must specify "map", "state", "npcs" or "all" as the single argument. Also takes an optional offset, which is the number of saves to go back in time - e.g. specifying offset=2 will give you the third newest save (as 0 is the latest save). The game only saves every CHECKPOINT_INTERVAL turns (10 by default) and on !save, so each save back is usually that many turns back. To go back to a particular turn, use !recover instead.
         """
         await perform_unsafe(load_game, ctx, arg, offset, bot)
     
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def recover(self, ctx, turn : Optional[int] = None):
+        """
+        (CONTROL) Rebuilds the game as it was at the end of turn <turn> (or as late as possible if no turn is given), by loading the last save before it and replaying everything that happened since. The main loop must be stopped first.
+        """
+        await perform_async_unsafe(recover, ctx, turn, bot, main_loop())
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def restore_sub(self, ctx, team, turn : int):
+        """
+        (CONTROL) Puts <team>'s submarine back how it was at the end of <turn>, leaving everything else alone. Needs HISTORY_DB to be set.
+        """
+        await perform_unsafe(restore_sub, ctx, team, turn, bot)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def restore_npc(self, ctx, npcid : int, turn : int):
+        """
+        (CONTROL) Puts NPC #<npcid> back how it was at the end of <turn>, bringing it back to life if need be. Needs HISTORY_DB to be set.
+        """
+        await perform_unsafe(restore_npc, ctx, npcid, turn)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def restore_region(self, ctx, x0 : int, y0 : int, x1 : int, y1 : int, turn : int):
+        """
+        (CONTROL) Puts the map from (<x0>, <y0>) to (<x1>, <y1>) inclusive back how it was at the end of <turn>. Subs and NPCs there are left alone. Needs HISTORY_DB to be set.
+        """
+        await perform_unsafe(restore_region, ctx, x0, y0, x1, y1, turn)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def sub_history(self, ctx, team, count : int = 10):
+        """
+        (CONTROL) Shows where <team>'s submarine was and how healthy it was over the last <count> turns. Needs HISTORY_DB to be set.
+        """
+        await perform_unsafe(show_sub_history, ctx, team, count)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def npc_history(self, ctx, npcid : int, count : int = 10):
+        """
+        (CONTROL) Shows where NPC #<npcid> was and how healthy it was over the last <count> turns. Needs HISTORY_DB to be set.
+        """
+        await perform_unsafe(show_npc_history, ctx, npcid, count)
+
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
     async def save(self, ctx):
         """
         (CONTROL) Saves the game. Please do not do this unless you know what you're doing.
-        The game automatically saves every turn, so that should be enough.
+        The game automatically saves every CHECKPOINT_INTERVAL turns (10 by default), and can replay the turns since, so that should be enough.
         However, this is useful if you are about to do something that might break, or if you want to save the starting state of the game without running any turns.
         I will reemphasise this, however: PLEASE DO NOT USE THIS COMMAND UNLESS YOU KNOW WHAT YOU'RE DOING.
         It may protect you from running it at the same time as the main loop, but it won't protect you from stupidity.
         """
-        if save_game():
+        if await call(save_game):
             await OKAY_REACT.do_status(ctx)
         else:
             await FAIL_REACT.do_status(ctx)
@@ -59,7 +112,7 @@ class GameManagement(commands.Cog):
         (CONTROL) Starts the main game loop, so that all submarines can act if activated.
         You should use this at the start of the game, and then only again if you have to pause the game for some reason.
         """
-        main_loop.start()
+        main_loop().start()
         await OKAY_REACT.do_status(ctx)
 
     @commands.command()
@@ -69,17 +122,35 @@ class GameManagement(commands.Cog):
         (CONTROL) Stops the main game loop, effectively pausing the game.
         You should only use this at the end of the game, or if you need to pause the game for some reason.
         """
-        main_loop.stop()
+        main_loop().stop()
         await OKAY_REACT.do_status(ctx)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def restart_engine(self, ctx):
+        """
+        (CONTROL) Restarts the process running the game, if ENGINE_PROCESS is set. The new one starts empty, so use !recover straight after. Stop the main loop first.
+        """
+        if main_loop().is_running():
+            await ctx.send("Please stop the main loop before restarting the engine.")
+            return
+        await to_react(restart_engine()).do_status(ctx)
     
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def set_speed(self, ctx, seconds : float):
+        """
+        (CONTROL) Sets the time between turns to <seconds>, without restarting the main loop. Lasts until the bot restarts.
+        """
+        await perform_unsafe(set_speed, ctx, seconds)
+
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
     async def set_alerts_channel(self, ctx):
         """
         (CONTROL) Sets up a channel for control alerts, which notify control directly of important occurrences.
         """
-        init_control_notifs(ctx.channel)
-        await OKAY_REACT.do_status(ctx)
+        await perform_unsafe(use_alerts_channel, ctx, ctx.channel)
 
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
@@ -87,9 +158,86 @@ class GameManagement(commands.Cog):
         """
         (CONTROL) Sets up a channel for news alerts, which allows the news to listen in via their bouys.
         """
-        init_news_notifs(ctx.channel)
-        await OKAY_REACT.do_status(ctx)
+        await perform_unsafe(use_news_channel, ctx, ctx.channel)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def start_feed(self, ctx, port : int = 8765):
+        """
+        (CONTROL) Starts the live map feed on this machine at http://localhost:<port>/, which control dashboards can subscribe to.
+        """
+        await perform_async_unsafe(open_feed, ctx, port)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def stop_feed(self, ctx):
+        """
+        (CONTROL) Stops the live map feed, disconnecting anyone watching it.
+        """
+        await perform_async_unsafe(close_feed, ctx)
+
+@gateway
+def set_speed(seconds : float) -> DiscordAction:
+    if seconds <= 0:
+        return FAIL_REACT
+    main_loop().change_interval(seconds=seconds)
+    return OKAY_REACT
+
+async def recover(turn : Optional[int], bot, loop) -> DiscordAction:
+    if loop.is_running():
+        return Message("Please stop the main loop before recovering.")
+    return to_react(await recover_game(turn, bot))
+
+@journalled
+def restore_sub(team : str, turn : int, bot) -> DiscordAction:
+    return to_react(history.restore_sub(team, turn, bot))
+
+@journalled
+def restore_npc(npcid : int, turn : int) -> DiscordAction:
+    return to_react(history.restore_npc(npcid, turn))
+
+@journalled
+def restore_region(x0 : int, y0 : int, x1 : int, y1 : int, turn : int) -> DiscordAction:
+    return to_react(history.restore_region(x0, y0, x1, y1, turn))
+
+def show_sub_history(team : str, count : int) -> DiscordAction:
+    rows = history.sub_history(team, count)
+    if not rows:
+        return FAIL_REACT
+    report = f"History of **{team.title()}**:\n"
+    for (turn, data) in rows:
+        power = data["power"]
+        activity = "on" if power["active"] else "off"
+        report += f"Turn {turn}: ({data['movement']['x']}, {data['movement']['y']}), {power['total_power']}/{power['total_power_max']} power, {activity}\n"
+    return Message(report)
+
+def show_npc_history(npcid : int, count : int) -> DiscordAction:
+    rows = history.npc_history(npcid, count)
+    if not rows:
+        return FAIL_REACT
+    report = f"History of NPC **#{npcid}**:\n"
+    for (turn, data) in rows:
+        report += f"Turn {turn}: {data['typename']} at ({data['x']}, {data['y']}), {data['health']} health\n"
+    return Message(report)
+
+async def open_feed(port : int) -> DiscordAction:
+    try:
+        return to_react(await start_feed(port))
+    except OSError:
+        return FAIL_REACT
+
+async def close_feed() -> DiscordAction:
+    return to_react(await stop_feed())
+
+def use_alerts_channel(channel : discord.TextChannel) -> DiscordAction:
+    init_control_notifs(channel)
+    return OKAY_REACT
+
+def use_news_channel(channel : discord.TextChannel) -> DiscordAction:
+    init_news_notifs(channel)
+    return OKAY_REACT
 
+@gateway
 async def make_submarine(guild : discord.Guild, name : str, captain : discord.Member, engineer : discord.Member, scientist : discord.Member, x : int, y : int, keyword : str) -> DiscordAction:
     """
     Makes a submarine with the name <name> and members Captain, Engineer and Scientist.
@@ -97,7 +245,7 @@ async def make_submarine(guild : discord.Guild, name : str, captain : discord.Me
     Then creates the relevant roles (if they don't exist already), and assigns them to players.
     Finally, we register this team as a submarine.
     """
-    if get_sub(name):
+    if name in teams():
         return FAIL_REACT
 
     category = await guild.create_category_channel(name)
@@ -139,7 +287,7 @@ async def make_submarine(guild : discord.Guild, name : str, captain : discord.Me
     await category.create_text_channel("secret", overwrites=allow_control_and_one(None))
     await category.create_text_channel("control-room", overwrites=allow_control_and_one(submarine_role))
     await category.create_voice_channel("submarine", overwrites=allow_control_and_one(submarine_role))
-    return await register(category, x, y, keyword)
+    return await call(register, category, x, y, keyword)
 
 async def register(category : discord.CategoryChannel, x : int, y : int, keyword : str) -> DiscordAction:
     """
@@ -148,6 +296,9 @@ async def register(category : discord.CategoryChannel, x : int, y : int, keyword
     ONLY RUNNABLE BY CONTROL.
     """
     if add_team(category.name.lower(), category, x, y, keyword):
+        # New teams can't be journalled, as they need their Discord channels,
+        # so we make a checkpoint instead.
+        save_game()
         sub = get_sub(category.name.lower())
         if sub:
             await sub.send_to_all(f"Channel registered for sub **{category.name.title()}**.")
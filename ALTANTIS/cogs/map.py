@@ -7,6 +7,7 @@ from ALTANTIS.utils.bot import perform_unsafe
 from ALTANTIS.utils.actions import DiscordAction, OKAY_REACT, FAIL_REACT
 from ALTANTIS.world.world import get_square, bury_treasure_at
 from ALTANTIS.world.consts import WEATHER
+from ALTANTIS.utils.journal import journalled
 
 class MapModification(commands.Cog):
     """
@@ -45,23 +46,27 @@ class MapModification(commands.Cog):
         """
         await perform_unsafe(mass_weather, ctx, preset)
 
+@journalled
 def bury_treasure(name : str, x : int, y : int) -> DiscordAction:
     if bury_treasure_at(name, (x, y)):
         return OKAY_REACT
     return FAIL_REACT
 
+@journalled
 def add_attribute_to(x : int, y : int, attribute : str, value) -> DiscordAction:
     square = get_square(x, y)
     if square and square.add_attribute(attribute, value):
         return OKAY_REACT
     return FAIL_REACT
 
+@journalled
 def remove_attribute_from(x : int, y : int, attribute : str) -> DiscordAction:
     square = get_square(x, y)
     if square and square.remove_attribute(attribute):
         return OKAY_REACT
     return FAIL_REACT
 
+@journalled
 def mass_weather(preset : str):
     CHAR_TO_WEATHER = {WEATHER[k].lower(): k.lower() for k in WEATHER}
     try:
@@ -76,6 +81,7 @@ def mass_weather(preset : str):
                         char = map_arr[y][x].lower()
                         if char in CHAR_TO_WEATHER:
                             sq.attributes["weather"] = CHAR_TO_WEATHER[char]
+                            sq.touched()
         return OKAY_REACT
     except:
         return FAIL_REACT
\ No newline at end of file
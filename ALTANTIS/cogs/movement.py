@@ -4,7 +4,10 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, direction_emoji
 from ALTANTIS.utils.bot import perform, perform_async, perform_unsafe, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, React, OKAY_REACT, FAIL_REACT
-from ALTANTIS.subs.state import with_sub, with_sub_async
+from ALTANTIS.subs.state import with_sub, with_sub_async, get_sub
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.utils.intents import queued
+from ALTANTIS.world.world import in_world, possible_directions
 
 class Movement(commands.Cog):
     """
@@ -52,6 +55,9 @@ class Movement(commands.Cog):
         """
         await perform_async(exit_submarine, ctx, get_team(ctx.channel), ctx.guild)
 
+@queued(lambda direction, subname: get_sub(subname) is not None and direction in possible_directions(),
+        collapse=lambda direction, subname: subname)
+@journalled
 def move(direction : str, subname : str) -> DiscordAction:
     """
     Records the team's direction.
@@ -64,6 +70,9 @@ def move(direction : str, subname : str) -> DiscordAction:
         return FAIL_REACT
     return with_sub(subname, do_move, FAIL_REACT)
 
+@queued(lambda subname, x, y: get_sub(subname) is not None and in_world(x, y),
+        collapse=lambda subname, x, y: subname)
+@journalled
 def teleport(subname : str, x : int, y : int) -> DiscordAction:
     """
     Teleports team to (x,y), checking if the space is in the world.
@@ -74,6 +83,7 @@ def teleport(subname : str, x : int, y : int) -> DiscordAction:
         return FAIL_REACT
     return with_sub(subname, do_teleport, FAIL_REACT)
 
+@journalled
 async def set_activation(team : str, guild : discord.Guild, value : bool) -> DiscordAction:
     """
     Sets the submarine's power to `value`.
@@ -90,6 +100,7 @@ async def set_activation(team : str, guild : discord.Guild, value : bool) -> Dis
         return OKAY_REACT
     return await with_sub_async(team, do_set, FAIL_REACT)
 
+@journalled
 async def exit_submarine(team : str, guild : discord.Guild) -> DiscordAction:
     async def do_exit(sub):
         message = await sub.docking(guild)
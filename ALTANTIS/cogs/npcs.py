@@ -7,6 +7,7 @@ from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REAC
 from ALTANTIS.utils.text import list_to_and_separated
 from ALTANTIS.subs.state import get_sub
 from ALTANTIS.npcs.npc import add_npc, kill_npc, get_npc_types
+from ALTANTIS.utils.journal import journalled
 
 class NPCs(commands.Cog):
     """
@@ -36,12 +37,14 @@ class NPCs(commands.Cog):
         """
         await perform_unsafe(printout_npc_types, ctx)
 
+@journalled
 def add_npc_to_map(ntype : str, x : int, y : int, team : Optional[str]) -> DiscordAction:
     sub = None
     if team and get_sub(team):
         sub = team
     return Message(add_npc(ntype, x, y, sub))
 
+@journalled
 async def remove_npc_from_map(npcid : int, rattle : bool) -> DiscordAction:
     if await kill_npc(npcid, rattle):
         return OKAY_REACT
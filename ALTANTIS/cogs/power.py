@@ -4,7 +4,9 @@ from typing import List
 from ALTANTIS.utils.consts import CONTROL_ROLE, ENGINEER
 from ALTANTIS.utils.bot import perform, perform_async, get_team
 from ALTANTIS.utils.actions import DiscordAction, Message, OKAY_REACT, FAIL_REACT
-from ALTANTIS.subs.state import with_sub, with_sub_async
+from ALTANTIS.subs.state import with_sub, with_sub_async, get_sub
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.utils.intents import queued
 
 class PowerManagement(commands.Cog):
     """
@@ -46,6 +48,12 @@ class PowerManagement(commands.Cog):
         """
         await perform_async(heal_up, ctx, get_team(ctx.channel), amount, reason)
 
+def systems_exist(team : str, systems : List[str]) -> bool:
+    sub = get_sub(team)
+    return sub is not None and all(system in sub.power.power_max for system in systems)
+
+@queued(systems_exist)
+@journalled
 def power_systems(team : str, systems : List[str]) -> DiscordAction:
     """
     Powers `systems` of the submarine `team` if able.
@@ -55,6 +63,8 @@ def power_systems(team : str, systems : List[str]) -> DiscordAction:
         return Message(result)
     return with_sub(team, do_power, FAIL_REACT)
 
+@queued(systems_exist)
+@journalled
 def unpower_systems(team : str, systems : List[str]) -> DiscordAction:
     """
     Unpowers `systems` of the submarine `team` if able.
@@ -64,6 +74,7 @@ def unpower_systems(team : str, systems : List[str]) -> DiscordAction:
         return Message(result)
     return with_sub(team, do_unpower, FAIL_REACT)
 
+@journalled
 async def deal_damage(team : str, amount : int, reason : str) -> DiscordAction:
     async def do_damage(sub):
         sub.damage(amount)
@@ -71,6 +82,7 @@ async def deal_damage(team : str, amount : int, reason : str) -> DiscordAction:
         return OKAY_REACT
     return await with_sub_async(team, do_damage, FAIL_REACT)
 
+@journalled
 async def heal_up(team : str, amount : int, reason : str) -> DiscordAction:
     async def do_heal(sub):
         sub.power.heal(amount)
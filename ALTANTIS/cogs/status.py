@@ -1,15 +1,17 @@
-import json, httpx
 from discord.ext import commands
-from typing import List, Tuple, Dict, Any, Sequence
+from typing import List, Tuple, Dict, Any, Sequence, Optional
 
-from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, MAP_DOMAIN, MAP_TOKEN, X_LIMIT, Y_LIMIT
+from ALTANTIS.utils.consts import CONTROL_ROLE, CAPTAIN, MAP_RENDERER
 from ALTANTIS.utils.bot import perform, perform_async, perform_unsafe, perform_async_unsafe, get_team, main_loop
-from ALTANTIS.utils.actions import DiscordAction, Message, FAIL_REACT
+from ALTANTIS.utils.actions import DiscordAction, Message, Attachment, FAIL_REACT
+from ALTANTIS.utils.snapshot import reads_snapshot
 from ALTANTIS.utils.text import list_to_and_separated
-from ALTANTIS.world.world import in_world, get_square
+from ALTANTIS.utils.maps import upload_map
+from ALTANTIS.utils.render import render_map
+from ALTANTIS.world.world import in_world, get_square, world_size
 from ALTANTIS.world.consts import MAX_OPTIONS
-from ALTANTIS.npcs.npc import filtered_npcs, get_npc
-from ALTANTIS.subs.state import get_sub, get_sub_objects, filtered_teams, with_sub
+from ALTANTIS.npcs.npc import get_npc_positions, get_npcs_at
+from ALTANTIS.subs.state import get_sub, get_sub_objects, get_subs_at, with_sub
 from ALTANTIS.subs.sub import Submarine
 
 class Status(commands.Cog):
@@ -18,11 +20,12 @@ class Status(commands.Cog):
     """
     @commands.command()
     @commands.has_any_role(CAPTAIN, CONTROL_ROLE)
-    async def map(self, ctx):
+    async def map(self, ctx, radius : Optional[int] = None):
         """
         Shows a map of the world, including your submarine!
+        If you give a <radius>, only the squares that close to your submarine are drawn in full.
         """
-        await perform_async(print_map, ctx, get_team(ctx.channel))
+        await perform_async(print_map, ctx, get_team(ctx.channel), DEFAULT_OPTIONS, False, radius)
 
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
@@ -34,6 +37,14 @@ class Status(commands.Cog):
             await perform_async_unsafe(print_map, ctx, None, True, True)
         else:
             await perform_async_unsafe(print_map, ctx, None, list(opts), True)
+
+    @commands.command()
+    @commands.has_role(CONTROL_ROLE)
+    async def mapzone(self, ctx, x0 : int, y0 : int, x1 : int, y1 : int):
+        """
+        (CONTROL) Shows the part of the map from (<x0>, <y0>) to (<x1>, <y1>) inclusive, including all submarines.
+        """
+        await perform_async_unsafe(print_map, ctx, None, True, True, None, (x0, y0, x1 + 1, y1 + 1))
     
     @commands.command()
     @commands.has_role(CONTROL_ROLE)
@@ -41,14 +52,14 @@ class Status(commands.Cog):
         """
         (CONTROL) Gives all details of a given square <x>, <y>.
         """
-        await perform_unsafe(zoom_in, ctx, x, y, main_loop)
+        await perform_unsafe(zoom_in, ctx, x, y, main_loop())
 
     @commands.command()
     async def status(self, ctx):
         """
         Reports the status of the submarine, including power and direction.
         """
-        await perform(get_status, ctx, get_team(ctx.channel), main_loop)
+        await perform(get_status, ctx, get_team(ctx.channel), main_loop())
     
     @commands.command()
     async def scan(self, ctx):
@@ -57,9 +68,18 @@ class Status(commands.Cog):
         """
         await perform(get_scan, ctx, get_team(ctx.channel))
 
-async def print_map(team: str, options: Sequence[str] = ("w", "d", "s", "a", "m", "e"), show_hidden: bool = False) -> DiscordAction:
+DEFAULT_OPTIONS = ("w", "d", "s", "a", "m", "e")
+# The overview of the world sent alongside a partial map is always this many
+# characters square, however big the world is.
+THUMBNAIL_SIZE = 10
+
+@reads_snapshot
+async def print_map(team: str, options: Sequence[str] = DEFAULT_OPTIONS, show_hidden: bool = False, radius: Optional[int] = None, bounds: Optional[Tuple[int, int, int, int]] = None) -> DiscordAction:
     """
     Prints the map from the perspective of one submarine, or all if team is None.
+    Either a radius around the submarine or explicit (x0, y0, x1, y1) bounds
+    (exclusive of x1 and y1) restricts the map to part of the world, in which
+    case a low detail overview of the whole world is included as well.
     """
     subs = []
     max_options = ["w", "d", "s", "t", "n", "a", "j", "m", "e"]
@@ -74,65 +94,139 @@ async def print_map(team: str, options: Sequence[str] = ("w", "d", "s", "a", "m"
             return FAIL_REACT
         else:
             subs = [sub]
-    map_string, map_arr = draw_map(subs, list(options), show_hidden)
-    map_json = json.dumps(map_arr)
-    async with httpx.AsyncClient() as client:
-        url = MAP_DOMAIN+"/api/map/"
-        res = await client.post(url, data={"map": map_string, "key": MAP_TOKEN, "names": map_json})
-        if res.status_code == 200:
-            final_url = MAP_DOMAIN+res.json()['url']
-            return Message(f"The map is visible here: {final_url}")
+    if radius is not None and team is not None:
+        if radius < 0:
+            return FAIL_REACT
+        (x, y) = subs[0].movement.get_position()
+        bounds = (x - radius, y - radius, x + radius + 1, y + radius + 1)
+    if bounds is not None:
+        bounds = clamp_bounds(bounds)
+        if bounds is None:
+            return Message("Chosen area is outside the world boundaries!")
+
+    map_string, map_arr = draw_map(subs, list(options), show_hidden, bounds)
+    description = "The map"
+    thumbnail = ""
+    if bounds is not None and bounds != (0, 0) + world_size():
+        (x0, y0, x1, y1) = bounds
+        description = f"The map of ({x0}, {y0}) to ({x1 - 1}, {y1 - 1})"
+        thumbnail = f"\nThe whole world looks like this:\n```\n{draw_thumbnail(subs, bounds, show_hidden)}```"
+    if MAP_RENDERER == "local":
+        filename = await render_map(map_string, map_arr)
+        if filename is not None:
+            return Attachment(f"{description} is attached.{thumbnail}", filename)
+    final_url = await upload_map(map_string, map_arr)
+    if final_url is not None:
+        return Message(f"{description} is visible here: {final_url}{thumbnail}")
     return FAIL_REACT
 
-def draw_map(subs: List[Submarine], to_show: List[str], show_hidden: bool) -> Tuple[str, List[Dict[str, Any]]]:
+def clamp_bounds(bounds : Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Restricts (x0, y0, x1, y1) bounds to the world, or None if nothing is left.
+    """
+    (x0, y0, x1, y1) = bounds
+    (x_limit, y_limit) = world_size()
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, x_limit), min(y1, y_limit)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return (x0, y0, x1, y1)
+
+SUB_CHARS = ['1','2','3','4','5','6','7','8','9','0','-','+','=']
+
+def draw_map(subs: List[Submarine], to_show: List[str], show_hidden: bool, bounds: Optional[Tuple[int, int, int, int]] = None) -> Tuple[str, List[Dict[str, Any]]]:
     """
     Draws an ASCII version of the map.
     Also returns a JSON of additional information.
     `subs` is a list of submarines, which are marked 0-9 on the map.
+    If bounds (x0, y0, x1, y1) are given, only that part of the world is drawn,
+    and positions in the JSON are relative to (x0, y0).
     """
-    SUB_CHARS = ['1','2','3','4','5','6','7','8','9','0','-','+','=']
+    (x0, y0, x1, y1) = bounds if bounds is not None else (0, 0) + world_size()
+    perspective = list(map(lambda sub: sub._name, subs))
+    # Work out what's in each square up front, rather than asking every square.
+    npcs_at : Dict[Tuple[int, int], List[str]] = {}
+    if "n" in to_show:
+        for (nx, ny) in get_npc_positions():
+            if x0 <= nx < x1 and y0 <= ny < y1:
+                npcs_at[(nx, ny)] = [npc.name() for npc in get_npcs_at((nx, ny))]
+    subs_at : Dict[Tuple[int, int], int] = {}
+    for i in range(len(subs)):
+        subs_at[subs[i].movement.get_position()] = i
+
     map_string = ""
     map_json = []
-    for y in range(Y_LIMIT):
+    for y in range(y0, y1):
         row = ""
-        for x in range(X_LIMIT):
+        for x in range(x0, x1):
             square = get_square(x, y)
-            tile_char = square.to_char(to_show, show_hidden, list(map(lambda sub: sub._name, subs)))
-            tile_name = square.map_name(to_show, show_hidden, list(map(lambda sub: sub._name, subs)))
-            if "n" in to_show:
-                npcs_in_square = filtered_npcs(lambda n: n.x == x and n.y == y)
-                if len(npcs_in_square) > 0:
-                    tile_char = "N"
-                    tile_name = list_to_and_separated(list(map(lambda n: get_npc(n).name(), npcs_in_square)))
-            for i in range(len(subs)):
-                (sx, sy) = subs[i].movement.get_position()
-                if sx == x and sy == y:
-                    tile_char = SUB_CHARS[i]
-                    tile_name = subs[i].name()
+            tile_char = square.to_char(to_show, show_hidden, perspective)
+            tile_name = square.map_name(to_show, show_hidden, perspective)
+            if (x, y) in npcs_at:
+                tile_char = "N"
+                tile_name = list_to_and_separated(npcs_at[(x, y)])
+            if (x, y) in subs_at:
+                i = subs_at[(x, y)]
+                tile_char = SUB_CHARS[i]
+                tile_name = subs[i].name()
             row += tile_char
             if tile_name is not None:
-                map_json.append({"x": x, "y": y, "name": tile_name})
+                map_json.append({"x": x - x0, "y": y - y0, "name": tile_name})
         map_string += row + "\n"
     return map_string, map_json
 
+def draw_thumbnail(subs: List[Submarine], bounds: Tuple[int, int, int, int], show_hidden: bool) -> str:
+    """
+    Draws a THUMBNAIL_SIZE square overview of the whole world, sampling one
+    square per block so the cost doesn't depend on the size of the world.
+    Blocks inside the drawn area are marked with #, and blocks containing a
+    sub are marked with its character. Hidden squares are drawn as in
+    draw_map.
+    """
+    (x0, y0, x1, y1) = bounds
+    (x_limit, y_limit) = world_size()
+    perspective = list(map(lambda sub: sub._name, subs))
+    width = min(THUMBNAIL_SIZE, x_limit)
+    height = min(THUMBNAIL_SIZE, y_limit)
+    subs_in_block : Dict[Tuple[int, int], int] = {}
+    for i in range(len(subs)):
+        (sx, sy) = subs[i].movement.get_position()
+        subs_in_block[(sx * width // x_limit, sy * height // y_limit)] = i
+
+    thumbnail = ""
+    for by in range(height):
+        top, bottom = by * y_limit // height, (by + 1) * y_limit // height
+        for bx in range(width):
+            left, right = bx * x_limit // width, (bx + 1) * x_limit // width
+            if (bx, by) in subs_in_block:
+                thumbnail += SUB_CHARS[subs_in_block[(bx, by)]]
+            elif left < x1 and x0 < right and top < y1 and y0 < bottom:
+                thumbnail += "#"
+            else:
+                sample = get_square((left + right) // 2, (top + bottom) // 2)
+                thumbnail += sample.to_char(["w", "d"], show_hidden, perspective)
+        thumbnail += "\n"
+    return thumbnail
+
+@reads_snapshot
 def zoom_in(x : int, y : int, loop) -> DiscordAction:
     if in_world(x, y):
         report = f"Report for square **({x}, {y})**\n"
         report += get_square(x, y).square_status() + "\n\n"
         # See if any subs are here, and if so print their status.
-        subs_in_square = filtered_teams(lambda sub: sub.movement.x == x and sub.movement.y == y)
-        for subname in subs_in_square:
-            sub = get_sub(subname)
+        for sub in get_subs_at((x, y)):
             report += sub.status_message(loop) + "\n\n"
         return Message(report)
     return Message("Chosen square is outside the world boundaries!")
 
+@reads_snapshot
 def get_status(team : str, loop) -> DiscordAction:
     def do_status(sub):
         status_message = sub.status_message(loop)
         return Message(status_message)
     return with_sub(team, do_status, FAIL_REACT)
 
+@reads_snapshot
 def get_scan(team : str) -> DiscordAction:
     def do_scan(sub):
         return Message(sub.scan.previous_scan())
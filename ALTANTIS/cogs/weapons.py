@@ -3,7 +3,10 @@ from discord.ext import commands
 from ALTANTIS.utils.consts import CONTROL_ROLE, SCIENTIST
 from ALTANTIS.utils.bot import perform, get_team
 from ALTANTIS.utils.actions import Message, FAIL_REACT
-from ALTANTIS.subs.state import with_sub
+from ALTANTIS.subs.state import with_sub, get_sub
+from ALTANTIS.utils.journal import journalled
+from ALTANTIS.utils.intents import queued
+from ALTANTIS.world.world import in_world
 
 class Weaponry(commands.Cog):
     """
@@ -26,6 +29,8 @@ class Weaponry(commands.Cog):
         """
         await perform(schedule_shot, ctx, x, y, get_team(ctx.channel), False)
 
+@queued(lambda x, y, team, damaging: get_sub(team) is not None and in_world(x, y))
+@journalled
 def schedule_shot(x : int, y : int, team : str, damaging : bool):
     def do_schedule(sub):
         return Message(sub.weapons.prepare_shot(damaging, x, y))
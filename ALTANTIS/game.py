@@ -2,44 +2,82 @@
 Runs the game, performing the right actions at fixed time intervals.
 """
 
-from ALTANTIS.subs.state import get_subs, get_sub, state_to_dict, state_from_dict
+from ALTANTIS.subs.state import get_subs, get_active_subs, get_sub, state_to_dict, state_from_dict
 from ALTANTIS.npcs.npc import npc_tick, npcs_to_json, npcs_from_json
-from ALTANTIS.world.world import map_tick, map_to_dict, map_from_dict
+from ALTANTIS.world.world import map_from_dict
+from ALTANTIS.world.regions import map_tick
+from ALTANTIS.world import events as square_events
 from ALTANTIS.utils.actions import FAIL_REACT, OKAY_REACT
 from ALTANTIS.utils.emergencies import emergencies
+from ALTANTIS.utils.feed import publish_turn
+from ALTANTIS.world.binmap import EXTENSION, save_map, load_map
+from ALTANTIS.utils.retention import list_saves, read_part, save_exists, prune_saves
+from ALTANTIS.utils.journal import begin_turn, record_checkpoint, record_load, plan_replay, replay_mode, set_turn, use_seed, seeded, JOURNALLED
+from ALTANTIS.utils.consts import CHECKPOINT_INTERVAL
+from ALTANTIS.utils.history import record_turn
+from ALTANTIS.utils import rollback, snapshot, timers
+from ALTANTIS.utils.rng import stream, forget_streams
+from ALTANTIS.utils.intents import apply_intents, queued
+from ALTANTIS.utils.games import game_part, current_game
 
-import json, datetime, os, gzip, random
-from typing import List, Dict
+import json, datetime, os, gzip, inspect
+from typing import List, Dict, Optional
 
-NO_SAVE = False
+class Saving():
+    def __init__(self):
+        # Set while the game is halfway through changing, when saving it
+        # would write something inconsistent.
+        self.no_save = False
 
-async def perform_timestep(counter : int):
+live_saving = game_part("saving", Saving)
+
+async def perform_timestep():
     """
     Does all time-related stuff, including movement, power changes and so on.
     Called at a time interval, when allowed.
     """
-    global NO_SAVE
-    NO_SAVE = True
+    saving = live_saving()
+    saving.no_save = True
 
-    print(f"Running turn {counter}.")
+    # Commands queued since the last turn belong between it and this one.
+    await apply_intents()
+    turn = begin_turn()
+    print(f"Running turn {turn}.")
+    # Read-only commands see the end of the last turn until this one is done.
+    snapshot.hold()
+    try:
+        await run_turn(turn)
+    finally:
+        snapshot.release()
+    await publish_turn(turn)
+    record_turn(turn)
 
-    def is_active_sub(subname):
-        sub = get_sub(subname)
-        if not sub: return False
-        return sub.power.activated()
+    saving.no_save = False
+    if turn % CHECKPOINT_INTERVAL == 0:
+        save_game()
 
-    # Get all active subs. (Can you tell I'm a functional programmer?)
+async def run_turn(turn : int):
+    """
+    Runs a single turn. Everything random must come from an entity's stream
+    (see utils/rng.py), so that replaying the turn gives the same result.
+    """
+    # Get all subs active at the start of the turn.
     # Note: we still collect all messages for all subs, as there are some
     # messages that inactive subs should receive.
-    subsubset : List[str] = list(filter(is_active_sub, get_subs()))
+    subsubset : List[str] = list(get_active_subs())
     submessages : Dict[str, Dict[str, str]] = {i: {"engineer": "", "captain": "", "scientist": ""} for i in get_subs()}
-    message_opening : str = f"---------**TURN {counter}**----------\n"
+    message_opening : str = f"---------**TURN {turn}**----------\n"
+    # Collect the timers due this turn, which fire during it (see utils/timers.py).
+    timers.advance()
+    for subname in subsubset:
+        get_sub(subname).power.active_turns += 1
 
     # Emergency messaging
     for subname in subsubset:
         sub = get_sub(subname)
         if sub.power.total_power == 1:
-            emergency_message = f"EMERGENCY!!! {random.choice(emergencies)}\n"
+            emergency = stream(sub.owner(), "emergencies").choice(emergencies)
+            emergency_message = f"EMERGENCY!!! {emergency}\n"
             submessages[subname]["captain"] += emergency_message
             submessages[subname]["scientist"] += emergency_message
             submessages[subname]["engineer"] += emergency_message
@@ -64,7 +102,7 @@ async def perform_timestep(counter : int):
     # NPCs
     await npc_tick()
     # Map
-    map_tick()
+    await map_tick()
 
     # The crane
     for subname in subsubset:
@@ -92,13 +130,14 @@ async def perform_timestep(counter : int):
             submessages[subname]["captain"] += scan_message
             submessages[subname]["scientist"] += scan_message
     
+    # Squares reacting to who came, went or stayed
+    await square_events.dispatch()
+
     # Postponed events
-    for subname in subsubset:
-        sub = get_sub(subname)
-        await sub.upgrades.postponed_tick()
+    await timers.fire("subs")
 
     # Damage
-    for subname in get_subs():
+    for subname in list(get_subs()):
         sub = get_sub(subname)
         damage_message = await sub.power.damage_tick()
         if damage_message:
@@ -107,7 +146,7 @@ async def perform_timestep(counter : int):
             submessages[subname]["engineer"] += damage_message
             submessages[subname]["scientist"] += damage_message
 
-    for subname in get_subs():
+    for subname in list(get_subs()):
         messages = submessages[subname]
         sub = get_sub(subname)
         if messages["captain"] == "":
@@ -121,59 +160,116 @@ async def perform_timestep(counter : int):
         if messages["scientist"] != "":
             await sub.send_message(f"{message_opening}{messages['scientist'][:-1]}", "scientist")
 
-    NO_SAVE = False
-    save_game()
-
-def save_game():
+def save_game() -> Optional[str]:
     """
     Save the game to map.json, state.json and npcs.json.
     We save the map and state separately, so they can be loaded separately.
     This must be called at the end of the loop, as to guarantee that we're
     not about to overwrite important data being written during it.
+    Every save is a checkpoint in the journal, and we return its name.
     """
-    if NO_SAVE:
+    if live_saving().no_save:
         print("SAVE FAILED")
-        return False
+        return None
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Saves in the same second (from !save or !recover) mustn't overwrite each
+    # other, as the journal may still refer to the earlier one.
+    base, copy = timestamp, 0
+    while save_exists(timestamp):
+        copy += 1
+        timestamp = f"{base}-{copy}"
     state_dict = state_to_dict()
-    map_dict = map_to_dict()
     npcs_dict = npcs_to_json()
     # Write a new save at this timestamp.
-    with gzip.open(f"saves/state/{timestamp}.json.gz", "wt") as state_file:
+    directory = current_game().save_directory()
+    for part in ["state", "map", "npc"]:
+        os.makedirs(f"{directory}/{part}", exist_ok=True)
+    with gzip.open(f"{directory}/state/{timestamp}.json.gz", "wt") as state_file:
         json.dump(state_dict, state_file)
-    with gzip.open(f"saves/map/{timestamp}.json.gz", "wt") as map_file:
-        json.dump(map_dict, map_file)
-    with gzip.open(f"saves/npc/{timestamp}.json.gz", "wt") as npcs_file:
+    save_map(f"{directory}/map/{timestamp}{EXTENSION}")
+    with gzip.open(f"{directory}/npc/{timestamp}.json.gz", "wt") as npcs_file:
         json.dump(npcs_dict, npcs_file)
-    return True
+    rollback.remember(timestamp, state_dict, npcs_dict)
+    record_checkpoint(timestamp)
+    prune_saves()
+    return timestamp
 
+# Loads are journalled too, so like journalled commands they wait for the start
+# of the next turn rather than landing halfway through one.
+@queued(lambda which, offset, bot: which in ["all", "map", "npcs", "state"])
 def load_game(which : str, offset : int, bot):
     """
     Loads the state (from state.json), map (from map.json), npcs (from npcs.json) or all.
     Does not check whether the files exist.
     This is destructive, so needs the exact correct argument.
     """
-    prefix = f"{os.curdir}/saves"
-    filenames = sorted(os.listdir(f"{prefix}/map/"), reverse=True)
-    if offset >= len(filenames):
+    names = list_saves()
+    if offset >= len(names):
         return FAIL_REACT
-    # Get the relevant timestamp. We arbitrarily choose map to find the correct name.
-    filename = filenames[offset]
     if which not in ["all", "map", "npcs", "state"]:
         return FAIL_REACT
+    name = names[offset]
+    load_save(which, name, bot)
+    record_load(which, name)
+    return OKAY_REACT
+
+def load_save(which : str, name : str, client):
+    """
+    Loads part or all of the save with the given name (its timestamp).
+    The save may be loose files or in an archive (see utils/retention.py).
+    Maps may be binary or (in older saves) JSON, but the rest is always JSON.
+    Recent saves are still in memory, so we don't need to read them at all.
+    """
+    snapshot = rollback.recall(name)
+    if snapshot is not None:
+        rollback.restore(snapshot, which, client)
+        return
     if which in ["all", "map"]:
-        with gzip.open(f"{prefix}/map/{filename}", "r") as map_file:
-            map_string = map_file.read()
-            map_json = json.loads(map_string)
-            map_from_dict(map_json)
+        (extension, map_data) = read_part(name, "map")
+        if extension == EXTENSION:
+            map_from_dict(load_map(map_data))
+        else:
+            map_from_dict(json.loads(gzip.decompress(map_data)))
     if which in ["all", "state"]:
-        with gzip.open(f"{prefix}/state/{filename}", "r") as state_file:
-            state_string = state_file.read()
-            state_json = json.loads(state_string)
-            state_from_dict(state_json, bot)
+        (_, state_data) = read_part(name, "state")
+        state_from_dict(json.loads(gzip.decompress(state_data)), client)
     if which in ["all", "npcs"]:
-        with gzip.open(f"{prefix}/npc/{filename}", "r") as npc_file:
-            npc_string = npc_file.read()
-            npc_json = json.loads(npc_string)
-            npcs_from_json(npc_json)
-    return OKAY_REACT
\ No newline at end of file
+        (_, npc_data) = read_part(name, "npcs")
+        npcs_from_json(json.loads(gzip.decompress(npc_data)))
+
+async def recover_game(target : Optional[int], bot) -> bool:
+    """
+    Rebuilds the game as it was at the end of turn target (or as recently
+    as possible, if target is None) by loading the checkpoint before it and
+    replaying the journal since, without sending anything to Discord.
+    Afterwards we save, so that the recovered game is its own checkpoint.
+    """
+    plan = plan_replay(target, save_exists)
+    if plan is None:
+        return False
+    (checkpoint, entries) = plan
+    saving = live_saving()
+    saving.no_save = True
+    forget_streams()
+    with replay_mode():
+        # Saves count some things (like when creatures next attack) in turns
+        # from when they were made, so we must be back at that turn first.
+        set_turn(checkpoint["turn"])
+        load_save("all", checkpoint["save"], bot)
+        for entry in entries:
+            set_turn(entry["turn"])
+            if entry["type"] == "turn":
+                use_seed(entry["seed"])
+                await run_turn(entry["turn"])
+            elif entry["type"] == "command" and entry["fn"] in JOURNALLED:
+                with seeded(entry["seed"]):
+                    result = JOURNALLED[entry["fn"]](*entry["args"])
+                    if inspect.isawaitable(result):
+                        await result
+            elif entry["type"] == "load" and save_exists(entry["save"]):
+                load_save(entry["which"], entry["save"], bot)
+            elif entry["type"] == "checkpoint":
+                pass
+    saving.no_save = False
+    save_game()
+    return True
@@ -4,18 +4,43 @@ Deals with NPCs in general, and how they operate.
 (Individual NPCs will be put elsewhere.)
 """
 
-from ALTANTIS.subs.state import filtered_teams, get_sub
+from ALTANTIS.subs.state import get_subs_at, get_sub, get_sub_positions
 from ALTANTIS.subs.sub import Submarine
 from ALTANTIS.world.world import bury_treasure_at, in_world, get_square
 from ALTANTIS.world.extras import all_in_submap
+from ALTANTIS.world.events import moved as square_moved
+from ALTANTIS.world.components import ComponentStore, live_store, POSITION, HEALTH, PENDING_DAMAGE, STEALTH, CARBON, MESSAGING
 from ALTANTIS.utils.control import notify_control
 from ALTANTIS.utils.entity import Entity
+from ALTANTIS.utils.snapshot import reading, handed_out
+from ALTANTIS.utils.games import game_part
+from ALTANTIS.utils.timers import timer_handler, schedule, fire, cancel_owner, cancel_kind, encode_owner, decode_owner
+from ALTANTIS.utils.journal import current_turn
+from ALTANTIS.utils.rng import stream
+from ALTANTIS.npcs.population import Population, SPECIES, SPECIES_IDS, PHOTO_URL, REACH, plan
+from ALTANTIS.world.regions import enabled as regions_enabled, plan_creatures as plan_in_regions
 from ALTANTIS.utils.direction import diagonal_distance, determine_direction, go_in_direction, rotate_direction
 
 from typing import Tuple, List, Callable, Dict, Any, Optional
+import math
 
 class NPC(Entity):
     classname = ""
+    components = POSITION | HEALTH | PENDING_DAMAGE | STEALTH | MESSAGING
+    # Methods run every so many turns on a timer, rather than every turn,
+    # mapped to how many turns apart they are. If attack is here, on_tick
+    # leaves it alone.
+    periodic : Dict[str, int] = {}
+    # Whether we're told about subs entering, leaving and staying in our
+    # square (see ALTANTIS.world.events).
+    watches_square = False
+    # With no sub this close, we go dormant: we don't tick and our timers
+    # are put away until a sub comes back (see update_dormancy).
+    # None means we're always awake.
+    activation_radius : Optional[int] = None
+    # When we went dormant, and the timers we had then.
+    dormant_since : Optional[int] = None
+    dormant_timers : List[Dict[str, Any]] = []
     def __init__(self, id : int, x : int, y : int):
         self.health = 1
         self.treasure = []
@@ -32,11 +57,53 @@ class NPC(Entity):
     
     async def on_tick(self):
         await self.damage_tick()
-        await self.attack()
+        if "attack" not in self.periodic:
+            await self.attack()
+
+    def start_timers(self, elapsed : int = 0):
+        """
+        Schedules the periodic methods, as if elapsed turns had already passed
+        since they last ran.
+        """
+        for method in self.periodic:
+            period = self.periodic[method]
+            schedule(self.owner(), "npc_event", period - elapsed % period, [method], period=period, phase="npcs")
     
     async def attack(self):
         pass
 
+    def fast_forward(self, turns : int):
+        """
+        Roughly catches up on what we'd have done in turns spent dormant,
+        besides our timers (which are caught up for us).
+        """
+        pass
+
+    def drift(self, steps : int):
+        """
+        Moves us to where steps random steps (each -1, 0 or 1 in x and y)
+        would probably leave us, in one go.
+        """
+        if steps <= 0:
+            return
+        spread = math.sqrt(2 * steps / 3)
+        rng = stream(self.owner(), "dormancy")
+        dx = max(-steps, min(steps, round(rng.gauss(0, spread))))
+        dy = max(-steps, min(steps, round(rng.gauss(0, spread))))
+        self.move(dx, dy)
+
+    def watched_squares(self) -> List[Tuple[int, int]]:
+        return [self.get_position()] if self.watches_square else []
+
+    async def on_enter(self, entity : Entity):
+        pass
+
+    async def on_leave(self, entity : Entity):
+        pass
+
+    async def on_stay(self, entity : Entity):
+        pass
+
     async def do_attack(self, entity, amount, message) -> bool:
         if self.attackable(entity):
             await entity.send_message(message, "scientist")
@@ -48,7 +115,7 @@ class NPC(Entity):
         if self.observant:
             return True
         if type(entity) is Submarine:
-            return not "camo" in entity.upgrades.keywords
+            return not entity.upgrades.has("camo")
         else:
             return not entity.camo
     
@@ -58,6 +125,9 @@ class NPC(Entity):
     def full_name(self) -> str:
         return f"{self.typename} (#{self.id} at {self.x}, {self.y})"
 
+    def owner(self) -> Tuple[str, Any]:
+        return ("npc", self.id)
+
     async def send_message(self, content, _):
         await notify_control(f"Event from {self.name()}! {content}")
 
@@ -69,7 +139,7 @@ class NPC(Entity):
                     bury_treasure_at(treasure, (self.x, self.y))
                 await notify_control(f"**{self.full_name()}** took a total of {self.damage_to_apply} damage and **died**!")
                 await self.deathrattle()
-                kill_npc(self.id)
+                await kill_npc(self.id, False)
             else:
                 await notify_control(f"**{self.full_name()}** took a total of {self.damage_to_apply} damage!")
             self.damage_to_apply = 0
@@ -82,6 +152,8 @@ class NPC(Entity):
 
     def damage(self, amount : int):
         self.damage_to_apply += amount
+        if self.dormant_since is not None and live_registry().get(self.id) is self:
+            wake(self, current_turn())
     
     def outward_broadcast(self, strength : int) -> str:
         if strength >= self.stealth:
@@ -91,8 +163,11 @@ class NPC(Entity):
     def move(self, dx : int, dy : int) -> bool:
         sq = get_square(self.x + dx, self.y + dy)
         if sq is not None and sq.can_npc_enter():
+            old_position = self.get_position()
             self.x += dx
             self.y += dy
+            live_registry().moved(self, old_position)
+            square_moved(self, old_position, self.get_position())
             return True
         return False
     
@@ -131,12 +206,10 @@ class NPC(Entity):
         return ""
     
     def all_subs_in_square(self) -> List[Optional[Submarine]]:
-        subs_in_square = filtered_teams(lambda sub: sub.movement.x == self.x and sub.movement.y == self.y)
-        return list(map(get_sub, subs_in_square))
+        return get_subs_at(self.get_position())
     
-    def all_npcs_in_square(self) -> List[Optional[NPC]]:
-        npcs_in_square = filtered_npcs(lambda npc: npc.x == self.x and npc.y == self.y and npc != self)
-        return list(map(get_npc, npcs_in_square))
+    def all_npcs_in_square(self) -> List[NPC]:
+        return [npc for npc in get_npcs_at(self.get_position()) if npc is not self]
 
     def all_in_square(self) -> List[Entity]:
         """
@@ -166,6 +239,165 @@ class NPC(Entity):
             return None
         return get_sub(self.parent)
 
+@timer_handler
+async def npc_event(owner, method : str):
+    npc = live_registry().get(owner[1])
+    if npc is not None:
+        await getattr(npc, method)()
+
+class Creature(NPC):
+    """
+    A view of one creature in a registry's population, which behaves like
+    any other NPC. Its attributes are read from and written to the columns.
+    """
+    camo = False
+    components = NPC.components | CARBON
+
+    def __init__(self, owner : NPCRegistry, npcid : int):
+        self.registry = owner
+        self.id = npcid
+
+    def species(self):
+        return self.registry.population.species_of(self.id)
+
+    @property
+    def classname(self) -> str:
+        return self.species().classname
+
+    @property
+    def typename(self) -> str:
+        return self.species().typename
+
+    @property
+    def photo(self) -> str:
+        return PHOTO_URL + self.species().photo
+
+    @property
+    def x(self) -> int:
+        return self.registry.population.get(self.id, "x")
+
+    @x.setter
+    def x(self, value : int):
+        self.registry.population.set(self.id, "x", value)
+
+    @property
+    def y(self) -> int:
+        return self.registry.population.get(self.id, "y")
+
+    @y.setter
+    def y(self, value : int):
+        self.registry.population.set(self.id, "y", value)
+
+    @property
+    def health(self) -> int:
+        return self.registry.population.get(self.id, "health")
+
+    @health.setter
+    def health(self, value : int):
+        self.registry.population.set(self.id, "health", value)
+
+    @property
+    def damage_to_apply(self) -> int:
+        return self.registry.population.get(self.id, "damage")
+
+    @damage_to_apply.setter
+    def damage_to_apply(self, value : int):
+        self.registry.population.set(self.id, "damage", value)
+
+    @property
+    def stealth(self) -> int:
+        return self.registry.population.get(self.id, "stealth")
+
+    @property
+    def observant(self) -> bool:
+        return self.registry.population.get(self.id, "observant")
+
+    @observant.setter
+    def observant(self, value : bool):
+        self.registry.population.set(self.id, "observant", value)
+
+    @property
+    def treasure(self) -> List[str]:
+        return self.registry.population.treasure[self.registry.population.row_of[self.id]]
+
+    @property
+    def parent(self) -> Optional[str]:
+        return self.registry.population.parent[self.registry.population.row_of[self.id]]
+
+    def add_parent(self, parent : str):
+        self.registry.population.parent[self.registry.population.row_of[self.id]] = parent
+
+    async def interact(self, sub : Submarine, _) -> str:
+        return self.take_photo(sub)
+
+    async def bite(self, targets : List[Submarine]):
+        """
+        Attacks each of targets, which are in our square.
+        """
+        species = self.species()
+        for sub in targets:
+            await self.do_attack(sub, species.damage, f"{self.name()} {species.message}")
+            if species.classname == "eel":
+                sub.upgrades.add_keyword("shocked", 5, 0)
+
+    async def carry_out(self, actions : List[Tuple[Any, ...]]):
+        """
+        Does what plan (in population.py) decided.
+        """
+        for action in actions:
+            if action[0] == "move":
+                self.move(action[1], action[2])
+            else:
+                await self.bite([get_sub(name) for name in action[1]])
+
+class LocalSurroundings():
+    """
+    The live map and subs, for planning creatures' turns here.
+    """
+    def can_enter(self, x : int, y : int) -> bool:
+        square = get_square(x, y)
+        return square is not None and square.can_npc_enter()
+
+    def subs_within(self, position : Tuple[int, int], dist : int) -> List[Tuple[int, int]]:
+        return [entity.get_position() for entity in all_in_submap(position, dist) if isinstance(entity, Submarine)]
+
+    def subs_at(self, position : Tuple[int, int]) -> List[str]:
+        return [sub._name for sub in get_subs_at(position)]
+
+async def population_tick():
+    """
+    Ticks every creature. Most do nothing in a given turn, and we find those
+    that do all at once, then plan and carry out each of their turns (with
+    the region workers planning if there are any, see world/regions.py).
+    """
+    registry = live_registry()
+    population = registry.population
+    for npcid in population.damaged():
+        creature = registry.get(npcid)
+        if creature is not None:
+            await creature.damage_tick()
+
+    attacking = [npcid for npcid in population.attacking(current_turn()) if npcid not in registry.pending_deaths]
+    sub_positions = list(get_sub_positions())
+    distances = population.distances(attacking, sub_positions)
+    acting = []
+    for (npcid, distance) in zip(attacking, distances):
+        movement = population.species_of(npcid).movement
+        # Wanderers move whether or not there's a sub to reach.
+        if movement == "wander" or distance <= REACH[movement]:
+            acting.append((npcid, movement, (population.get(npcid, "x"), population.get(npcid, "y")), distance))
+    plans = None
+    if regions_enabled() and acting:
+        subs = [(sub._name, position) for position in sub_positions for sub in get_subs_at(position)]
+        plans = await plan_in_regions(acting, subs)
+    for (npcid, movement, position, distance) in acting:
+        creature = registry.lookup(npcid)
+        if plans is None:
+            actions = plan(movement, position, distance, stream(creature.owner(), "npcs"), LocalSurroundings())
+        else:
+            actions = plans[npcid]
+        await creature.carry_out(actions)
+
 npc_types = {}
 
 def load_npc_types():
@@ -176,42 +408,369 @@ def load_npc_types():
     # monsters, non-player characters, and structures such as mines.
     for cl in ALL_NPCS:
         npc_types[cl.classname] = cl
+    for species in SPECIES:
+        npc_types[species.classname] = Creature
+
+def max_activation_radius() -> int:
+    return max([cl.activation_radius for cl in npc_types.values() if cl.activation_radius is not None], default=0)
+
+def is_creature(npctype : str) -> bool:
+    return npctype in SPECIES_IDS
+
+class NPCRegistry():
+    """
+    All NPCs, keyed by ID.
+    IDs are handed out in order and never reused, so an ID stored elsewhere
+    (by Ears, in exclusions or by control) always means the same NPC.
+    We also index NPCs by type, by position and by the squares they watch.
+    The indexes map to dicts rather than sets so that iteration order is
+    always ID order.
+    While NPCs are ticking, spawns and deaths are queued and applied once
+    every NPC has had its turn.
+    Common creatures are kept in a Population rather than as objects (see
+    population.py), and are handed out as Creature views of it, made when
+    first asked for. The indexes cover both.
+    Every live NPC is also in a ComponentStore, shared with the subs.
+    """
+    def __init__(self, components : ComponentStore):
+        self.components = components
+        self.npcs : Dict[int, NPC] = {}
+        self.population = Population()
+        self.views : Dict[int, NPC] = {}
+        self.next_id = 0
+        self.by_type : Dict[str, Dict[int, None]] = {}
+        self.by_position : Dict[Tuple[int, int], Dict[int, None]] = {}
+        self.by_watched : Dict[Tuple[int, int], Dict[int, None]] = {}
+        self.watching : Dict[int, List[Tuple[int, int]]] = {}
+        # NPCs with an activation radius, by whether they're dormant.
+        self.dormant : Dict[int, None] = {}
+        self.wakeful : Dict[int, None] = {}
+        self.ticking = False
+        self.pending_spawns : List[NPC] = []
+        self.pending_creatures : List[Tuple[str, int, int, int, Optional[str]]] = []
+        self.pending_deaths : Dict[int, None] = {}
 
-# All NPCs, listed by ID.
-npcs = []
+    def new_id(self) -> int:
+        npcid = self.next_id
+        self.next_id += 1
+        return npcid
+
+    def ids(self) -> List[int]:
+        npcids = list(self.npcs.keys())
+        if len(self.population.row_of) > 0:
+            npcids = sorted(npcids + self.population.ids())
+        if self.pending_deaths:
+            return [npcid for npcid in npcids if npcid not in self.pending_deaths]
+        return npcids
+
+    def lookup(self, npcid : int) -> NPC:
+        """
+        Finds a live NPC by ID, which must exist.
+        """
+        npc = self.npcs.get(npcid)
+        if npc is not None:
+            return handed_out(npc)
+        # Creatures are copied whole (see utils/snapshot.py).
+        view = self.views.get(npcid)
+        if view is None:
+            view = self.views[npcid] = Creature(self, npcid)
+        return view
+
+    def get(self, npcid : int) -> Optional[NPC]:
+        if npcid in self.pending_deaths:
+            return None
+        if npcid in self.npcs or npcid in self.population:
+            return self.lookup(npcid)
+        return None
+
+    def at(self, position : Tuple[int, int]) -> List[NPC]:
+        return [self.lookup(npcid) for npcid in self.by_position.get(position, ())]
+
+    def awake_ids(self) -> List[int]:
+        return [npcid for npcid in self.ids() if npcid not in self.dormant]
+
+    def watchers(self, square : Tuple[int, int]) -> List[NPC]:
+        return [self.lookup(npcid) for npcid in self.by_watched.get(square, ())
+                if npcid not in self.pending_deaths]
+
+    def of_type(self, classname : str) -> List[NPC]:
+        return [self.lookup(npcid) for npcid in self.by_type.get(classname, ())
+                if npcid not in self.pending_deaths]
+
+    def _index(self, npc : NPC):
+        self.by_type.setdefault(npc.classname, {})[npc.id] = None
+        self.by_position.setdefault(npc.get_position(), {})[npc.id] = None
+        self.components.add(npc)
+        self._watch(npc)
+        if npc.activation_radius is not None:
+            if npc.dormant_since is None:
+                self.wakeful[npc.id] = None
+            else:
+                self.dormant[npc.id] = None
+
+    def _watch(self, npc : NPC):
+        squares = npc.watched_squares()
+        if squares:
+            self.watching[npc.id] = squares
+            for square in squares:
+                self.by_watched.setdefault(square, {})[npc.id] = None
+
+    def _unwatch(self, npcid : int):
+        for square in self.watching.pop(npcid, []):
+            watchers = self.by_watched.get(square)
+            if watchers is not None:
+                watchers.pop(npcid, None)
+                if not watchers:
+                    del self.by_watched[square]
+
+    def _unindex_position(self, npcid : int, position : Tuple[int, int]):
+        here = self.by_position.get(position)
+        if here is not None:
+            here.pop(npcid, None)
+            if not here:
+                del self.by_position[position]
+
+    def add(self, npc : NPC):
+        if self.ticking:
+            self.pending_spawns.append(npc)
+            return
+        self.npcs[npc.id] = npc
+        self._index(npc)
+
+    def add_creature(self, classname : str, npcid : int, x : int, y : int, parent : Optional[str]):
+        if self.ticking:
+            self.pending_creatures.append((classname, npcid, x, y, parent))
+            return
+        self.population.spawn(classname, npcid, x, y, parent, current_turn())
+        self._index(self.lookup(npcid))
+
+    def load_creature(self, dictionary : Dict[str, Any]):
+        """
+        Adds a creature from npc_to_dict.
+        """
+        self.population.from_dict(dictionary, current_turn())
+        self._index(self.lookup(dictionary["id"]))
+
+    def adopt(self, population : Population):
+        """
+        Takes population as our creatures, in place of any we had.
+        """
+        for npcid in self.population.ids():
+            self._unindex_position(npcid, self.lookup(npcid).get_position())
+            self.by_type.get(self.lookup(npcid).classname, {}).pop(npcid, None)
+            self.components.remove(("npc", npcid))
+        self.population = population
+        self.views = {}
+        for npcid in population.ids():
+            self._index(self.lookup(npcid))
+
+    def remove(self, npcid : int) -> bool:
+        for npc in self.pending_spawns:
+            if npc.id == npcid:
+                self.pending_spawns.remove(npc)
+                return True
+        for spawn in self.pending_creatures:
+            if spawn[1] == npcid:
+                self.pending_creatures.remove(spawn)
+                return True
+        npc = self.get(npcid)
+        if npc is None:
+            return False
+        # Nobody can find a dying NPC, even before the queue is flushed.
+        self._unindex_position(npcid, npc.get_position())
+        self._unwatch(npcid)
+        self.components.remove(npc.owner())
+        if self.ticking:
+            self.pending_deaths[npcid] = None
+            return True
+        self._forget(npcid)
+        return True
+
+    def _forget(self, npcid : int):
+        classname = self.lookup(npcid).classname
+        if npcid in self.npcs:
+            del self.npcs[npcid]
+        else:
+            self.population.remove(npcid)
+            self.views.pop(npcid, None)
+        self.dormant.pop(npcid, None)
+        self.wakeful.pop(npcid, None)
+        of_type = self.by_type.get(classname)
+        if of_type is not None:
+            of_type.pop(npcid, None)
+
+    def moved(self, npc : NPC, old_position : Tuple[int, int]):
+        if self.get(npc.id) is not npc:
+            return
+        self._unindex_position(npc.id, old_position)
+        self.by_position.setdefault(npc.get_position(), {})[npc.id] = None
+        self._unwatch(npc.id)
+        self._watch(npc)
+        self.components.moved(npc)
+
+    def begin_tick(self):
+        self.ticking = True
+
+    def end_tick(self):
+        self.ticking = False
+        for npcid in self.pending_deaths:
+            self._forget(npcid)
+        self.pending_deaths = {}
+        spawns, self.pending_spawns = self.pending_spawns, []
+        for npc in spawns:
+            self.add(npc)
+        creatures, self.pending_creatures = self.pending_creatures, []
+        for creature in creatures:
+            self.add_creature(*creature)
+
+    def replace_all(self, new_npcs : List[NPC], next_id : int):
+        self.components.remove_kind("npc")
+        self.npcs = {}
+        self.population = Population()
+        self.views = {}
+        self.by_type = {}
+        self.by_position = {}
+        self.by_watched = {}
+        self.watching = {}
+        self.dormant = {}
+        self.wakeful = {}
+        self.pending_spawns = []
+        self.pending_creatures = []
+        self.pending_deaths = {}
+        for npc in new_npcs:
+            self.add(npc)
+        self.next_id = next_id
+
+live_registry = game_part("npcs", lambda: NPCRegistry(live_store()))
 
 def get_npc_types() -> List[str]:
     return list(npc_types.keys())
 
 def get_npcs() -> List[int]:
-    return list(range(len(npcs)))
+    return live_registry().ids()
+
+def current_registry() -> NPCRegistry:
+    """
+    The live registry, unless we're serving a read-only command from the
+    published snapshot (see utils/snapshot.py).
+    """
+    view = reading.get()
+    return live_registry() if view is None else view.registry
+
+def get_npcs_at(position : Tuple[int, int]) -> List[NPC]:
+    return current_registry().at(position)
+
+def get_npc_positions() -> List[Tuple[int, int]]:
+    """
+    Gets every square that has at least one NPC in it.
+    """
+    return list(current_registry().by_position.keys())
+
+def get_npcs_of_type(classname : str) -> List[NPC]:
+    return live_registry().of_type(classname)
 
 async def kill_npc(id : int, rattle : bool = True) -> bool:
-    if id in range(len(npcs)):
-        if rattle: await npcs[id].deathrattle()
-        del npcs[id]
-        return True
-    return False
+    registry = live_registry()
+    npc = registry.get(id)
+    if npc is None:
+        return False
+    if rattle: await npc.deathrattle()
+    cancel_owner(npc.owner())
+    return registry.remove(id)
+
+def catch_up(timer : Dict[str, Any], turns : int) -> Dict[str, Any]:
+    """
+    Where an encoded timer would be after turns more turns.
+    """
+    due = timer["in"] - turns
+    if due < 1:
+        due = 1 if timer["period"] is None else (due - 1) % timer["period"] + 1
+    return dict(timer, **{"in": due})
+
+def sleep(npc : NPC, turn : int):
+    registry = live_registry()
+    npc.dormant_since = turn
+    npc.dormant_timers = encode_owner(npc.owner())
+    cancel_owner(npc.owner())
+    registry.wakeful.pop(npc.id, None)
+    registry.dormant[npc.id] = None
+
+def wake(npc : NPC, turn : int):
+    registry = live_registry()
+    turns = turn - npc.dormant_since
+    timers = npc.dormant_timers
+    npc.dormant_since = None
+    npc.dormant_timers = []
+    registry.dormant.pop(npc.id, None)
+    registry.wakeful[npc.id] = None
+    decode_owner(npc.owner(), [catch_up(timer, turns) for timer in timers])
+    npc.fast_forward(turns)
+
+def npcs_near_subs() -> Dict[int, None]:
+    """
+    Every NPC with a sub within its activation radius. We only look at the
+    squares around each sub, so this doesn't depend on how many NPCs there are.
+    """
+    registry = live_registry()
+    near : Dict[int, None] = {}
+    reach = max_activation_radius()
+    for (x, y) in list(get_sub_positions()):
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                for npcid in registry.by_position.get((x + dx, y + dy), ()):
+                    # Creatures are cheap enough to never sleep.
+                    npc = registry.npcs.get(npcid)
+                    if npc is None:
+                        continue
+                    radius = npc.activation_radius
+                    if radius is not None and max(abs(dx), abs(dy)) <= radius:
+                        near[npcid] = None
+    return near
+
+def update_dormancy(turn : int):
+    """
+    Sends NPCs far from every sub to sleep, and wakes those a sub has come near.
+    """
+    registry = live_registry()
+    near = npcs_near_subs()
+    for npcid in list(registry.wakeful):
+        npc = registry.lookup(npcid)
+        # Damage is only dealt when we tick, so we wait for it first.
+        if npcid not in near and npc.damage_to_apply == 0:
+            sleep(npc, turn)
+    for npcid in near:
+        if npcid in registry.dormant:
+            wake(registry.lookup(npcid), turn)
 
 async def npc_tick():
-    for npc in npcs:
-        await npc.on_tick()
+    registry = live_registry()
+    update_dormancy(current_turn())
+    registry.begin_tick()
+    try:
+        for npcid in registry.awake_ids():
+            npc = registry.get(npcid)
+            if npc is not None:
+                await npc.on_tick()
+        await population_tick()
+        # Then anything they have on a timer.
+        await fire("npcs")
+    finally:
+        registry.end_tick()
 
 def filtered_npcs(pred : Callable[[NPC], bool]) -> List[int]:
     """
     Gets all names of npcs that satisfy some predicate.
     """
+    registry = live_registry()
     result = []
-    for index in range(len(npcs)):
-        if pred(npcs[index]):
-            result.append(index)
+    for npcid in registry.ids():
+        if pred(registry.lookup(npcid)):
+            result.append(npcid)
     return result
 
 async def interact_in_square(sub : Submarine, square : Tuple[int, int], arg) -> str:
-    in_square = filtered_npcs(lambda npc: (npc.x, npc.y) == square)
     message = ""
-    for npcid in in_square:
-        npc = get_npc(npcid)
+    for npc in get_npcs_at(square):
         if sub.power.get_power("scanners") >= npc.stealth:
             npc_message = await npc.interact(sub, arg)
             if npc_message != "":
@@ -219,34 +778,87 @@ async def interact_in_square(sub : Submarine, square : Tuple[int, int], arg) ->
     return message
 
 def get_npc(npcid : int) -> Optional[NPC]:
-    if npcid in get_npcs():
-        return npcs[npcid]
-    return None
+    return live_registry().get(npcid)
 
 def add_npc(npctype : str, x : int, y : int, sub : Optional[str]):
+    registry = live_registry()
     if not in_world(x, y):
         return "Cannot place an NPC outside of the map."
+    if is_creature(npctype):
+        id = registry.new_id()
+        registry.add_creature(npctype, id, x, y, sub)
+        return f"Created NPC #{id} of type {npctype.title()}!"
     if npctype in npc_types:
-        id = len(npcs)
+        id = registry.new_id()
         new_npc = npc_types[npctype](id, x, y)
         if sub is not None:
             new_npc.add_parent(sub)
-        npcs.append(new_npc)
+        registry.add(new_npc)
+        new_npc.start_timers()
         return f"Created NPC #{id} of type {npctype.title()}!"
     return "That NPC type does not exist."
 
-def npcs_to_json() -> List[Dict[str, Any]]:
-    npcs_list = []
-    for npc in npcs:
-        npcs_list.append(npc.__dict__.copy())
-        npcs_list[-1]["classname"] = npc.classname
-    return npcs_list
-
-def npcs_from_json(json : List[Dict[str, Any]]):
-    global npcs
-    npcs = []
-    for npc in json:
-        new_npc = npc_types[npc["classname"]](0, 0, 0)
-        del npc["classname"]
-        new_npc.__dict__ = npc
-        npcs.append(new_npc)
\ No newline at end of file
+def restore_npc(dictionary : Dict[str, Any]):
+    """
+    Puts an NPC (from npc_to_dict) back into the world, along with its timers,
+    replacing the NPC with its ID if it exists.
+    """
+    registry = live_registry()
+    registry.remove(dictionary["id"])
+    registry.next_id = max(registry.next_id, dictionary["id"] + 1)
+    if is_creature(dictionary["classname"]):
+        registry.load_creature(dictionary)
+        return
+    npc = npc_from_dict(dictionary)
+    registry.add(npc)
+    restore_timers(npc, dictionary)
+
+def npc_to_dict(npc : NPC) -> Dict[str, Any]:
+    if isinstance(npc, Creature):
+        return npc.registry.population.to_dict(npc.id, current_turn())
+    dictionary = npc.__dict__.copy()
+    dictionary["classname"] = npc.classname
+    dictionary["timers"] = encode_owner(npc.owner())
+    return dictionary
+
+def npc_from_dict(dictionary : Dict[str, Any]) -> NPC:
+    """
+    Makes an NPC from npc_to_dict, without its timers (see restore_timers).
+    """
+    new_npc = npc_types[dictionary["classname"]](0, 0, 0)
+    new_npc.__dict__ = {key: dictionary[key] for key in dictionary if key not in ["classname", "timers", "tick_count"]}
+    return new_npc
+
+def restore_timers(npc : NPC, dictionary : Dict[str, Any]):
+    """
+    Older saves counted turns in tick_count instead of having timers.
+    """
+    if "timers" in dictionary:
+        decode_owner(npc.owner(), dictionary["timers"])
+    else:
+        cancel_owner(npc.owner())
+        npc.start_timers(dictionary.get("tick_count", 0))
+
+def npcs_to_json() -> Dict[str, Any]:
+    registry = live_registry()
+    npcs_list = [npc_to_dict(registry.lookup(npcid)) for npcid in registry.ids()]
+    return {"next_id": registry.next_id, "npcs": npcs_list}
+
+def npcs_from_json(json : Any):
+    """
+    Overwrites all NPCs with those from npcs_to_json.
+    Older saves are a plain list, where an NPC's ID was its position in it.
+    """
+    registry = live_registry()
+    if isinstance(json, list):
+        json = {"npcs": [dict(npc, id=index) for index, npc in enumerate(json)]}
+    bespoke = [dictionary for dictionary in json["npcs"] if not is_creature(dictionary["classname"])]
+    new_npcs = list(map(npc_from_dict, bespoke))
+    next_id = json.get("next_id", max([dictionary["id"] + 1 for dictionary in json["npcs"]], default=0))
+    registry.replace_all(new_npcs, next_id)
+    for dictionary in json["npcs"]:
+        if is_creature(dictionary["classname"]):
+            registry.load_creature(dictionary)
+    cancel_kind("npc")
+    for (npc, dictionary) in zip(new_npcs, bespoke):
+        restore_timers(npc, dictionary)
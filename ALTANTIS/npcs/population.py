@@ -0,0 +1,289 @@
+"""
+Stores the common creatures (squid, sharks, eels and so on) as columns of
+numbers rather than one object each, so that thousands of them cost very
+little per turn.
+These creatures only differ in their stats, how often they attack and how
+they move, so each kind is a row of SPECIES rather than a class. Which
+creatures attack, and how far each is from the nearest sub, is worked out for
+all of them at once; only those that actually do something are then handled
+one by one (see population_tick in npc.py, which also gives each creature an
+NPC view so the rest of the game needn't know the difference).
+NumPy is optional: without it, the columns are plain lists and the same
+questions are answered with loops, which gives the same results but slower.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+
+from ALTANTIS.utils.consts import CURRENCY_NAME, RESOURCES
+from ALTANTIS.utils.rng import stream
+from ALTANTIS.utils.direction import diagonal_distance, determine_direction, go_in_direction, rotate_direction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PHOTO_URL = "https://www.warwicktabletop.co.uk/static/megagame/2020/"
+
+# Never attacks.
+NEVER = 2 ** 62
+
+class Species():
+    def __init__(self, classname : str, typename : str, health : int, treasure : List[str], stealth : int,
+                 period : int, damage : int, message : str, movement : str, photo : str):
+        self.classname = classname
+        self.typename = typename
+        self.health = health
+        # RESOURCE is replaced by a random resource when the creature spawns.
+        self.treasure = treasure
+        self.stealth = stealth
+        # How many turns between attacks (0 for never).
+        self.period = period
+        self.damage = damage
+        self.message = message
+        # "still" attacks where it is, "wander" moves randomly before
+        # attacking, and "hunt" moves towards a sub in range first, then
+        # away after biting.
+        self.movement = movement
+        self.photo = photo
+
+RESOURCE = "RESOURCE"
+
+SPECIES : List[Species] = [
+    Species("squid", "Squid", 2, [CURRENCY_NAME], 0, 4, 1, "blooped you for one damage!", "still", "squid.png"),
+    Species("giant_squid", "Giant Squid", 3, [CURRENCY_NAME, CURRENCY_NAME], 0, 3, 1, "blooped you for one damage!", "still", "giant-squid.png"),
+    Species("octopus", "Giant Octopus", 1, [RESOURCE], 0, 3, 2, "constricted you for one damage!", "still", "giant-octopus.png"),
+    Species("shark", "Shark", 2, [RESOURCE], 0, 4, 1, "snapped you for one damage!", "hunt", ""),
+    Species("hammerhead", "Hammerhead Shark", 2, [RESOURCE], 0, 4, 1, "snapped you for one damage!", "hunt", "hammerhead.png"),
+    Species("bullshark", "Bull Shark", 2, [RESOURCE], 0, 4, 1, "snapped you for one damage!", "hunt", "bull-shark.png"),
+    Species("orca", "Orca", 2, [RESOURCE], 0, 4, 1, "snapped you for one damage!", "hunt", "orca.png"),
+    Species("eel", "Giant Eel", 2, [RESOURCE], 0, 3, 1, "zapped you for one damage and (temporarily) shocked your submarine!", "wander", "electric-eel.png"),
+    Species("angler", "Angler Fish", 2, [CURRENCY_NAME, RESOURCE], 2, 3, 1, "jumped out from hiding and did 1 damage!", "still", "angler-fish.png"),
+    Species("jellyfish", "Jellyfish", 1, [], 2, 0, 0, "", "still", "giant-jellyfish.png")
+]
+SPECIES_IDS : Dict[str, int] = {species.classname: index for (index, species) in enumerate(SPECIES)}
+
+# How far a hunter looks for subs.
+HUNT_RANGE = 4
+# How far from a sub each kind of creature can be and still reach it.
+REACH : Dict[str, int] = {"still": 0, "wander": 1, "hunt": HUNT_RANGE}
+
+# Each numeric column and its NumPy type.
+COLUMNS : Dict[str, str] = {
+    "id": "int64", "x": "int32", "y": "int32", "health": "int32", "damage": "int32",
+    "species": "int16", "stealth": "int16", "observant": "bool", "next_attack": "int64"
+}
+
+class Population():
+    def __init__(self):
+        self.size = 0
+        self.capacity = 0
+        self.columns : Dict[str, Any] = {}
+        for column in COLUMNS:
+            self.columns[column] = np.zeros(0, dtype=COLUMNS[column]) if np is not None else []
+        # Lists aren't numbers, so these are kept as plain lists.
+        self.treasure : List[List[str]] = []
+        self.parent : List[Optional[str]] = []
+        self.row_of : Dict[int, int] = {}
+
+    def __contains__(self, npcid : int) -> bool:
+        return npcid in self.row_of
+
+    def ids(self) -> List[int]:
+        return list(self.row_of.keys())
+
+    def get(self, npcid : int, column : str) -> Any:
+        value = self.columns[column][self.row_of[npcid]]
+        return bool(value) if column == "observant" else int(value)
+
+    def set(self, npcid : int, column : str, value : Any):
+        self.columns[column][self.row_of[npcid]] = value
+
+    def species_of(self, npcid : int) -> Species:
+        return SPECIES[self.get(npcid, "species")]
+
+    def _grow(self):
+        self.capacity = max(16, self.capacity * 2)
+        for column in COLUMNS:
+            grown = np.zeros(self.capacity, dtype=COLUMNS[column])
+            grown[:self.size] = self.columns[column][:self.size]
+            self.columns[column] = grown
+
+    def add(self, values : Dict[str, Any], treasure : List[str], parent : Optional[str]):
+        if np is not None:
+            if self.size == self.capacity:
+                self._grow()
+            for column in COLUMNS:
+                self.columns[column][self.size] = values[column]
+        else:
+            for column in COLUMNS:
+                self.columns[column].append(values[column])
+        self.treasure.append(treasure)
+        self.parent.append(parent)
+        self.row_of[values["id"]] = self.size
+        self.size += 1
+
+    def spawn(self, classname : str, npcid : int, x : int, y : int, parent : Optional[str], turn : int):
+        species = SPECIES[SPECIES_IDS[classname]]
+        rng = stream(("npc", npcid), "spawn")
+        treasure = [rng.choice(RESOURCES) if item == RESOURCE else item for item in species.treasure]
+        self.add({
+            "id": npcid, "x": x, "y": y, "health": species.health, "damage": 0,
+            "species": SPECIES_IDS[classname], "stealth": species.stealth, "observant": False,
+            "next_attack": turn + species.period if species.period else NEVER
+        }, treasure, parent)
+
+    def remove(self, npcid : int):
+        """
+        Removes a creature by moving the last row into its place.
+        """
+        row = self.row_of.pop(npcid)
+        last = self.size - 1
+        if row != last:
+            for column in COLUMNS:
+                self.columns[column][row] = self.columns[column][last]
+            self.treasure[row] = self.treasure[last]
+            self.parent[row] = self.parent[last]
+            self.row_of[int(self.columns["id"][row])] = row
+        if np is None:
+            for column in COLUMNS:
+                self.columns[column].pop()
+        self.treasure.pop()
+        self.parent.pop()
+        self.size -= 1
+
+    def copy(self) -> "Population":
+        other = Population()
+        other.size = self.size
+        other.capacity = self.size
+        for column in COLUMNS:
+            other.columns[column] = self.columns[column][:self.size].copy() if np is not None else list(self.columns[column])
+        other.treasure = [list(treasure) for treasure in self.treasure]
+        other.parent = list(self.parent)
+        other.row_of = dict(self.row_of)
+        return other
+
+    def to_dict(self, npcid : int, turn : int) -> Dict[str, Any]:
+        """
+        The same shape as npc_to_dict gives for any other NPC, so that saves
+        and history don't care where a creature was kept.
+        """
+        species = self.species_of(npcid)
+        timers = []
+        if species.period:
+            timers.append({"handler": "npc_event", "in": max(1, self.get(npcid, "next_attack") - turn), "period": species.period,
+                           "args": ["attack"], "label": "", "phase": "npcs"})
+        return {
+            "classname": species.classname, "id": npcid, "x": self.get(npcid, "x"), "y": self.get(npcid, "y"),
+            "health": self.get(npcid, "health"), "damage_to_apply": self.get(npcid, "damage"),
+            "stealth": self.get(npcid, "stealth"), "observant": self.get(npcid, "observant"),
+            "treasure": list(self.treasure[self.row_of[npcid]]), "parent": self.parent[self.row_of[npcid]],
+            "timers": timers
+        }
+
+    def from_dict(self, dictionary : Dict[str, Any], turn : int):
+        """
+        Loads a creature from to_dict, or from a save made when it was an
+        object of its own (with a tick_count or timers).
+        """
+        species = SPECIES[SPECIES_IDS[dictionary["classname"]]]
+        next_attack = NEVER
+        if species.period:
+            next_attack = turn + species.period - dictionary.get("tick_count", 0) % species.period
+            for timer in dictionary.get("timers", []):
+                if timer["args"] == ["attack"]:
+                    next_attack = turn + max(1, timer["in"])
+        self.add({
+            "id": dictionary["id"], "x": dictionary["x"], "y": dictionary["y"],
+            "health": dictionary.get("health", species.health), "damage": dictionary.get("damage_to_apply", 0),
+            "species": SPECIES_IDS[species.classname], "stealth": dictionary.get("stealth", species.stealth),
+            "observant": dictionary.get("observant", False), "next_attack": next_attack
+        }, list(dictionary.get("treasure", [])), dictionary.get("parent"))
+
+    def damaged(self) -> List[int]:
+        """
+        The IDs of every creature with damage waiting to be dealt.
+        """
+        if np is not None:
+            rows = np.nonzero(self.columns["damage"][:self.size] > 0)[0]
+            return self.columns["id"][rows].tolist()
+        return [self.columns["id"][row] for row in range(self.size) if self.columns["damage"][row] > 0]
+
+    def attacking(self, turn : int) -> List[int]:
+        """
+        The IDs of every creature attacking this turn, in ID order, moving on
+        each one's next attack.
+        """
+        periods = [species.period for species in SPECIES]
+        if np is not None:
+            next_attack = self.columns["next_attack"][:self.size]
+            rows = np.nonzero(next_attack <= turn)[0]
+            next_attack[rows] = turn + np.asarray(periods, dtype="int64")[self.columns["species"][rows]]
+            return sorted(self.columns["id"][rows].tolist())
+        due = []
+        for row in range(self.size):
+            if self.columns["next_attack"][row] <= turn:
+                self.columns["next_attack"][row] = turn + periods[self.columns["species"][row]]
+                due.append(self.columns["id"][row])
+        return sorted(due)
+
+    def distances(self, npcids : List[int], positions : List[Tuple[int, int]]) -> List[int]:
+        """
+        How far (diagonally) each creature is from the nearest of positions.
+        """
+        if not positions:
+            return [NEVER] * len(npcids)
+        rows = [self.row_of[npcid] for npcid in npcids]
+        if np is not None:
+            xs = self.columns["x"][rows].astype("int64")
+            ys = self.columns["y"][rows].astype("int64")
+            nearest = np.full(len(rows), NEVER, dtype="int64")
+            for (x, y) in positions:
+                nearest = np.minimum(nearest, np.maximum(np.abs(xs - x), np.abs(ys - y)))
+            return nearest.tolist()
+        return [min(max(abs(self.columns["x"][row] - x), abs(self.columns["y"][row] - y)) for (x, y) in positions) for row in rows]
+
+def plan(movement : str, position : Tuple[int, int], distance : int, rng, surroundings) -> List[Tuple[Any, ...]]:
+    """
+    What an attacking creature does this turn, given how it moves and how far
+    it is from the nearest sub: a list of steps ("move", dx, dy) and bites
+    ("bite", names of the subs bitten), to be carried out in order.
+    surroundings answers can_enter(x, y), subs_within(position, dist) (their
+    positions, by name) and subs_at(position) (their names), so that this
+    gives the same plan here as in a region's worker (see world/regions.py).
+    """
+    actions : List[Tuple[Any, ...]] = []
+    (x, y) = position
+    def step(dx : int, dy : int) -> bool:
+        nonlocal x, y
+        if not surroundings.can_enter(x + dx, y + dy):
+            return False
+        (x, y) = (x + dx, y + dy)
+        actions.append(("move", dx, dy))
+        return True
+
+    if movement == "wander":
+        step(rng.choice([-1,0,1]), rng.choice([-1,0,1]))
+    # Nothing more to do unless we can reach a sub.
+    if distance > REACH[movement]:
+        return actions
+    if movement == "hunt":
+        # Towards the closest sub in range, or either side of it.
+        closest : Tuple[Optional[Tuple[int, int]], int] = (None, 0)
+        for sub_position in surroundings.subs_within((x, y), HUNT_RANGE):
+            this_dist = diagonal_distance((x, y), sub_position)
+            if closest[0] is None or this_dist < closest[1]:
+                closest = (sub_position, this_dist)
+        direction = determine_direction((x, y), closest[0]) if closest[0] is not None else None
+        if direction is not None:
+            rotated = rotate_direction(direction)
+            directions = [direction] + (list(rotated) if rotated is not None else [])
+            for possible_direction in directions:
+                if step(*go_in_direction(possible_direction)):
+                    break
+    targets = surroundings.subs_at((x, y))
+    if targets:
+        actions.append(("bite", targets))
+        if movement == "hunt":
+            step(rng.choice([-1,0,1]), rng.choice([-1,0,1]))
+    return actions
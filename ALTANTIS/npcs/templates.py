@@ -2,131 +2,43 @@
 All possible NPC types.
 """
 
-import random
-
 from ALTANTIS.utils.consts import CURRENCY_NAME, RESOURCES
 from ALTANTIS.utils.control import notify_news
+from ALTANTIS.utils.rng import stream
 from ALTANTIS.world.world import get_square
 from ALTANTIS.world.extras import all_in_submap, explode
+from ALTANTIS.world.components import CARBON
 from ALTANTIS.npcs.npc import NPC, add_npc
+from ALTANTIS.npcs.population import PHOTO_URL
+from ALTANTIS.subs.sub import Submarine
 
 # TODO: Large Storm Generator
 
 class PhotographableNPC(NPC):
+    # Creatures only bother subs in their own square, so they can sleep
+    # until one is nearly there.
+    activation_radius = 2
+    components = NPC.components | CARBON
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
-        self.photo = "https://www.warwicktabletop.co.uk/static/megagame/2020/"
+        self.photo = PHOTO_URL
 
     async def interact(self, sub, _) -> str:
         return self.take_photo(sub)
-    
-    def is_carbon(self) -> bool:
-        return True
-
-class Squid(PhotographableNPC):
-    classname = "squid"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.tick_count = 0
-        self.health = 2
-        self.treasure = [CURRENCY_NAME]
-        self.photo += "squid.png"
-    
-    async def attack(self):
-        if self.tick_count >= 3:
-            self.tick_count -= 3
-            for sub in self.all_subs_in_square():
-                await self.do_attack(sub, 1, f"{self.name()} blooped you for one damage!")
-        else:
-            self.tick_count += 1
-
-class BigSquid(PhotographableNPC):
-    classname = "giant_squid"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.tick_count = 0
-        self.health = 3
-        self.treasure = [CURRENCY_NAME, CURRENCY_NAME]
-        self.typename = "Giant Squid"
-        self.photo += "giant-squid.png"
-
-    async def attack(self):
-        if self.tick_count >= 2:
-            self.tick_count -= 2
-            for sub in self.all_subs_in_square():
-                await self.do_attack(sub, 1, f"{self.name()} blooped you for one damage!")
-        else:
-            self.tick_count += 1
-
-class Octopus(PhotographableNPC):
-    classname = "octopus"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.tick_count = 0
-        self.health = 1
-        self.treasure = [random.choice(RESOURCES)]
-        self.typename = "Giant Octopus"
-        self.photo += "giant-octopus.png"
-
-    async def attack(self):
-        if self.tick_count >= 2:
-            self.tick_count -= 2
-            for sub in self.all_subs_in_square():
-                await self.do_attack(sub, 2, f"{self.name()} constricted you for one damage!")
-        else:
-            self.tick_count += 1
-
-class Shark(PhotographableNPC):
-    classname = "shark"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.tick_count = 0
-        self.health = 2
-        self.treasure = [random.choice(RESOURCES)]
-    
-    async def attack(self):
-        if self.tick_count >= 3:
-            self.tick_count -= 3
-            self.move_towards_sub(4)
-            targets = self.all_subs_in_square()
-            for sub in targets:
-                await self.do_attack(sub, 1, f"{self.name()} snapped you for one damage!")
-            if len(targets) > 0:
-                self.move(random.choice([-1,0,1]), random.choice([-1,0,1]))
-        else:
-            self.tick_count += 1
-
-class Hammerhead(Shark):
-    classname = "hammerhead"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.typename = "Hammerhead Shark"
-        self.photo += "hammerhead.png"
-
-class Bull(Shark):
-    classname = "bullshark"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.typename = "Bull Shark"
-        self.photo += "bull-shark.png"
-
-class Orca(Shark):
-    classname = "orca"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.photo += "orca.png"
 
 class Whale(PhotographableNPC):
     classname = "whale"
+    watches_square = True
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 5
         self.treasure = [CURRENCY_NAME] * 3
 
-    async def on_tick(self):
-        await super().on_tick()
-        for sub in self.all_subs_in_square():
-            await sub.send_message(f"{self.name()} is having a _whale_ of a time.", "captain")
+    async def on_enter(self, entity):
+        if isinstance(entity, Submarine):
+            await entity.send_message(f"{self.name()} is having a _whale_ of a time.", "captain")
+
+    on_stay = on_enter
 
 class WhaleShark(Whale):
     classname = "whaleshark"
@@ -159,7 +71,7 @@ class MantaRay(PhotographableNPC):
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 2
-        self.treasure = [random.choice(RESOURCES)] * 2
+        self.treasure = [stream(self.owner(), "spawn").choice(RESOURCES)] * 2
         self.typename = "Manta Ray"
         self.photo += "manta-ray.png"
     
@@ -199,94 +111,45 @@ class Turtle(PhotographableNPC):
         for location in locations:
             add_npc("squid", location[0], location[1], None)
 
-class Eel(PhotographableNPC):
-    classname = "eel"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.health = 2
-        self.treasure = [random.choice(RESOURCES)]
-        self.tick_count = 0
-        self.typename = "Giant Eel"
-        self.photo += "electric-eel.png"
-    
-    async def attack(self):
-        if self.tick_count >= 2:
-            self.tick_count -= 2
-            # First, move randomly:
-            self.move(random.choice([-1,0,1]), random.choice([-1,0,1]))
-            # Then attack:
-            for sub in self.all_subs_in_square():
-                await self.do_attack(sub, 1, f"{self.name()} zapped you for one damage and (temporarily) shocked your submarine!")
-                sub.upgrades.add_keyword("shocked", 5, 0)
-        else:
-            self.tick_count += 1
-
-class AnglerFish(PhotographableNPC):
-    classname = "angler"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.tick_count = 0
-        self.health = 2
-        self.treasure = [CURRENCY_NAME, random.choice(RESOURCES)]
-        self.stealth = 2
-        self.typename = "Angler Fish"
-        self.photo += "angler-fish.png"
-
-    async def attack(self):
-        if self.tick_count >= 2:
-            self.tick_count -= 2
-            for sub in self.all_subs_in_square():
-                await self.do_attack(sub, 1, f"{self.name()} jumped out from hiding and did 1 damage!")
-        else:
-            self.tick_count += 1
-
 class Urchin(PhotographableNPC):
     classname = "urchin"
+    watches_square = True
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 2
-        self.treasure = [random.choice(RESOURCES)]
+        self.treasure = [stream(self.owner(), "spawn").choice(RESOURCES)]
         self.stealth = 1
         self.observant = True
-        # Which subs were in this square previously.
-        self.visited = []
         self.photo += "giant-sea-urchin.png"
-    
-    async def attack(self):
-        new_visited = []
-        for sub in self.all_subs_in_square():
-            new_visited.append(sub.name)
-            if sub.name not in self.visited:
-                await self.do_attack(sub, 1, f"{self.name()} jumped out from hiding and did 1 damage on your arrival!")
-        self.visited = new_visited
+
+    async def on_enter(self, entity):
+        if isinstance(entity, Submarine):
+            await self.do_attack(entity, 1, f"{self.name()} jumped out from hiding and did 1 damage on your arrival!")
 
 class Crab(PhotographableNPC):
     classname = "crab"
+    watches_square = True
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.treasure = ["crab meat"]
         self.typename = "Giant Crab"
         self.photo += "giant-crab.png"
-    
-    async def attack(self):
-        for sub in self.all_subs_in_square():
-            if sub.inventory.crane_down:
-                # Snip the crane lead and otherwise mess it up.
-                if await self.do_attack(sub, 2, f"{self.name()} snipped at your crane cable and caused a balance issue, dealing two damage!"):
-                    sub.upgrades.add_keyword("snipped")
-                    message = sub.inventory.crane_falters()
-                    if message:
-                        await sub.send_message(message, "captain")
-
-class Jellyfish(PhotographableNPC):
-    classname = "jellyfish"
-    def __init__(self, id, x, y):
-        super().__init__(id, x, y)
-        self.stealth = 2
-        self.photo += "giant-jellyfish.png"
+
+    async def on_enter(self, entity):
+        if isinstance(entity, Submarine) and entity.inventory.crane_down:
+            # Snip the crane lead and otherwise mess it up.
+            if await self.do_attack(entity, 2, f"{self.name()} snipped at your crane cable and caused a balance issue, dealing two damage!"):
+                entity.upgrades.add_keyword("snipped")
+                message = entity.inventory.crane_falters()
+                if message:
+                    await entity.send_message(message, "captain")
+
+    on_stay = on_enter
 
 class DeepOne(NPC):
     classname = "deepone"
+    activation_radius = 5
+    components = NPC.components | CARBON
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 5
@@ -295,11 +158,8 @@ class DeepOne(NPC):
         self.move_towards_sub(4)
         targets = self.all_subs_in_square()
         for sub in targets:
-            if not "culty" in sub.upgrades.keywords:
+            if not sub.upgrades.has("culty"):
                 await self.do_attack(sub, 1, f"{self.name()} did one eldrich damage!")
-    
-    def is_carbon(self) -> bool:
-        return True
 
 class Ears(NPC):
     classname = "ears"
@@ -343,19 +203,24 @@ class NewsBouy(NPC):
 
 class Mine(NPC):
     classname = "mine"
+    watches_square = True
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.countdown = 10
         self.stealth = 1
 
-    async def attack(self):
-        for sub in self.all_subs_in_square():
-            if self.countdown <= 0:
-                self.damage(1)
-            else:
-                self.countdown -= 1
-                for sub in self.all_subs_in_square():
-                    await sub.send_message(str(self.countdown), "captain")
+    async def on_enter(self, entity):
+        # Counts down once a turn for each sub in the square.
+        if not isinstance(entity, Submarine):
+            return
+        if self.countdown <= 0:
+            self.damage(1)
+        else:
+            self.countdown -= 1
+            for sub in self.all_subs_in_square():
+                await sub.send_message(str(self.countdown), "captain")
+
+    on_stay = on_enter
     
     async def deathrattle(self):
         await explode(self.get_position(), 2)
@@ -378,30 +243,26 @@ class StormGenerator(NPC):
 
 class RoughSeasGenerator(NPC):
     classname = "rougher"
+    periodic = {"spread": 2}
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.storm_dist = 0
-        self.tick_count = 0
         self.stealth = 13
         self.health = 100
 
-    async def on_tick(self):
-        await super().on_tick()
-        self.tick_count += 1
-        if self.tick_count >= 2:
-            self.tick_count -= 2
-            # Make all squares which are storm_dist away rough seas.
-            # Because we use diagonal distance, this is a square perimeter.
-            sd = self.storm_dist
-            corners = [(sd, sd), (-sd, -sd)]
-            for corner in corners:
-                for x in range(-sd, sd+1):
-                    sq = get_square(self.x+x, self.y+corner[1])
-                    if sq: sq.add_attribute("weather", "rough")
-                for y in range(-sd, sd+1):
-                    sq = get_square(self.x+corner[0], self.y+y)
-                    if sq: sq.add_attribute("weather", "rough")
-            self.storm_dist += 1
+    async def spread(self):
+        # Make all squares which are storm_dist away rough seas.
+        # Because we use diagonal distance, this is a square perimeter.
+        sd = self.storm_dist
+        corners = [(sd, sd), (-sd, -sd)]
+        for corner in corners:
+            for x in range(-sd, sd+1):
+                sq = get_square(self.x+x, self.y+corner[1])
+                if sq: sq.add_attribute("weather", "rough")
+            for y in range(-sd, sd+1):
+                sq = get_square(self.x+corner[0], self.y+y)
+                if sq: sq.add_attribute("weather", "rough")
+        self.storm_dist += 1
     
     async def deathrattle(self):
         await super().deathrattle()
@@ -415,7 +276,7 @@ class Trader(NPC):
     classname = "trader"
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
-        self.resource = random.choice(RESOURCES)
+        self.resource = stream(self.owner(), "spawn").choice(RESOURCES)
         self.typename = f"{self.resource.title()} Trader"
 
     async def on_tick(self):
@@ -444,7 +305,7 @@ class Quarry(NPC):
     
     async def on_tick(self):
         await super().on_tick()
-        if random.random() > 0.6:
+        if stream(self.owner(), "npcs").random() > 0.6:
             square = get_square(self.x, self.y)
             if square: square.bury_treasure("plating")
     
@@ -453,20 +314,18 @@ class Quarry(NPC):
 
 class BreedingGround(NPC):
     classname = "breeding"
+    components = NPC.components | CARBON
     def __init__(self, id, x, y):
         super().__init__(id, x, y)
         self.health = 10
     
     async def on_tick(self):
         await super().on_tick()
-        if random.random() > 0.6:
+        if stream(self.owner(), "npcs").random() > 0.6:
             square = get_square(self.x, self.y)
             if square: square.bury_treasure("specimen")
     
     def is_weak(self) -> bool:
         return False
-    
-    def is_carbon(self) -> bool:
-        return True
 
-ALL_NPCS = [AnglerFish, BigSquid, BreedingGround, Bull, Crab, DeepOne, DeepOneTwo, Dolphin, Ears, Eel, Trader, Hammerhead, Humpback, Jellyfish, MantaRay, Mine, NewsBouy, Octopus, Orca, Quarry, RoughSeasGenerator, Squid, StormGenerator, Turtle, Urchin]
+ALL_NPCS = [BreedingGround, Crab, DeepOne, DeepOneTwo, Dolphin, Ears, Trader, Humpback, MantaRay, Mine, NewsBouy, Quarry, RoughSeasGenerator, StormGenerator, Turtle, Urchin]
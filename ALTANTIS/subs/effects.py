@@ -0,0 +1,83 @@
+"""
+Compiles upgrade keywords into a bitmask, and keeps the effects keywords have
+on a submarine's stats in one place.
+Subsystems either check a single keyword with Upgrades.has, or ask for a stat
+with apply, which runs only the modifiers whose keywords the sub has.
+"""
+
+from typing import Dict, List, Tuple, Callable, Any, Collection
+
+# Bits are handed out as keywords are first seen, so they differ between runs
+# and must never be saved.
+KEYWORD_BITS : Dict[str, int] = {}
+
+# Maps each stat to the (keyword bit, modifier) pairs that affect it.
+# Modifiers take the sub and the current value, and return the new value.
+MODIFIERS : Dict[str, List[Tuple[int, Callable[[Any, Any], Any]]]] = {}
+
+def keyword_bit(keyword : str) -> int:
+    if keyword not in KEYWORD_BITS:
+        KEYWORD_BITS[keyword] = 1 << len(KEYWORD_BITS)
+    return KEYWORD_BITS[keyword]
+
+def compile_keywords(keywords : Collection[str]) -> int:
+    mask = 0
+    for keyword in keywords:
+        mask |= keyword_bit(keyword)
+    return mask
+
+def modifier(stat : str, keyword : str):
+    """
+    Registers the decorated function as keyword's effect on stat.
+    """
+    def register(fn):
+        MODIFIERS.setdefault(stat, []).append((keyword_bit(keyword), fn))
+        return fn
+    return register
+
+def apply(stat : str, sub, value : Any) -> Any:
+    mask = sub.upgrades.mask
+    if mask:
+        for (bit, fn) in MODIFIERS.get(stat, ()):
+            if mask & bit:
+                value = fn(sub, value)
+    return value
+
+def compute_stats(sub) -> Dict[str, Any]:
+    """
+    Works out a sub's effective stats from its power and keywords.
+    The sub caches this until its power or keywords change.
+    """
+    manager = sub.power
+    power = {}
+    for system in set(manager.power) | set(manager.innate_power):
+        power[system] = manager.power.get(system, 0) + manager.get_innate_power(system)
+    scanners = power.get("scanners", manager.get_innate_power("scanners"))
+    return {
+        "power": power,
+        "scan_range": int(1.5*scanners),
+        "scan_strength": scanners,
+        "stealth_threshold": apply("stealth_threshold", sub, 0)
+    }
+
+@modifier("innate_power", "overclocked")
+def overclocked(sub, power : int) -> int:
+    return power + 1
+
+@modifier("movement_threshold", "blessing")
+def blessing(sub, threshold : int) -> int:
+    # Bound difficulty above by four (normal waters)
+    return min(4, threshold)
+
+@modifier("garble_distance", "clarity")
+def clarity(sub, distance : int) -> int:
+    return max(0, distance - 2*sub.power.get_power("comms"))
+
+@modifier("stealth_threshold", "stealthy")
+def stealthy(sub, threshold : int) -> int:
+    # Scans weaker than this see nothing.
+    return max(threshold, min(3, sub.power.unused_power()))
+
+@modifier("scan_with_distance", "triangulation")
+def triangulation(sub, with_distance : bool) -> bool:
+    return True
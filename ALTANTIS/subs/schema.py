@@ -0,0 +1,158 @@
+"""
+Describes exactly which parts of a submarine are saved, and how.
+Each subsystem lists its persistent fields along with a codec for each. From
+these lists we generate plain encode and decode functions once at import,
+so saving a sub never has to walk its __dict__.
+Anything not listed (scan results, trades in progress, cached stats) is
+transient and is rebuilt from the constructor's defaults on load.
+"""
+
+from typing import Dict, List, Tuple, Any, Callable
+import discord
+
+from ALTANTIS.subs.sub import Submarine, subsystems
+from ALTANTIS.subs.effects import compile_keywords
+from ALTANTIS.subs.subsystems.puzzles import find_puzzle
+from ALTANTIS.utils.timers import encode_owner, decode_owner
+
+# Version 1 is the old format, a copy of every subsystem's __dict__.
+# Version 2 kept postponed events in upgrades, before they became timers.
+# Version 3 saved when comms were last used as a time rather than a turn.
+SCHEMA_VERSION = 4
+
+# Each codec is a pair of expressions (to encode and to decode), where {0} is
+# the value being converted. Saved values must be JSON-friendly, and loaded
+# values must not share structure with the save.
+CODECS : Dict[str, Tuple[str, str]] = {
+    "plain": ("{0}", "{0}"),
+    "dict": ("dict({0})", "dict({0})"),
+    "list": ("list({0})", "list({0})"),
+    "tuples": ("[list(v) for v in {0}]", "[tuple(v) for v in {0}]"),
+    # Puzzles are saved by their question, as the answers are on disk anyway.
+    "puzzle": ("(None if {0} is None else {0}[0])", "(None if {0} is None else find_puzzle({0}))"),
+    "puzzles": ("[p[0] for p in {0}]", "[p for p in map(find_puzzle, {0}) if p is not None]")
+}
+
+SCHEMAS : Dict[str, List[Tuple[str, str]]] = {
+    "power": [
+        ("active", "plain"), ("active_turns", "plain"), ("power", "dict"), ("power_max", "dict"),
+        ("total_power", "plain"), ("total_power_max", "plain"),
+        ("innate_power", "dict"), ("scheduled_power", "dict"),
+        ("scheduled_damage", "list")
+    ],
+    "comms": [("last_comms", "plain")],
+    "movement": [
+        ("direction", "plain"), ("x", "plain"), ("y", "plain"),
+        ("movement_progress", "plain")
+    ],
+    "puzzles": [
+        ("puzzles", "puzzles"), ("current_puzzle", "puzzle"),
+        ("puzzle_reason", "plain"), ("wear_and_tear", "plain")
+    ],
+    "scan": [],
+    "inventory": [
+        ("inventory", "dict"), ("crane_down", "plain"),
+        ("crane_holds", "list"), ("schedule_crane", "plain")
+    ],
+    "weapons": [
+        ("weapons_charge", "plain"), ("range", "plain"),
+        ("planned_shots", "tuples")
+    ],
+    "upgrades": [("keywords", "list")]
+}
+
+def generate(subsystem : str, fields : List[Tuple[str, str]]) -> Tuple[Callable, Callable]:
+    """
+    Writes out and compiles the encoder and decoder for one subsystem.
+    """
+    encoder = ["def encode(system):", "    return {"]
+    decoder = ["def decode(system, data):"]
+    for (field, codec) in fields:
+        (encode, decode) = CODECS[codec]
+        encoder.append(f"        {field!r}: {encode.format(f'system.{field}')},")
+        decoder.append(f"    if {field!r} in data:")
+        decoder.append(f"        system.{field} = {decode.format(f'data[{field!r}]')}")
+    encoder.append("    }")
+    decoder.append("    return system")
+
+    namespace : Dict[str, Any] = {"find_puzzle": find_puzzle}
+    exec(compile("\n".join(encoder + decoder), f"<schema {subsystem}>", "exec"), namespace)
+    return namespace["encode"], namespace["decode"]
+
+ENCODERS : Dict[str, Callable] = {}
+DECODERS : Dict[str, Callable] = {}
+for subsystem in subsystems:
+    ENCODERS[subsystem], DECODERS[subsystem] = generate(subsystem, SCHEMAS[subsystem])
+
+def migrate_1(data : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Old saves are close enough that we only need to rename the sub's name and
+    swap puzzles for their questions. Any other fields are ignored.
+    """
+    data = dict(data)
+    data["name"] = data.pop("_name")
+    puzzles = dict(data["puzzles"])
+    puzzles["puzzles"] = [p[0] for p in puzzles.get("puzzles", [])]
+    if puzzles.get("current_puzzle") is not None:
+        puzzles["current_puzzle"] = puzzles["current_puzzle"][0]
+    data["puzzles"] = puzzles
+    return data
+
+def migrate_2(data : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Postponed events become the sub's timers. They only counted down on turns
+    the sub was active, so each carries its count of active turns left, from
+    none so far (see remove_equip in subsystems/upgrades.py).
+    """
+    data = dict(data)
+    upgrades = dict(data.get("upgrades", {}))
+    data["timers"] = [{"handler": fn, "in": count, "period": None, "args": list(args) + [count, 0], "label": desc, "phase": "subs"}
+                      for (count, desc, (fn, *args)) in upgrades.pop("postponed_events", [])]
+    data["upgrades"] = upgrades
+    return data
+
+def migrate_3(data : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Comms cooldowns are counted in turns now, and an old time means nothing
+    as a turn, so we let the sub broadcast straight away.
+    """
+    data = dict(data)
+    data["comms"] = dict(data.get("comms", {}), last_comms=None)
+    return data
+
+# Maps each version to the function that upgrades it to the next version.
+MIGRATIONS : Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    1: migrate_1,
+    2: migrate_2,
+    3: migrate_3
+}
+
+def encode_sub(sub : Submarine) -> Dict[str, Any]:
+    data : Dict[str, Any] = {
+        "version": SCHEMA_VERSION,
+        "name": sub._name,
+        "channels": {channel: sub.channels[channel].id for channel in sub.channels},
+        "timers": encode_owner(sub.owner())
+    }
+    for subsystem in subsystems:
+        data[subsystem] = ENCODERS[subsystem](getattr(sub, subsystem))
+    return data
+
+def decode_sub(data : Dict[str, Any], client : discord.Client) -> Submarine:
+    version = data.get("version", 1)
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+
+    # There's no client when replaying the journal.
+    channels = {}
+    for channel in data["channels"]:
+        channels[channel] = client.get_channel(data["channels"][channel]) if client else None
+    # Start from a fresh sub, so that anything missing takes its default.
+    sub = Submarine(data["name"], channels, 0, 0, "")
+    for subsystem in subsystems:
+        DECODERS[subsystem](getattr(sub, subsystem), data.get(subsystem, {}))
+    sub.upgrades.mask = compile_keywords(sub.upgrades.keywords)
+    decode_owner(sub.owner(), data.get("timers", []))
+    sub.invalidate_stats()
+    return sub
@@ -1,29 +1,188 @@
 """
-Manages the state dictionary, which keeps track of all submarines.
+Manages the state dictionary, which keeps track of all submarines (one for
+each game, see utils/games.py).
+Alongside it we keep indexes of which subs are active, where they are, where
+they are docked and which keywords they have. The subsystems tell us when any
+of these change, so queries never need to look at every sub.
 """
 
-import keyword
 from ALTANTIS.subs.sub import sub_from_dict, Submarine
 from ALTANTIS.utils.actions import DiscordAction
+from ALTANTIS.utils.snapshot import reading, handed_out
+from ALTANTIS.utils.timers import cancel_owner, cancel_kind
+from ALTANTIS.utils.games import game_part
+from ALTANTIS.world.components import ComponentStore, live_store
 
-from typing import Dict, List, Any, Callable, Awaitable, Optional
+from typing import Dict, List, Any, Callable, Awaitable, Optional, Tuple, KeysView
 import discord
 
-state : Dict[str, Submarine] = {}
+class SubIndexes():
+    """
+    Each index maps to a dict used as an ordered set of sub names, so that the
+    views we hand out are read-only and iterate in a stable order.
+    Every sub is also in a ComponentStore, shared with the NPCs.
+    """
+    def __init__(self, components : ComponentStore):
+        self.components = components
+        self.active : Dict[str, None] = {}
+        self.by_position : Dict[Tuple[int, int], Dict[str, None]] = {}
+        self.by_dock : Dict[str, Dict[str, None]] = {}
+        self.by_keyword : Dict[str, Dict[str, None]] = {}
+        # What we last recorded for each sub, so we know what to remove.
+        self.positions : Dict[str, Tuple[int, int]] = {}
+        self.docks : Dict[str, str] = {}
+
+    def add(self, sub : Submarine):
+        name = sub._name
+        if sub.power.activated():
+            self.active[name] = None
+        self.positions[name] = sub.movement.get_position()
+        self.by_position.setdefault(self.positions[name], {})[name] = None
+        self.components.add(sub)
+        for keyword in sub.upgrades.keywords:
+            self.by_keyword.setdefault(keyword, {})[name] = None
+        self.update_dock(sub)
+
+    def remove(self, name : str):
+        self.active.pop(name, None)
+        discard(self.by_position, self.positions.pop(name, None), name)
+        discard(self.by_dock, self.docks.pop(name, None), name)
+        self.components.remove(("sub", name))
+        for keyword in list(self.by_keyword):
+            discard(self.by_keyword, keyword, name)
+
+    def update_activation(self, sub : Submarine):
+        if sub.power.activated():
+            self.active[sub._name] = None
+        else:
+            self.active.pop(sub._name, None)
+        self.update_dock(sub)
+
+    def update_position(self, sub : Submarine):
+        name = sub._name
+        discard(self.by_position, self.positions.get(name), name)
+        self.positions[name] = sub.movement.get_position()
+        self.by_position.setdefault(self.positions[name], {})[name] = None
+        self.components.moved(sub)
+        self.update_dock(sub)
+
+    def update_dock(self, sub : Submarine):
+        """
+        A sub is docked if it is turned off on a docking station.
+        """
+        name = sub._name
+        discard(self.by_dock, self.docks.pop(name, None), name)
+        if sub.power.activated():
+            return
+        square = sub.movement.get_square()
+        location = square.docked_at() if square else None
+        if location:
+            self.docks[name] = location
+            self.by_dock.setdefault(location, {})[name] = None
+
+    def update_keyword(self, sub : Submarine, keyword : str, present : bool):
+        if present:
+            self.by_keyword.setdefault(keyword, {})[sub._name] = None
+        else:
+            discard(self.by_keyword, keyword, sub._name)
+
+def discard(index : Dict[Any, Dict[str, None]], key : Any, name : str):
+    """
+    Removes name from index[key], tidying up empty entries.
+    """
+    if key is None or key not in index:
+        return
+    index[key].pop(name, None)
+    if not index[key]:
+        del index[key]
+
+class SubState():
+    def __init__(self):
+        self.state : Dict[str, Submarine] = {}
+        self.indexes = SubIndexes(live_store())
+
+live = game_part("subs", SubState)
+
+def is_registered(sub : Submarine) -> bool:
+    """
+    Whether this exact sub object is the one in the state. Subs being loaded
+    from a save aren't yet, so their changes shouldn't touch the indexes.
+    """
+    return live().state.get(sub._name) is sub
+
+def sub_activation_changed(sub : Submarine):
+    if is_registered(sub):
+        live().indexes.update_activation(sub)
+
+def sub_moved(sub : Submarine):
+    if is_registered(sub):
+        live().indexes.update_position(sub)
+
+def sub_keyword_changed(sub : Submarine, keyword : str, present : bool):
+    if is_registered(sub):
+        live().indexes.update_keyword(sub, keyword, present)
 
-def get_subs() -> List[str]:
+def get_subs() -> KeysView[str]:
     """
     Gets all possible teams.
+    This is a live view, so take a copy if subs could be added or removed
+    while you're iterating over it.
     """
-    return list(state.keys())
+    return live().state.keys()
+
+def get_active_subs() -> KeysView[str]:
+    """
+    Gets the names of all activated subs, as a live view.
+    """
+    return live().indexes.active.keys()
+
+def current_state() -> Tuple[Dict[str, Submarine], SubIndexes]:
+    """
+    The state to read from: the live state, unless we're serving a read-only
+    command from the published snapshot (see utils/snapshot.py).
+    """
+    view = reading.get()
+    if view is not None:
+        return view.state, view.indexes
+    return live().state, live().indexes
+
+def hand_out(sub : Submarine) -> Submarine:
+    """
+    Notes that sub might be changed (see utils/snapshot.py), along with its
+    trading partner, which it changes directly.
+    """
+    handed_out(sub)
+    partner = sub.inventory.trading_partner
+    if partner is not None:
+        handed_out(partner)
+    return sub
+
+def get_subs_at(position : Tuple[int, int]) -> List[Submarine]:
+    (subs, index) = current_state()
+    return [hand_out(subs[name]) for name in index.by_position.get(position, ())]
+
+def get_sub_positions() -> KeysView[Tuple[int, int]]:
+    """
+    Gets every square that has at least one sub in it, as a live view.
+    """
+    return current_state()[1].by_position.keys()
+
+def get_subs_docked_at(location : str) -> List[Submarine]:
+    subs = live()
+    return [hand_out(subs.state[name]) for name in subs.indexes.by_dock.get(location.title(), ())]
+
+def get_subs_with_keyword(keyword : str) -> List[Submarine]:
+    subs = live()
+    return [hand_out(subs.state[name]) for name in subs.indexes.by_keyword.get(keyword, ())]
 
 def get_sub_objects() -> List[Submarine]:
-    return list(state.values())
+    return [hand_out(sub) for sub in current_state()[0].values()]
 
 def filtered_teams(pred) -> List[str]:
     """
     Gets all names of subs that satisfy some predicate.
     """
+    state = live().state
     subs = []
     for sub in state:
         if pred(state[sub]):
@@ -34,8 +193,9 @@ def get_sub(name : str) -> Optional[Submarine]:
     """
     Gets the Submarine object associated with `name`.
     """
-    if name in state:
-        return state[name]
+    subs = current_state()[0]
+    if name in subs:
+        return hand_out(subs[name])
     return None
 
 def with_sub(name : str, function : Callable[[Submarine], DiscordAction], fail : DiscordAction) -> DiscordAction:
@@ -54,21 +214,36 @@ def add_team(name : str, category : discord.CategoryChannel, x : int, y : int, k
     """
     Adds a team with the name, if able.
     """
-    if name not in get_subs():
+    subs = live()
+    if name not in subs.state:
         child_channels = category.text_channels
         channel_dict = {}
         for channel in child_channels:
             channel_dict[channel.name] = channel
-        state[name] = Submarine(name, channel_dict, x, y, keyword)
+        subs.state[name] = Submarine(name, channel_dict, x, y, keyword)
+        subs.indexes.add(subs.state[name])
         return True
     return False
 
+def replace_sub(sub : Submarine):
+    """
+    Puts sub into the state, replacing any sub with the same name.
+    """
+    subs = live()
+    if sub._name in subs.state:
+        subs.indexes.remove(sub._name)
+    subs.state[sub._name] = sub
+    subs.indexes.add(sub)
+
 def remove_team(name : str) -> bool:
     """
     Removes the team with that name, if able.
     """
-    if name in get_subs():
-        del state[name]
+    subs = live()
+    if name in subs.state:
+        del subs.state[name]
+        subs.indexes.remove(name)
+        cancel_owner(("sub", name))
         return True
     return False
 
@@ -77,6 +252,7 @@ def state_to_dict() -> Dict[str, Dict[str, Any]]:
     Convert our state to a dictionary. This just runs to_dict on each member of
     the state.
     """
+    state = live().state
     state_dict = {}
     for subname in state:
         state_dict[subname] = state[subname].to_dict()
@@ -86,8 +262,14 @@ def state_from_dict(dictionary : Dict[str, Dict[str, Any]], client : discord.Cli
     """
     Overwrites state with the state made by state_to_dict.
     """
-    global state
+    # Each sub brings back its own timers.
+    cancel_kind("sub")
     new_state = {}
     for subname in dictionary:
         new_state[subname] = sub_from_dict(dictionary[subname], client)
-    state = new_state
\ No newline at end of file
+    subs = live()
+    subs.state = new_state
+    live_store().remove_kind("sub")
+    subs.indexes = SubIndexes(live_store())
+    for sub in subs.state.values():
+        subs.indexes.add(sub)
\ No newline at end of file
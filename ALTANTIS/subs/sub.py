@@ -2,16 +2,21 @@
 Manages individual submarines, including their subsystems.
 """
 
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 import discord
 
 from ALTANTIS.utils.entity import Entity
-from ALTANTIS.utils.roles import create_or_return_role
+from ALTANTIS.world.components import POSITION, HEALTH, PENDING_DAMAGE, STEALTH, MESSAGING
+from ALTANTIS.utils.roles import dock_crew, undock_crew
 from ALTANTIS.world.world import get_square
+from ALTANTIS.subs.effects import compute_stats
+from ALTANTIS.utils.journal import is_replaying
 
 subsystems = ["power", "comms", "movement", "puzzles", "scan", "inventory", "weapons", "upgrades"]
 
 class Submarine(Entity):
+    components = POSITION | HEALTH | PENDING_DAMAGE | STEALTH | MESSAGING
+
     def __init__(self, name : str, channels : Dict[str, discord.TextChannel], x : int, y : int, keyword : str):
         # To avoid circular dependencies.
         # The one dependency is that Scan and Comms need the list of available
@@ -35,10 +40,26 @@ class Submarine(Entity):
         self.inventory = Inventory(self)
         self.weapons = Weaponry(self)
         self.upgrades = Upgrades(self)
+        # Effective stats, worked out when first needed after a change.
+        self._stats = None
     
     def name(self) -> str:
         return self._name.title()
 
+    def owner(self) -> Tuple[str, Any]:
+        return ("sub", self._name)
+
+    def stats(self) -> Dict[str, Any]:
+        if self._stats is None:
+            self._stats = compute_stats(self)
+        return self._stats
+
+    def invalidate_stats(self):
+        """
+        Call this whenever power or keywords change.
+        """
+        self._stats = None
+
     def status_message(self, loop) -> str:
         message = (
             f"Status for **{self.name()}**\n"
@@ -54,6 +75,8 @@ class Submarine(Entity):
         return message + "\nNo more to report."
     
     async def send_message(self, content : str, channel : str, filename : str = None) -> bool:
+        if is_replaying():
+            return False
         fp = None
         if filename:
             fp = discord.File(filename)
@@ -63,108 +86,59 @@ class Submarine(Entity):
         return False
     
     async def send_to_all(self, content : str) -> bool:
+        if is_replaying():
+            return False
         for channel in self.channels:
-            await self.channels[channel].send(content)
+            if self.channels[channel]:
+                await self.channels[channel].send(content)
         return True
     
     def damage(self, amount : int):
         self.power.damage(amount)
+
+    def outward_broadcast(self, strength : int) -> str:
+        return self.scan.outward_broadcast(strength)
     
     def get_position(self) -> Tuple[int, int]:
         return self.movement.get_position()
     
-    async def docking(self, guild : discord.Guild) -> str:
+    async def docking(self, guild : Optional[discord.Guild]) -> str:
         """
-        Finds all members of this sub (by finding those with the relevant role)
-        and gives them the docked-at-{base_name} role.
+        Gives all members of this sub (those with the relevant role) the
+        docked-at-{base_name} role.
         This is undone when the sub is activated.
         """
-        def has_subname_role(member : discord.Member) -> bool:
-            roles = member.roles
-            role_names = map(lambda r: r.name, roles)
-            return self._name in role_names
-
         square = self.movement.get_square()
         location = square.docked_at()
         if location:
-            role_name = f"docked-at-{location.lower()}"
-            in_sub = filter(has_subname_role, guild.members)
-            role = await create_or_return_role(guild, role_name)
-            for member in in_sub:
-                await member.add_roles(role)
+            # There's no guild when replaying the journal.
+            if guild is not None:
+                await dock_crew(guild, self._name, location)
             await self.send_to_all(f"Team has left submarine at **{location.title()}**. Submarine is now off it is wasn't already. You will be automatically returned when the submarine is turned back on.")
             self.power.activate(False)
             return "Successfully left the submarine."
         return "Unable to leave the submarine."
     
-    async def undocking(self, guild : discord.Guild):
+    async def undocking(self, guild : Optional[discord.Guild]):
         """
-        Finds all members of this sub (by finding those with the relevant role)
-        and then removes any docked-at-{x} role.
+        Removes any docked-at-{x} role from all members of this sub.
         Call this when a sub is activated.
         """
-        def has_subname_role(member : discord.Member) -> bool:
-            roles = member.roles
-            role_names = map(lambda r: r.name, roles)
-            return self._name in role_names
-
-        in_sub = filter(has_subname_role, guild.members)
-        for member in in_sub:
-            roles_to_remove = []
-            for role in member.roles:
-                if str.startswith(role.name, "docked-at-"):
-                    roles_to_remove.append(role)
-            await member.remove_roles(*roles_to_remove)
+        if guild is None:
+            return
+        await undock_crew(guild, self._name)
     
     def to_dict(self) -> Dict[str, Any]:
         """
         Converts this submarine instance to a serialisable dictionary.
-        We just use self.__dict__ and then convert things as necessary.
+        See ALTANTIS.subs.schema for what is saved.
         """
-        dictionary = self.__dict__.copy()
-
-        # self.channels: convert channels to their IDs.
-        ids = {}
-        for channel in self.channels:
-            ids[channel] = self.channels[channel].id
-        dictionary["channels"] = ids
-
-        # Each subsystem needs to be turned into a dict, and then have its
-        # parent reference removed.
-        for subsystem in subsystems:
-            dictionary[subsystem] = self.__getattribute__(subsystem).__dict__.copy()
-            dictionary[subsystem]["sub"] = None
-        
-        # Delete trade progress.
-        dictionary["inventory"]["trading_partner"] = None
-        dictionary["inventory"]["offer"] = {}
-        dictionary["inventory"]["accepting"] = False
-        dictionary["inventory"]["my_turn"] = False
-
-        return dictionary
+        from .schema import encode_sub
+        return encode_sub(self)
     
 def sub_from_dict(dictionary : Dict[str, Any], client : discord.Client) -> Submarine:
     """
-    Creates a submarine from a serialised dictionary.
+    Creates a submarine from a serialised dictionary, in any save format.
     """
-    newsub = Submarine("", {}, 0, 0, "")
-
-    # self.channels: turn channel IDs into their objects.
-    channels = dictionary["channels"]
-    for channel in channels:
-        channels[channel] = client.get_channel(channels[channel])
-    
-    # Subsystems need to be remade into their classes.
-    for subsystem in subsystems:
-        # First, set the self-reference.
-        # newsub.__getattribute__... is the sub link generated by the
-        # constructor of Submarine.
-        dictionary[subsystem]["sub"] = newsub.__getattribute__(subsystem).sub
-        # Then, load in the dictionary (initialising the child class).
-        newsub.__getattribute__(subsystem).__dict__ = dictionary[subsystem]
-        # Finally, modify the dictionary to contain the actual instantiated
-        # subsystem as opposed to the dictionary form.
-        dictionary[subsystem] = newsub.__getattribute__(subsystem)
-
-    newsub.__dict__ = dictionary
-    return newsub
\ No newline at end of file
+    from .schema import decode_sub
+    return decode_sub(dictionary, client)
@@ -1,22 +1,25 @@
 """
 Allows submarines to communicate with one another.
 """
-from random import random
-from time import time as now
+from random import Random
+from typing import Optional
 
-from ALTANTIS.subs.state import get_subs, get_sub
-from ALTANTIS.npcs.npc import get_npcs, get_npc
+from ALTANTIS.world.components import query, MESSAGING
+from ALTANTIS.utils.rng import stream
+from ALTANTIS.utils.journal import current_turn
 from ALTANTIS.utils.direction import diagonal_distance
 from ALTANTIS.utils.consts import GARBLE, COMMS_COOLDOWN
+from ALTANTIS.subs.effects import apply
 from ..sub import Submarine
 
 class CommsSystem():
     def __init__(self, sub : Submarine):
         self.sub = sub
-        # last_comms is the time when the Comms were last used.
-        self.last_comms : float = 0
+        # last_comms is the turn when the Comms were last used. Turns rather
+        # than times, so that replaying the journal gives the same answer.
+        self.last_comms : Optional[int] = None
     
-    def garble(self, content : str, distance : int):
+    def garble(self, content : str, distance : int, rng : Random):
         """
         We define the message error as the proportion of incorrect characters
         in a message. This error increases with distance between two subs.
@@ -27,41 +30,27 @@ class CommsSystem():
         comms_power = self.sub.power.get_power("comms")
         if comms_power == 0:
             return None
-        if "clarity" in self.sub.upgrades.keywords:
-            distance -= 2*comms_power
-            distance = max(0, distance)
+        distance = apply("garble_distance", self.sub, distance)
         message_error = min(distance * GARBLE / comms_power, 100)
         if message_error == 100:
             return None
         new_content = list(content)
         for i in range(len(new_content)):
-            if new_content[i] not in [" ", "\n", "\r"] and random() < message_error / 100:
+            if new_content[i] not in [" ", "\n", "\r"] and rng.random() < message_error / 100:
                 new_content[i] = "_"
         return "".join(new_content)
 
     async def broadcast(self, content : str):
-        if self.last_comms + COMMS_COOLDOWN > now():
+        turn = current_turn()
+        if self.last_comms is not None and self.last_comms + COMMS_COOLDOWN > turn:
             return False
         
         my_pos = self.sub.movement.get_position()
-        for subname in get_subs():
-            if subname == self.sub._name:
-                continue
-
-            sub = get_sub(subname)
-
-            dist = diagonal_distance(my_pos, sub.movement.get_position())
-            garbled = self.garble(content, dist)
-            if garbled is not None:
-                await sub.send_message(f"**Message received from {self.sub.name()}**:\n`{garbled}`\n**END MESSAGE**", "captain")
-
-        for npcid in get_npcs():
-            npc = get_npc(npcid)
-
-            dist = diagonal_distance(my_pos, npc.get_position())
-            garbled = self.garble(content, dist)
+        for entity in query(MESSAGING, exclude=[self.sub.owner()]):
+            dist = diagonal_distance(my_pos, entity.get_position())
+            garbled = self.garble(content, dist, stream(self.sub.owner(), "comms", entity.owner()))
             if garbled is not None:
-                await npc.send_message(f"**Message received from {self.sub.name()}**:\n`{garbled}`\n**END MESSAGE**", "")
-        self.last_comms = now()
+                await entity.send_message(f"**Message received from {self.sub.name()}**:\n`{garbled}`\n**END MESSAGE**", "captain")
+        self.last_comms = turn
         return True
     
\ No newline at end of file
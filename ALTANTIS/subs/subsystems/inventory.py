@@ -6,6 +6,7 @@ Also features The Crane.
 from ALTANTIS.utils.consts import CURRENCY_NAME
 from ALTANTIS.utils.text import list_to_and_separated, to_titled_list
 from ALTANTIS.world.world import pick_up_treasure, bury_treasure_at
+from ALTANTIS.utils.rng import stream
 from ALTANTIS.utils.control import notify_control
 from ..sub import Submarine
 
@@ -80,7 +81,7 @@ class Inventory():
     def drop_crane(self) -> str:
         if self.sub.power.get_power("crane") == 0:
             return "Crane is unpowered!"
-        if "snipped" in self.sub.upgrades.keywords:
+        if self.sub.upgrades.has("snipped"):
             return "Crane cable was snipped so cannot be lowered!"
         if not self.schedule_crane and not self.crane_down:
             self.schedule_crane = True
@@ -93,7 +94,7 @@ class Inventory():
         self.schedule_crane = False
         # Attempt to pick up the item.
         crane_power = self.sub.power.get_power("crane")
-        self.crane_holds = pick_up_treasure(self.sub.movement.get_position(), crane_power)
+        self.crane_holds = pick_up_treasure(self.sub.movement.get_position(), crane_power, stream(self.sub.owner(), "crane"))
     
     async def send_crane_up(self) -> List[str]:
         # The crane comes back up! Oh no
@@ -121,7 +122,7 @@ class Inventory():
             return self.crane_falters()
         if self.schedule_crane and not self.crane_down:
             self.send_crane_down()
-            if not "fastcrane" in self.sub.upgrades.keywords:
+            if not self.sub.upgrades.has("fastcrane"):
                 treasure_count = len(self.crane_holds)
                 plural = ""
                 if treasure_count != 1:
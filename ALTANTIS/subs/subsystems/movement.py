@@ -5,8 +5,11 @@ import math, datetime
 from typing import Tuple, Optional
 
 from ALTANTIS.world.world import possible_directions, get_square, in_world, Cell
+from ALTANTIS.world.events import moved as square_moved
 from ALTANTIS.utils.consts import GAME_SPEED, direction_emoji, TICK, CROSS
 from ALTANTIS.utils.direction import directions, reverse_dir
+from ALTANTIS.subs.state import sub_moved
+from ALTANTIS.subs.effects import apply
 from ..sub import Submarine
 
 class MovementControls():
@@ -24,10 +27,7 @@ class MovementControls():
         Updates internal state and moves if it is time to do so.
         """
         self.movement_progress += self.sub.power.get_power("engines")
-        threshold = get_square(self.x, self.y).difficulty()
-        if "blessing" in self.sub.upgrades.keywords:
-            # Bound difficulty above by four (normal waters)
-            threshold = min(4, threshold)
+        threshold = apply("movement_threshold", self.sub, get_square(self.x, self.y).difficulty())
         if self.movement_progress >= threshold:
             self.movement_progress -= threshold
             direction = self.direction # Direction can change as result of movement.
@@ -60,8 +60,11 @@ class MovementControls():
 
     def set_position(self, x : int, y : int) -> bool:
         if in_world(x, y):
+            old_position = self.get_position()
             self.x = x
             self.y = y
+            sub_moved(self.sub)
+            square_moved(self.sub, old_position, self.get_position())
             return True
         return False
 
@@ -82,8 +85,11 @@ class MovementControls():
         message, obstacle = get_square(new_x, new_y).on_entry(self.sub)
         if obstacle:
             return message
+        old_position = self.get_position()
         self.x = new_x
         self.y = new_y
+        sub_moved(self.sub)
+        square_moved(self.sub, old_position, self.get_position())
         return message
     
     def status(self, loop) -> str:
@@ -92,12 +98,13 @@ class MovementControls():
 
         if power_system.activated():
             time_until_next = math.inf
+            interval = loop.seconds if loop else GAME_SPEED
             if loop and loop.next_iteration:
                 time_until_next = loop.next_iteration.timestamp() - datetime.datetime.now().timestamp()
             threshold = get_square(self.x, self.y).difficulty()
             turns_until_move = math.ceil(max(threshold - self.movement_progress, 0) / power_system.get_power("engines"))
             turns_plural = "turns" if turns_until_move > 1 else "turn"
-            time_until_move = time_until_next + GAME_SPEED * (turns_until_move - 1)
+            time_until_move = time_until_next + interval * (turns_until_move - 1)
             message += f"Submarine is currently online. {TICK}\n"
             if time_until_next != math.inf:
                 message += f"Next game turn will occur in {int(time_until_next)}s.\n"
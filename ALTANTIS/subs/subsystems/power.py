@@ -5,9 +5,11 @@ Allows submarines to manage their power usage.
 from ALTANTIS.utils.control import notify_control
 from ALTANTIS.utils.consts import TICK, CROSS, PLUS
 from ALTANTIS.world.extras import all_in_submap
+from ALTANTIS.subs.state import sub_activation_changed
+from ALTANTIS.subs.effects import apply
+from ALTANTIS.utils.rng import stream
 from ..sub import Submarine
 
-import random
 from typing import Dict, List, Optional
 
 PRESETS = {
@@ -21,6 +23,9 @@ class PowerManager():
     def __init__(self, sub : Submarine, keyword : str):
         self.sub = sub
         self.active = False
+        # How many turns the sub has started active, which upgrades wearing out
+        # count (see remove_equip in upgrades.py).
+        self.active_turns = 0
         # power is a dictionary mapping systems to their current power.
         self.power = {"engines": 0, "scanners": 1, "comms": 1, "crane": 0, "weapons": 1}
         # power_max is the maximum power for each system.
@@ -45,6 +50,7 @@ class PowerManager():
     def activate(self, value : bool) -> bool:
         if self.total_power > 0 or not value:
             self.active = value
+            sub_activation_changed(self.sub)
             return True
         return False
 
@@ -58,19 +64,16 @@ class PowerManager():
         power = 0
         if system in self.innate_power:
             power += self.innate_power[system]
-        if "overclocked" in self.sub.upgrades.keywords:
-            power += 1
-        return power
+        return apply("innate_power", self.sub, power)
 
     def get_power(self, system : str) -> int:
         """
         Returns the power given to a system, both innately and otherwise.
         """
-        power = 0
-        if system in self.power:
-            power += self.power[system]
-        power += self.get_innate_power(system)
-        return power
+        effective = self.sub.stats()["power"]
+        if system in effective:
+            return effective[system]
+        return self.get_innate_power(system)
     
     def add_system(self, systemname : str) -> bool:
         """
@@ -80,6 +83,7 @@ class PowerManager():
             return False
         self.power[systemname] = 0
         self.power_max[systemname] = 1
+        self.sub.invalidate_stats()
         return True
 
     def power_use(self, power : Dict[str, int]) -> int:
@@ -102,6 +106,7 @@ class PowerManager():
             if difference != 0:
                 message += f"Power to **{system}** {connective} by {abs(difference)}.\n"
         self.power = self.scheduled_power
+        self.sub.invalidate_stats()
         if message == "":
             return None
         return message
@@ -117,6 +122,7 @@ class PowerManager():
             return False
         self.power_max[systemname] += amount
         self.power[systemname] = min(self.power[systemname], self.power_max[systemname])
+        self.sub.invalidate_stats()
         return True
     
     def modify_innate_system(self, systemname : str, amount : int) -> bool:
@@ -131,6 +137,7 @@ class PowerManager():
         if current_innate + amount < 0:
             return False
         self.innate_power[systemname] = current_innate + amount
+        self.sub.invalidate_stats()
         return True
     
     def modify_reactor(self, amount : int) -> bool:
@@ -152,7 +159,7 @@ class PowerManager():
         Will not change anything if it would mean you go over the power cap.
         If you name a system that doesn't exist, it will not apply the changes.
         """
-        if "shocked" in self.sub.upgrades.keywords:
+        if self.sub.upgrades.has("shocked"):
             return "Cannot change power while shocked!"
         if len(systems) > self.total_power - self.power_use(self.scheduled_power):
             return "You will exceed your power cap with this! Operation cancelled."
@@ -175,7 +182,7 @@ class PowerManager():
         Attempts to remove power from all of the named systems in `systems`.
         If you specify a system that doesn't exist, it will fail.
         """
-        if "shocked" in self.sub.upgrades.keywords:
+        if self.sub.upgrades.has("shocked"):
             return "Cannot change power while shocked!"
         power_copy = self.scheduled_power.copy()
         for system in systems:
@@ -194,6 +201,7 @@ class PowerManager():
         if amount <= 0:
             return ""
         self.total_power -= 1
+        self.sub.invalidate_stats()
         # If you're now out of power, die.
         if self.total_power <= 0:
             self.activate(False)
@@ -203,7 +211,7 @@ class PowerManager():
         if self.power_use(self.power) >= self.total_power:
             # Pick a system at random to lose power.
             available_systems = filter(lambda system: self.power[system] > 0, self.power)
-            system = random.choice(list(available_systems))
+            system = stream(self.sub.owner(), "damage").choice(list(available_systems))
             self.unpower_systems([system])
             system_message = f" {system.capitalize()} lost some power!"
         # Else continue taking damage.
@@ -218,7 +226,7 @@ class PowerManager():
         for hit in self.scheduled_damage:
             damage_message += self.run_damage(hit)
             await notify_control(f"**{self.sub.name()}** took **{hit} damage**!")
-            if "ticking" in self.sub.upgrades.keywords and 0.65 < random.random():
+            if self.sub.upgrades.has("ticking") and 0.65 < stream(self.sub.owner(), "damage").random():
                 # The volatile thing explodes!!
                 damage_message += self.run_damage(2)
                 self.sub.upgrades.remove_keyword("ticking")
@@ -235,6 +243,7 @@ class PowerManager():
 
     def heal(self, amount : int) -> str:
         self.total_power = min(self.total_power + amount, self.total_power_max)
+        self.sub.invalidate_stats()
         return f"Healed back up to {self.total_power} power!"
     
     def emoji_power_status(self, innate : int, use : int, maxi : int) -> str:
@@ -2,10 +2,10 @@
 Deals with the engineering puzzles, which need to be imported, served and marked.
 """
 import json, glob
-from random import choice
 from typing import Tuple, List, Optional
 
 from ALTANTIS.utils.control import notify_control
+from ALTANTIS.utils.rng import stream
 from ..sub import Submarine
 
 answers = {}
@@ -26,10 +26,17 @@ def attach_answer(question : str) -> Tuple[str, List[str]]:
     return (question, answer)
 
 puzzles = list(map(attach_answer, questions))
+puzzles_by_question = {puzzle[0]: puzzle for puzzle in puzzles}
 
 def load_all_puzzles() -> List[Tuple[str, List[str]]]:
     return puzzles.copy()
 
+def find_puzzle(question : str) -> Optional[Tuple[str, List[str]]]:
+    """
+    Gets a puzzle by its question, or None if it has since been removed.
+    """
+    return puzzles_by_question.get(question)
+
 class EngineeringPuzzles():
     def __init__(self, sub : Submarine):
         self.sub = sub
@@ -44,11 +51,11 @@ class EngineeringPuzzles():
         # Puzzles resolve once you've moved:
         await self.resolve_puzzle(None)
         # We also need to set wear and tear puzzles if need be.
-        if not "wearfree" in self.sub.upgrades.keywords:
+        if not self.sub.upgrades.has("wearfree"):
             self.wear_and_tear -= 1
             if self.wear_and_tear <= 0:
                 await self.send_puzzle("wear and tear")
-                self.wear_and_tear = choice([4,5,6])
+                self.wear_and_tear = stream(self.sub.owner(), "puzzles").choice([4,5,6])
     
     async def send_puzzle(self, reason : str) -> bool:
         """
@@ -1,14 +1,15 @@
 """
 Allows the sub to scan and be scanned.
 """
-from random import shuffle
 from typing import Tuple, List, Collection
 
 from ALTANTIS.utils.direction import diagonal_distance, determine_direction
 from ALTANTIS.utils.consts import X_LIMIT, Y_LIMIT
-from ALTANTIS.subs.state import get_sub, get_subs
-from ALTANTIS.npcs.npc import get_npc, get_npcs
+from ALTANTIS.world.components import query, POSITION
+from ALTANTIS.world.extras import exclusions
 from ALTANTIS.world.world import get_square
+from ALTANTIS.subs.effects import apply
+from ALTANTIS.utils.rng import stream
 from ..sub import Submarine
 
 class ScanSystem():
@@ -24,8 +25,7 @@ class ScanSystem():
         Could add direction of motion, whether it's got cargo etc.
         """
         subname = ""
-        unused_power = self.sub.power.unused_power()
-        if "stealthy" in self.sub.upgrades.keywords and strength < min(3, unused_power):
+        if strength < self.sub.stats()["stealth_threshold"]:
             return ""
         if strength > 0:
             subname = f" {self.sub.name()}"
@@ -38,14 +38,15 @@ class ScanSystem():
         Perform a scanner sweep of the local area.
         This finds all subs and objects in range, and returns them.
         """
-        scanners_range = int(1.5*self.sub.power.get_power("scanners"))
+        stats = self.sub.stats()
+        scanners_range = stats["scan_range"]
         if scanners_range < 0:
             return []
         my_position = self.sub.movement.get_position()
-        with_distance = "triangulation" in self.sub.upgrades.keywords
+        with_distance = apply("scan_with_distance", self.sub, False)
         events = explore_submap(my_position, scanners_range, sub_exclusions=[self.sub._name], with_distance=with_distance)
-        get_square(*my_position).has_been_scanned(self.sub._name, self.sub.power.get_power("scanners"))
-        shuffle(events)
+        get_square(*my_position).has_been_scanned(self.sub._name, stats["scan_strength"])
+        stream(self.sub.owner(), "scan").shuffle(events)
         return events
     
     def scan_string(self) -> str:
@@ -91,41 +92,11 @@ def explore_submap(pos : Tuple[int, int], dist : int, sub_exclusions : Collectio
                     event = f"{event} - in direction {direction.upper()}{distance_measure}!"
                 events.append(event)
 
-    # Then, submarines.
-    for subname in get_subs():
-        if subname in sub_exclusions:
-            continue
-
-        sub = get_sub(subname)
-        sub_pos = sub.movement.get_position()
-        sub_dist = diagonal_distance(pos, sub_pos)
-
-        # If out of range, drop it.
-        if sub_dist > dist:
-            continue
-        
-        event = sub.scan.outward_broadcast(dist - sub_dist)
-        direction = determine_direction(pos, sub_pos)
-        if direction is None:
-            event = f"{event} in your current square!"
-        else:
-            event = f"{event} in direction {direction.upper()}!"
-        events.append(event)
-    
-    # Finally, NPCs.
-    for npcid in get_npcs():
-        if npcid in npc_exclusions:
-            continue
-        
-        npc_obj = get_npc(npcid)
-        npc_pos = npc_obj.get_position()
-        npc_dist = diagonal_distance(pos, npc_pos)
-
-        if npc_dist > dist:
-            continue
-
-        event = npc_obj.outward_broadcast(dist - npc_dist)
-        direction = determine_direction(pos, npc_pos)
+    # Then, subs and NPCs.
+    for entity in query(POSITION, pos, dist, exclusions(sub_exclusions, npc_exclusions)):
+        entity_pos = entity.get_position()
+        event = entity.outward_broadcast(dist - diagonal_distance(pos, entity_pos))
+        direction = determine_direction(pos, entity_pos)
         if direction is None:
             event = f"{event} in your current square!"
         else:
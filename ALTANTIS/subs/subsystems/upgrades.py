@@ -3,7 +3,11 @@ A subsystem for upgrades, handed to subs via keywords from control.
 """
 
 from ALTANTIS.cogs.map import mass_weather
-from typing import Tuple, Any, Optional, List
+from ALTANTIS.subs.state import sub_keyword_changed
+from ALTANTIS.subs.effects import keyword_bit
+from ALTANTIS.subs.state import get_sub
+from ALTANTIS.utils.timers import timer_handler, schedule, timers_of, turns_left, Timer
+from typing import Optional
 
 from ALTANTIS.utils.text import to_titled_list, list_to_and_separated
 from ..sub import Submarine
@@ -28,10 +32,14 @@ class Upgrades():
         self.sub = sub
         # Used for special abilities gifted by control.
         self.keywords = []
-        # Used for events that should happen on a given turn.
-        # Consists of (int, string, (fn name, argument)) triples.
-        self.postponed_events : List[Tuple[int, str, Tuple[str, Any, Any]]] = []
+        # The keywords compiled into a bitmask (see ALTANTIS.subs.effects).
+        self.mask = 0
+        # Events that should happen on a later turn are timers owned by the
+        # sub (see ALTANTIS.utils.timers), and are saved with it.
     
+    def has(self, keyword : str) -> bool:
+        return self.mask & keyword_bit(keyword) != 0
+
     def upgrade_status(self) -> str:
         status = ""
         if len(self.keywords) > 0:
@@ -42,34 +50,32 @@ class Upgrades():
                 else:
                     status += f"`{keyword}`: Unknown functionality.\n"
         postponed = []
-        for event in self.postponed_events:
-            postponed.append(f"{event[1].title()} ({event[0]})")
+        for timer in timers_of(self.sub.owner()):
+            if timer.label:
+                postponed.append(f"{timer.label.title()} ({self.turns_until(timer)})")
         if len(postponed) > 0:
             status += f"Events happening in later turns: {list_to_and_separated(postponed)}.\n"
-        if "ticking" in self.keywords:
+        if self.has("ticking"):
             status += "Something makes an annoying ticking noise!\n"
         return status
     
-    async def postponed_tick(self):
-        unresolved : List[Tuple[int, str, Tuple[str, Any, Any]]] = []
-        for event in self.postponed_events:
-            (count, desc, fn) = event
-            if count <= 1:
-                # Resolve the event.
-                # As Python cannot serialise functions, we have to define cases.
-                if fn[0] == "remove_equip":
-                    (_, keyword, damage) = fn
-                    await self.remove_equip(keyword, damage)
-            else:
-                unresolved.append((count-1, desc, fn))
-        self.postponed_events = unresolved
+    def turns_until(self, timer : Timer) -> int:
+        """
+        Upgrades wearing out count active turns, not turns.
+        """
+        if timer.handler == "remove_equip" and len(timer.args) > 3:
+            (remaining, started) = timer.args[2:4]
+            return remaining - (self.sub.power.active_turns - started)
+        return turns_left(timer)
 
     def add_keyword(self, keyword : str, turn_limit : Optional[int] = None, damage : int = 1) -> Optional[str]:
         if keyword not in self.keywords:
             self.keywords.append(keyword)
+            self.mask |= keyword_bit(keyword)
+            self.sub.invalidate_stats()
+            sub_keyword_changed(self.sub, keyword, True)
             if turn_limit is not None:
-                verb = "dissapates" if damage <= 0 else "explodes"
-                self.postponed_events.append((turn_limit, f"**{keyword}** {verb}", ("remove_equip", keyword, damage)))
+                schedule(self.sub.owner(), "remove_equip", turn_limit, [keyword, damage, turn_limit, self.sub.power.active_turns], label=equip_label(keyword, damage))
             if keyword in VALID_UPGRADES:
                 return f"Added {keyword}!"
             return f"Added {keyword}, but it is not implemented anywhere in code."
@@ -78,6 +84,9 @@ class Upgrades():
     def remove_keyword(self, keyword : str) -> bool:
         if keyword in self.keywords:
             self.keywords.remove(keyword)
+            self.mask &= ~keyword_bit(keyword)
+            self.sub.invalidate_stats()
+            sub_keyword_changed(self.sub, keyword, False)
             return True
         return False
     
@@ -90,4 +99,27 @@ class Upgrades():
             else:
                 result = f"dramatically exploded and dealt {damage} damage"
             await self.sub.send_message(f"**{keyword.title()}** {result}!", "engineer")
-    
\ No newline at end of file
+    
+def equip_label(keyword : str, damage : int) -> str:
+    return f"**{keyword}** {'dissapates' if damage <= 0 else 'explodes'}"
+
+@timer_handler
+async def remove_equip(owner, keyword : str, damage : int, remaining : int = 1, started : Optional[int] = None):
+    """
+    Wears keyword out once the sub has been active for remaining turns since
+    the timer was set (when it had been active for started turns). Upgrades
+    only wear out on turns where the sub is active, so if it wasn't active for
+    some of them, we wait that many turns more.
+    """
+    sub = get_sub(owner[1])
+    if sub is None:
+        return
+    active = sub.power.active_turns
+    if started is None:
+        # Older timers fired every turn, and only counted this one.
+        started = active - 1 if sub.power.activated() else active
+    left = remaining - (active - started)
+    if left > 0:
+        schedule(owner, "remove_equip", left, [keyword, damage, left, active], label=equip_label(keyword, damage))
+        return
+    await sub.upgrades.remove_equip(keyword, damage)
@@ -2,16 +2,15 @@
 Allows subs to charge and fire (stunning) weapons.
 """
 
-from ALTANTIS.subs.state import get_subs, get_sub
-from ALTANTIS.npcs.npc import get_npcs, get_npc
 from ALTANTIS.utils.direction import diagonal_distance
 from ALTANTIS.utils.text import list_to_and_separated
 from ALTANTIS.utils.entity import Entity
 from ALTANTIS.world.world import in_world
+from ALTANTIS.world.components import query, POSITION
+from ALTANTIS.utils.rng import stream
 from ..sub import Submarine
 
 import math
-from random import shuffle
 from typing import Tuple, Dict, List
 
 class Weaponry():
@@ -69,26 +68,15 @@ class Weaponry():
         # Returns a list of indirect and direct hits.
         indirect = []
         direct = []
-        for subname in get_subs():
-            sub = get_sub(subname)
-            pos = sub.movement.get_position()
-            distance = diagonal_distance(pos, (x, y))
-            if distance == 0:
-                direct.append(sub)
-            elif distance == 1:
-                indirect.append(sub)
-        
-        for npcid in get_npcs():
-            npc = get_npc(npcid)
-            pos = npc.get_position()
-            distance = diagonal_distance(pos, (x, y))
-            if distance == 0:
-                direct.append(npc)
-            elif distance == 1:
-                indirect.append(npc)
+        for entity in query(POSITION, (x, y), 1):
+            if entity.get_position() == (x, y):
+                direct.append(entity)
+            else:
+                indirect.append(entity)
 
-        shuffle(indirect)
-        shuffle(direct)
+        rng = stream(self.sub.owner(), "weapons")
+        rng.shuffle(indirect)
+        rng.shuffle(direct)
         return {"indirect": indirect, "direct": direct}
     
     def nondamaging(self, x : int, y : int) -> Dict[str, List[Entity]]:
@@ -104,10 +92,10 @@ class Weaponry():
     def damage_mod(self, entity : Entity) -> int:
         mod = 0
         if entity.is_carbon():
-            if "anticarbon" in self.sub.upgrades.keywords:
+            if self.sub.upgrades.has("anticarbon"):
                 mod += 1
         else:
-            if "antiplastic" in self.sub.upgrades.keywords:
+            if self.sub.upgrades.has("antiplastic"):
                 mod += 1
         return mod
 
@@ -1,3 +1,5 @@
+import discord
+
 from ALTANTIS.utils.consts import TICK, CROSS
 
 class DiscordAction():
@@ -21,6 +23,14 @@ class Message(DiscordAction):
     async def do_status(self, ctx):
         await ctx.send(self.contents)
 
+class Attachment(DiscordAction):
+    def __init__(self, contents, filename):
+        self.contents = contents
+        self.filename = filename
+
+    async def do_status(self, ctx):
+        await ctx.send(self.contents, file=discord.File(self.filename))
+
 OKAY_REACT = React(TICK)
 FAIL_REACT = React(CROSS)
 
@@ -1,13 +1,35 @@
-from discord.ext import commands, tasks
+from discord.ext import commands
 from typing import Optional, List
 import discord
 
 from ALTANTIS.utils.consts import GAME_SPEED
 from ALTANTIS.utils.actions import FAIL_REACT
 from ALTANTIS.game import perform_timestep
-from ALTANTIS.subs.state import get_subs
+from ALTANTIS.utils.maps import close_client
+from ALTANTIS.utils.engine import submit, call, teams, fetch_teams, stop_engine
+from ALTANTIS.utils.scheduler import turn_loop
+from ALTANTIS.utils.games import game_part, game_for, enter
 
-bot = commands.Bot(command_prefix="!")
+class AltantisBot(commands.Bot):
+    async def close(self):
+        # The map upload client lives as long as the bot does.
+        await close_client()
+        stop_engine()
+        await super().close()
+
+bot = AltantisBot(command_prefix="!")
+
+@bot.before_invoke
+async def enter_game(ctx):
+    """
+    Every command plays the game of the server it was sent in (see
+    utils/games.py). This runs in the command's own task, so it lasts just as
+    long as the command does.
+    With an engine, we also make sure we know the game's teams (for
+    get_team) before the command runs.
+    """
+    enter(game_for(ctx.guild))
+    await fetch_teams()
 
 def get_team(channel : discord.TextChannel) -> Optional[str]:
     """
@@ -16,7 +38,7 @@ def get_team(channel : discord.TextChannel) -> Optional[str]:
     category_channel = bot.get_channel(channel.category_id)
     if category_channel:
         team = category_channel.name.lower()
-        if team in get_subs():
+        if team in teams():
             return team
     return None
 
@@ -27,17 +49,21 @@ def to_lowercase_list(args) -> List[str]:
             alist[i] = alist[i].lower()
     return alist
 
-# Main game loop
-@tasks.loop(seconds=GAME_SPEED)
-async def main_loop():
-    await perform_timestep(main_loop.current_loop)
+async def timestep():
+    await call(perform_timestep)
+
+# Main game loop, one per game. It's started from a command, so its task
+# plays that command's game.
+main_loop = game_part("main_loop", lambda: turn_loop(seconds=GAME_SPEED)(timestep))
 
 async def perform(fn, ctx, *args):
     """
     Checks if the main loop is running, and if so performs the function.
+    Functions that change the game (journalled or queued) wait for the start
+    of the next turn instead (see utils/intents.py).
     """
-    if main_loop.is_running():
-        await perform_unsafe(fn, ctx, *args)
+    if main_loop().is_running():
+        await submit(fn, ctx, to_lowercase_list(args), False, True)
     else:
         await FAIL_REACT.do_status(ctx)
 
@@ -45,19 +71,19 @@ async def perform_unsafe(fn, ctx, *args):
     """
     Performs an action fn with *args and then performs the Discord action
     returned by fn using the context ctx.
+    If the loop is running, functions that change the game wait for the start
+    of the next turn, ahead of any players' commands.
     NOTE: This can run outside of the main loop, so should only be called
     if you are certain this will not be an issue.
     """
-    lower_args = to_lowercase_list(args)
-    status = fn(*lower_args)
-    if status: await status.do_status(ctx)
+    await submit(fn, ctx, to_lowercase_list(args), True, main_loop().is_running())
 
 async def perform_async(fn, ctx, *args):
     """
     Checks if the main loop is running, and if so performs the async function.
     """
-    if main_loop.is_running():
-        await perform_async_unsafe(fn, ctx, *args)
+    if main_loop().is_running():
+        await submit(fn, ctx, to_lowercase_list(args), False, True)
     else:
         await FAIL_REACT.do_status(ctx)
 
@@ -68,6 +94,4 @@ async def perform_async_unsafe(fn, ctx, *args):
     NOTE: This can run outside of the main loop, so should only be called
     if you are certain this will not be an issue.
     """
-    lower_args = to_lowercase_list(args)
-    status = await fn(*lower_args)
-    if status: await status.do_status(ctx)
\ No newline at end of file
+    await submit(fn, ctx, to_lowercase_list(args), True, main_loop().is_running())
\ No newline at end of file
@@ -10,9 +10,9 @@ RESOURCES = ["circuitry", "specimen", "plating", "tool"]
 # moving every four "turns", so really you should think about 4*GAME_SPEED.
 GAME_SPEED = 5
 
-# Comms system.
+# Comms system. The cooldown is in turns.
 GARBLE = 10
-COMMS_COOLDOWN = 30
+COMMS_COOLDOWN = 6
 
 # Map size.
 X_LIMIT = 40
@@ -25,6 +25,8 @@ direction_emoji = {"n": "⬆", "e": "➡", "s": "⬇",
 
 TICK = "<:greentick:745348214210822255>"
 CROSS = "<:redcross:745348213149532170>"
+# Reacted to commands that will happen at the start of the next turn.
+QUEUED = "🕒"
 PLUS = "<:greenplus:745389551597519061>"
 
 ADMIN_NAME = "<@!366644564137738240>"
@@ -37,4 +39,32 @@ load_dotenv()
 
 MAP_TOKEN = os.getenv('MAP_TOKEN')
 MAP_DOMAIN = os.getenv('MAP_DOMAIN')
+# Either "remote" (upload to MAP_DOMAIN) or "local" (draw PNGs with Pillow).
+MAP_RENDERER = os.getenv('MAP_RENDERER', 'remote')
+# How many turns between full saves. In between, the journal is enough to
+# rebuild any turn (see ALTANTIS/utils/journal.py).
+CHECKPOINT_INTERVAL = int(os.getenv('CHECKPOINT_INTERVAL', '10'))
+# If set, a SQLite file recording every turn (see ALTANTIS/utils/history.py).
+HISTORY_DB = os.getenv('HISTORY_DB')
+# How many of the newest saves to keep as they are. Older saves are thinned to
+# one per minute, then after KEEP_MINUTELY_HOURS to one per hour, and packed
+# into hourly archives (see ALTANTIS/utils/retention.py).
+KEEP_ALL_SAVES = int(os.getenv('KEEP_ALL_SAVES', '50'))
+KEEP_MINUTELY_HOURS = int(os.getenv('KEEP_MINUTELY_HOURS', '6'))
+# How many of the newest saves to also keep in memory, for quick !loads.
+ROLLBACK_SAVES = int(os.getenv('ROLLBACK_SAVES', '10'))
+# What to do when a turn takes longer than GAME_SPEED: "skip", "compress" or
+# "stretch" (see ALTANTIS/utils/scheduler.py).
+TURN_OVERRUN_POLICY = os.getenv('TURN_OVERRUN_POLICY', 'skip')
+# The most turns "compress" will run back to back to catch up.
+MAX_CATCH_UP = int(os.getenv('MAX_CATCH_UP', '3'))
+# If set, each Discord server the bot is in plays its own game (see
+# ALTANTIS/utils/games.py). Otherwise there is one game, whichever server.
+MULTIPLE_GAMES = os.getenv('MULTIPLE_GAMES') is not None
+# If set, the game runs in a process of its own, apart from Discord (see
+# ALTANTIS/utils/engine.py).
+ENGINE_PROCESS = os.getenv('ENGINE_PROCESS') is not None
+# How many worker processes to split each turn's squares and creatures
+# between, by region of the map (see ALTANTIS/world/regions.py). 0 for none.
+REGION_WORKERS = int(os.getenv('REGION_WORKERS', '0'))
 TOKEN = os.getenv('DISCORD_TOKEN')
\ No newline at end of file
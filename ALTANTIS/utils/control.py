@@ -4,21 +4,28 @@ A file for useful control and news functionality.
 
 import discord
 
-control_alerts = None
-news_alerts = None
+from ALTANTIS.utils.journal import is_replaying
+from ALTANTIS.utils.games import game_part
+
+class Alerts():
+    def __init__(self):
+        self.control_alerts = None
+        self.news_alerts = None
+
+live_alerts = game_part("alerts", Alerts)
 
 async def notify_control(event : str):
-    if control_alerts:
+    control_alerts = live_alerts().control_alerts
+    if control_alerts and not is_replaying():
         await control_alerts.send(event)
 
 def init_control_notifs(channel : discord.TextChannel):
-    global control_alerts
-    control_alerts = channel
+    live_alerts().control_alerts = channel
 
 async def notify_news(event : str):
-    if news_alerts:
+    news_alerts = live_alerts().news_alerts
+    if news_alerts and not is_replaying():
         await news_alerts.send(event)
 
 def init_news_notifs(channel : discord.TextChannel):
-    global news_alerts
-    news_alerts = channel
\ No newline at end of file
+    live_alerts().news_alerts = channel
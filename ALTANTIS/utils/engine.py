@@ -0,0 +1,356 @@
+"""
+Runs the game in a process of its own when ENGINE_PROCESS is set, so that a
+slow turn, save or map never holds up Discord (heartbeats included), and the
+engine can be restarted or profiled without touching the bot.
+The bot process keeps everything that talks to Discord: commands, the main
+loops' schedules, and sending messages. Everything else happens in the engine,
+which the bot talks to over a Pipe. Each message is a dict:
+* From the bot: "perform" (run a command as submit in intents.py would),
+  "call" (run a function and send back what it returns, as for turns) and
+  "stop". Each has an id and the game it's for (see utils/games.py).
+* From the engine: "send" and "react" (to Discord, by channel and message
+  ID), "roles" (docking or undocking a team's crew, by server ID), then
+  "done" or "failed" for the request with that id. Done replies
+  carry the game's teams, so the bot can tell which channels are subs'.
+Messages arrive in order, so everything a request sends is sent before we
+hear it's done.
+Discord objects can't cross to the engine, so arguments are replaced by
+stand-ins first (see encode): channels and categories by their IDs and names,
+servers by their IDs, the bot by an EngineClient, and a main loop by a LoopView of its timings.
+Functions marked with gateway still run in the bot, as they need Discord
+itself (creating channels, say).
+Without ENGINE_PROCESS, all of this is skipped and everything runs in the bot
+as before.
+"""
+
+import asyncio, atexit, datetime, importlib, inspect, multiprocessing, os
+from typing import Dict, List, Any, Callable, Optional
+
+import discord
+
+from ALTANTIS.utils.consts import ENGINE_PROCESS
+from ALTANTIS.utils.games import current_game, game_with_key, playing
+from ALTANTIS.utils.roles import dock_crew, undock_crew
+
+# The names of functions that must run beside Discord.
+GATEWAY : Dict[str, Callable] = {}
+
+class EngineError(Exception):
+    pass
+
+class RemoteChannel():
+    """
+    A text channel, as seen by the engine: sending to it asks the bot to.
+    """
+    def __init__(self, id : int, name : str = ""):
+        self.id = id
+        self.name = name
+
+    async def send(self, content : str, file : Optional[discord.File] = None):
+        filename = None
+        if file is not None:
+            # Maps are kept on disk, so the bot can open them again.
+            filename = file.fp.name
+            file.close()
+        post({"type": "send", "channel": self.id, "content": content, "filename": filename})
+
+class RemoteCategory():
+    def __init__(self, name : str, text_channels : List[RemoteChannel]):
+        self.name = name
+        self.text_channels = text_channels
+
+class RemoteMessage():
+    def __init__(self, channel : int, id : int):
+        self.channel = channel
+        self.id = id
+
+    async def add_reaction(self, emoji : str):
+        post({"type": "react", "channel": self.channel, "message": self.id, "emoji": emoji})
+
+class RemoteGuild():
+    """
+    A server, as seen by the engine: changing roles in it asks the bot to
+    (see utils/roles.py).
+    """
+    def __init__(self, id : int):
+        self.id = id
+
+    async def dock_crew(self, team : str, location : str):
+        post({"type": "roles", "guild": self.id, "team": team, "location": location})
+
+    async def undock_crew(self, team : str):
+        post({"type": "roles", "guild": self.id, "team": team, "location": None})
+
+class RemoteContext():
+    """
+    The command's context, for the DiscordAction it returns.
+    """
+    def __init__(self, channel : int, message : int):
+        self.channel = RemoteChannel(channel)
+        self.message = RemoteMessage(channel, message)
+
+    async def send(self, content : str, file : Optional[discord.File] = None):
+        await self.channel.send(content, file=file)
+
+class EngineClient():
+    """
+    Stands in for the bot when loading subs (see schema.py).
+    """
+    def get_channel(self, id : int) -> RemoteChannel:
+        return RemoteChannel(id)
+
+class LoopView():
+    """
+    What status messages and !recover need to know about a main loop.
+    """
+    def __init__(self, seconds : float, next_iteration : Optional[datetime.datetime], running : bool):
+        self.seconds = seconds
+        self.next_iteration = next_iteration
+        self.running = running
+
+    def is_running(self) -> bool:
+        return self.running
+
+def gateway(fn : Callable) -> Callable:
+    """
+    Marks fn as needing Discord, so it runs in the bot even with an engine.
+    """
+    GATEWAY[name_of(fn)] = fn
+    return fn
+
+def name_of(fn : Callable) -> str:
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+def resolve(module : str, qualname : str) -> Callable:
+    if not module.startswith("ALTANTIS."):
+        raise EngineError(f"Refusing to run {module}.{qualname}.")
+    fn : Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        fn = getattr(fn, part)
+    return fn
+
+# In the engine: the end of the Pipe to the bot.
+engine_connection : Optional[Any] = None
+
+def post(message : Dict[str, Any]):
+    if engine_connection is None:
+        raise EngineError("Only the engine can send through the bot.")
+    engine_connection.send(message)
+
+def teams_now() -> List[str]:
+    from ALTANTIS.subs.state import get_subs
+    return list(get_subs())
+
+async def handle(request : Dict[str, Any]):
+    from ALTANTIS.utils.intents import submit as submit_here
+    try:
+        with playing(game_with_key(request["game"])):
+            fn = resolve(*request["fn"])
+            result = None
+            if request["type"] == "perform":
+                await submit_here(fn, RemoteContext(*request["context"]), request["args"], request["control"], request["loop_running"])
+            else:
+                result = fn(*request["args"])
+                if inspect.isawaitable(result):
+                    result = await result
+            post({"type": "done", "id": request["id"], "game": request["game"], "result": result, "teams": teams_now()})
+    except Exception as error:
+        post({"type": "failed", "id": request["id"], "error": repr(error)})
+
+async def serve_requests():
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            request = await loop.run_in_executor(None, engine_connection.recv)
+        except EOFError:
+            break
+        if request["type"] == "stop":
+            break
+        # Like commands in the bot, requests run alongside each other (and
+        # alongside turns), and queue themselves if need be.
+        loop.create_task(handle(request))
+
+def serve(connection):
+    """
+    The engine process. Importing ALTANTIS loads every command (and so every
+    journalled and queued function) and every NPC type, as in the bot.
+    """
+    global engine_connection
+    engine_connection = connection
+    asyncio.run(serve_requests())
+
+# In the bot: the engine, our end of the Pipe, and the requests we're
+# waiting on.
+process : Optional[multiprocessing.Process] = None
+connection : Optional[Any] = None
+client : Optional[discord.Client] = None
+waiting : Dict[int, asyncio.Future] = {}
+last_request = 0
+reader : Optional[asyncio.Task] = None
+# The teams in each game, as of the last reply.
+teams_by_game : Dict[Optional[int], List[str]] = {}
+
+def enabled() -> bool:
+    return ENGINE_PROCESS
+
+def start_engine(bot : discord.Client):
+    global process, connection, client
+    client = bot
+    context = multiprocessing.get_context("spawn")
+    (connection, theirs) = context.Pipe()
+    # Not a daemon, so that it can start region workers of its own (see
+    # world/regions.py). We stop it on the way out instead.
+    process = context.Process(target=serve, args=(theirs,))
+    process.start()
+    theirs.close()
+    # After multiprocessing's own exit handler (which waits for the engine),
+    # so that ours runs first.
+    atexit.unregister(stop_engine)
+    atexit.register(stop_engine)
+    print(f"Engine running in process {process.pid}.")
+
+def stop_engine():
+    global process, connection, reader
+    if process is None:
+        return
+    try:
+        connection.send({"type": "stop"})
+    except (OSError, ValueError):
+        pass
+    process.join(5)
+    if process.is_alive():
+        process.terminate()
+    connection.close()
+    if reader is not None:
+        reader.cancel()
+    fail_waiting("The engine was stopped.")
+    (process, connection, reader) = (None, None, None)
+    teams_by_game.clear()
+
+def restart_engine() -> bool:
+    """
+    Starts a fresh engine, which knows nothing until something is loaded or
+    recovered.
+    """
+    if process is None:
+        return False
+    stop_engine()
+    start_engine(client)
+    return True
+
+def fail_waiting(reason : str):
+    for future in waiting.values():
+        if not future.done():
+            future.set_exception(EngineError(reason))
+    waiting.clear()
+
+async def deliver(message : Dict[str, Any]):
+    if message["type"] == "send":
+        channel = client.get_channel(message["channel"])
+        if channel is not None:
+            file = discord.File(message["filename"]) if message["filename"] and os.path.exists(message["filename"]) else None
+            await channel.send(message["content"], file=file)
+    elif message["type"] == "react":
+        channel = client.get_channel(message["channel"])
+        if channel is not None:
+            await (await channel.fetch_message(message["message"])).add_reaction(message["emoji"])
+    elif message["type"] == "roles":
+        guild = client.get_guild(message["guild"])
+        if guild is not None:
+            if message["location"] is None:
+                await undock_crew(guild, message["team"])
+            else:
+                await dock_crew(guild, message["team"], message["location"])
+    else:
+        future = waiting.pop(message["id"], None)
+        if future is None or future.done():
+            return
+        if message["type"] == "failed":
+            future.set_exception(EngineError(message["error"]))
+        else:
+            teams_by_game[message["game"]] = message["teams"]
+            future.set_result(message["result"])
+
+async def read_replies():
+    loop = asyncio.get_event_loop()
+    ours = connection
+    while True:
+        try:
+            message = await loop.run_in_executor(None, ours.recv)
+        except (EOFError, OSError):
+            fail_waiting("The engine has stopped.")
+            return
+        try:
+            await deliver(message)
+        except discord.DiscordException as error:
+            print(f"Couldn't deliver {message['type']} from the engine: {error!r}")
+
+def encode(arg : Any) -> Any:
+    """
+    Replaces the Discord objects in arg with stand-ins the engine can use.
+    """
+    from ALTANTIS.utils.scheduler import TurnScheduler
+    if type(arg) in [list, tuple]:
+        return type(arg)(map(encode, arg))
+    if isinstance(arg, TurnScheduler):
+        return LoopView(arg.seconds, arg.next_iteration, arg.is_running())
+    if isinstance(arg, discord.Client):
+        return EngineClient()
+    if isinstance(arg, discord.CategoryChannel):
+        return RemoteCategory(arg.name, [RemoteChannel(channel.id, channel.name) for channel in arg.text_channels])
+    if isinstance(arg, discord.TextChannel):
+        return RemoteChannel(arg.id, arg.name)
+    if isinstance(arg, discord.Guild):
+        return RemoteGuild(arg.id)
+    return arg
+
+async def request(kind : str, fn : Callable, args : List[Any], **extra : Any) -> Any:
+    global last_request, reader
+    if reader is None or reader.done():
+        reader = asyncio.get_event_loop().create_task(read_replies())
+    last_request += 1
+    future = asyncio.get_event_loop().create_future()
+    waiting[last_request] = future
+    # Replies name their game, as it's the reader (not us) that sees them.
+    game = current_game().key
+    connection.send({"type": kind, "id": last_request, "game": game, "fn": (fn.__module__, fn.__qualname__),
+                     "args": encode(list(args)), **extra})
+    return await future
+
+async def submit(fn : Callable, ctx, args : List[Any], control : bool, loop_running : bool):
+    """
+    intents.submit, but in the engine (unless fn is a gateway).
+    """
+    from ALTANTIS.utils.intents import submit as submit_here
+    if process is None or name_of(fn) in GATEWAY:
+        await submit_here(fn, ctx, args, control, loop_running)
+        return
+    await request("perform", fn, args, context=(ctx.channel.id, ctx.message.id), control=control, loop_running=loop_running)
+
+async def call(fn : Callable, *args : Any) -> Any:
+    """
+    Runs fn in the engine if there is one, and here if not, giving back what
+    it returns (which must be picklable).
+    """
+    if process is None:
+        result = fn(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+    return await request("call", fn, list(args))
+
+def teams() -> List[str]:
+    """
+    The current game's teams, wherever the game is.
+    """
+    if process is None:
+        return teams_now()
+    return teams_by_game.get(current_game().key, [])
+
+async def fetch_teams():
+    """
+    Asks the engine for the current game's teams, unless we've heard them
+    since it started.
+    """
+    if process is not None and current_game().key not in teams_by_game:
+        await call(teams_now)
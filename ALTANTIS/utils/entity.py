@@ -1,6 +1,11 @@
-from typing import Tuple
+from typing import Tuple, Any
+
+from ALTANTIS.world.components import POSITION, MESSAGING, CARBON
 
 class Entity():
+    # Which components we have (see ALTANTIS.world.components).
+    components = POSITION | MESSAGING
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -29,5 +34,11 @@ class Entity():
         """
         raise NotImplementedError
 
+    def owner(self) -> Tuple[str, Any]:
+        """
+        Who owns this entity's timers (see ALTANTIS.utils.timers).
+        """
+        raise NotImplementedError
+
     def is_carbon(self) -> bool:
-        return False
\ No newline at end of file
+        return bool(self.components & CARBON)
@@ -0,0 +1,233 @@
+"""
+A live feed of changes to the world, for control dashboards.
+Clients connect to a local HTTP endpoint and receive Server-Sent Events: one
+"snapshot" event describing the whole world, then one "delta" event per turn
+describing only what changed.
+Squares are only looked at when the map says they changed (see WorldMap), so
+an unchanged map costs nothing per turn.
+"""
+
+import asyncio, json
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from ALTANTIS.utils.games import game_part
+from ALTANTIS.utils.snapshot import reading, current
+from ALTANTIS.world.world import live_map
+
+# Clients that fall this many turns behind are dropped (they can reconnect to
+# get a fresh snapshot).
+MAX_QUEUED_EVENTS = 64
+
+class Feed():
+    """
+    One game's feed. Each game serves its own, on whichever port it's
+    started on.
+    """
+    def __init__(self):
+        self.server : Optional[asyncio.AbstractServer] = None
+        self.clients : Set[asyncio.Queue] = set()
+        # The world as it was when we last published, for diffing against.
+        self.last_view : Optional[Dict[str, Any]] = None
+        self.last_turn : int = -1
+
+live_feed = game_part("feed", Feed)
+
+def cell_view(x : int, y : int) -> Optional[Dict[str, Any]]:
+    """
+    What the feed reports on a square, or None for a square with no attributes
+    or treasure.
+    """
+    square = live_map().cells[x][y]
+    if square.attributes or square.treasure:
+        return {"attributes": dict(square.attributes), "treasure": list(square.treasure)}
+    return None
+
+def update_cells(cells : Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Brings cells (a view's squares) up to date, looking only at the squares
+    the map says changed since we last did. Gives back what those squares were
+    before and are now, as views' cells.
+    """
+    world_map = live_map()
+    changed = world_map.changes("feed")
+    if changed is None:
+        before = dict(cells)
+        cells.clear()
+        changed = {(x, y) for x in range(world_map.x_limit) for y in range(world_map.y_limit)}
+    else:
+        before = {key: cells[key] for key in (f"{x},{y}" for (x, y) in changed) if key in cells}
+    after = {}
+    for (x, y) in changed:
+        key = f"{x},{y}"
+        view = cell_view(x, y)
+        if view is None:
+            cells.pop(key, None)
+        else:
+            cells[key] = after[key] = view
+    return (before, after)
+
+def entity_view() -> Dict[str, Any]:
+    """
+    Where every sub and NPC is, as of the published snapshot, so that looking
+    doesn't count as changing them (see utils/snapshot.py).
+    """
+    from ALTANTIS.subs.state import get_sub_objects
+    from ALTANTIS.npcs.npc import current_registry
+
+    entities = {}
+    token = reading.set(current())
+    try:
+        for sub in get_sub_objects():
+            (x, y) = sub.movement.get_position()
+            entities[f"sub:{sub._name}"] = {"kind": "sub", "name": sub.name(), "x": x, "y": y}
+        registry = current_registry()
+        for npcid in registry.ids():
+            npc = registry.lookup(npcid)
+            entities[f"npc:{npc.id}"] = {"kind": "npc", "name": npc.name(), "x": npc.x, "y": npc.y}
+    finally:
+        reading.reset(token)
+    return entities
+
+def world_view() -> Dict[str, Any]:
+    """
+    A JSON-friendly description of everything the feed reports on.
+    Only squares with attributes or treasure are included.
+    """
+    cells : Dict[str, Any] = {}
+    update_cells(cells)
+    return {"entities": entity_view(), "cells": cells}
+
+def diff_views(old : Dict[str, Any], new : Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Lists the changes needed to turn view old into view new. A change of
+    weather is sent as a weather event, and any other change of attributes
+    as an attributes event.
+    """
+    changes = []
+    old_entities, new_entities = old["entities"], new["entities"]
+    for key in new_entities:
+        entity = new_entities[key]
+        if key not in old_entities:
+            changes.append({"event": "spawn", "id": key, **entity})
+        elif (old_entities[key]["x"], old_entities[key]["y"]) != (entity["x"], entity["y"]):
+            changes.append({"event": "move", "id": key, "x": entity["x"], "y": entity["y"]})
+    for key in old_entities:
+        if key not in new_entities:
+            changes.append({"event": "death", "id": key})
+
+    empty = {"attributes": {}, "treasure": []}
+    old_cells, new_cells = old["cells"], new["cells"]
+    for key in sorted(set(old_cells) | set(new_cells)):
+        before = old_cells.get(key, empty)
+        after = new_cells.get(key, empty)
+        (x, y) = map(int, key.split(","))
+        if before["attributes"].get("weather") != after["attributes"].get("weather"):
+            changes.append({"event": "weather", "x": x, "y": y, "weather": after["attributes"].get("weather")})
+        if without_weather(before["attributes"]) != without_weather(after["attributes"]):
+            changes.append({"event": "attributes", "x": x, "y": y, "attributes": after["attributes"]})
+        if before["treasure"] != after["treasure"]:
+            changes.append({"event": "treasure", "x": x, "y": y, "treasure": after["treasure"]})
+    return changes
+
+def without_weather(attributes : Dict[str, Any]) -> Dict[str, Any]:
+    return {name: attributes[name] for name in attributes if name != "weather"}
+
+def format_event(name : str, data : Any) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+def disconnect(queue : asyncio.Queue):
+    """
+    Tells a client's handler to hang up, discarding anything it hasn't sent.
+    """
+    live_feed().clients.discard(queue)
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+def push(event : bytes):
+    for queue in list(live_feed().clients):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow; they'll get a snapshot when they reconnect.
+            disconnect(queue)
+
+async def publish_turn(turn : int):
+    """
+    Sends the changes made this turn to everyone listening.
+    Does nothing if the feed isn't running.
+    """
+    feed = live_feed()
+    feed.last_turn = turn
+    if feed.server is None or not feed.clients:
+        # Nobody to tell, so the next client will just get a fresh snapshot.
+        feed.last_view = None
+        live_map().unwatch("feed")
+        return
+    if feed.last_view is None:
+        feed.last_view = world_view()
+        return
+    # Only the squares that changed are diffed.
+    (before, after) = update_cells(feed.last_view["cells"])
+    entities = entity_view()
+    changes = diff_views({"entities": feed.last_view["entities"], "cells": before}, {"entities": entities, "cells": after})
+    feed.last_view["entities"] = entities
+    push(format_event("delta", {"turn": turn, "changes": changes}))
+
+async def handle_client(reader : asyncio.StreamReader, writer : asyncio.StreamWriter):
+    # Connections are handled in the context the server was started in, so
+    # this is the feed of the game that started it.
+    feed = live_feed()
+    queue : asyncio.Queue = asyncio.Queue(MAX_QUEUED_EVENTS)
+    try:
+        # We serve the same stream whatever the path, so just skip the request.
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n"
+            b"Access-Control-Allow-Origin: *\r\n\r\n"
+        )
+        if feed.last_view is None:
+            feed.last_view = world_view()
+        writer.write(format_event("snapshot", {"turn": feed.last_turn, **feed.last_view}))
+        # Listening from the snapshot on, with no await in between, so no
+        # turn can be published that neither includes.
+        feed.clients.add(queue)
+        await writer.drain()
+
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            writer.write(event)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        feed.clients.discard(queue)
+        writer.close()
+
+async def start_feed(port : int, host : str = "127.0.0.1") -> bool:
+    feed = live_feed()
+    if feed.server is not None:
+        return False
+    feed.server = await asyncio.start_server(handle_client, host, port)
+    return True
+
+async def stop_feed() -> bool:
+    feed = live_feed()
+    if feed.server is None:
+        return False
+    feed.server.close()
+    for queue in list(feed.clients):
+        disconnect(queue)
+    await feed.server.wait_closed()
+    feed.server = None
+    feed.last_view = None
+    live_map().unwatch("feed")
+    return True
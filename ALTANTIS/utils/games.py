@@ -0,0 +1,88 @@
+"""
+Lets one process run several games at once, one per Discord server, so that
+a megagame and its test game can share a bot.
+Everything a game keeps between turns belongs to a Game rather than to module
+globals. Each module declares its share with game_part, and reads it through
+the accessor that gives back, which finds the part in whichever game is being
+played (making it the first time it's asked for).
+Which game that is lives in a ContextVar, like the snapshot being read (see
+snapshot.py). Commands set it from their server (see utils/bot.py), and each
+game's turn loop is started from inside it, so the loop's task keeps it. Two
+games can then interleave at every await without seeing each other.
+Unless MULTIPLE_GAMES is set (and always without a server, as in scripts),
+everything is the default game, which saves to saves/ just as before. Other
+games save to saves/<server id>/.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Optional
+
+from ALTANTIS.utils.consts import MULTIPLE_GAMES
+
+# How to make each part of a game, by name.
+PARTS : Dict[str, Callable[[], Any]] = {}
+
+class Game():
+    def __init__(self, key : Optional[int]):
+        # The server's ID, or None for the default game.
+        self.key = key
+        self.parts : Dict[str, Any] = {}
+
+    def part(self, name : str) -> Any:
+        if name not in self.parts:
+            # Parts can use other parts while being made, which must be ours.
+            with playing(self):
+                self.parts[name] = PARTS[name]()
+        return self.parts[name]
+
+    def save_directory(self) -> str:
+        return "saves" if self.key is None else f"saves/{self.key}"
+
+default = Game(None)
+games : Dict[int, Game] = {}
+
+active : ContextVar[Optional[Game]] = ContextVar("active", default=None)
+
+def current_game() -> Game:
+    game = active.get()
+    return default if game is None else game
+
+@contextmanager
+def playing(game : Game):
+    token = active.set(game)
+    try:
+        yield game
+    finally:
+        active.reset(token)
+
+def enter(game : Game):
+    """
+    Plays game for the rest of the current task.
+    """
+    active.set(game)
+
+def game_for(guild) -> Game:
+    """
+    The game played in a Discord server.
+    """
+    if guild is None or not MULTIPLE_GAMES:
+        return default
+    return game_with_key(guild.id)
+
+def game_with_key(key : Optional[int]) -> Game:
+    if key is None:
+        return default
+    if key not in games:
+        games[key] = Game(key)
+    return games[key]
+
+def game_part(name : str, factory : Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Declares a part of every game, made by factory. Returns a function giving
+    the current game's part.
+    """
+    PARTS[name] = factory
+    def part() -> Any:
+        return current_game().part(name)
+    return part
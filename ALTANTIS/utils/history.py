@@ -0,0 +1,165 @@
+"""
+An optional SQLite store of the game's history, holding a row for every sub,
+every NPC and every non-empty square at the end of every turn.
+Unlike the save files, this lets control restore one sub, NPC or part of the
+map from an earlier turn without rolling back anything else, and look up how
+something changed over time without loading whole saves.
+Set HISTORY_DB to a file name to turn it on.
+"""
+
+import json, sqlite3, datetime, os
+from typing import Optional, List, Tuple, Dict, Any
+
+from ALTANTIS.utils.consts import HISTORY_DB
+from ALTANTIS.utils.games import game_part, current_game
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (turn INTEGER PRIMARY KEY, recorded TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS subs (turn INTEGER NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (turn, name));
+CREATE INDEX IF NOT EXISTS subs_by_name ON subs (name, turn);
+CREATE TABLE IF NOT EXISTS npcs (turn INTEGER NOT NULL, id INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (turn, id));
+CREATE INDEX IF NOT EXISTS npcs_by_id ON npcs (id, turn);
+CREATE TABLE IF NOT EXISTS cells (turn INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (turn, x, y));
+CREATE INDEX IF NOT EXISTS cells_by_position ON cells (x, y, turn);
+"""
+
+class Database():
+    def __init__(self):
+        self.connection : Optional[sqlite3.Connection] = None
+
+live_database = game_part("history", Database)
+
+def enabled() -> bool:
+    return HISTORY_DB is not None
+
+def get_connection() -> Optional[sqlite3.Connection]:
+    if not enabled():
+        return None
+    database = live_database()
+    if database.connection is None:
+        # Other games keep their history beside their saves.
+        game = current_game()
+        filename = HISTORY_DB if game.key is None else os.path.join(game.save_directory(), os.path.basename(HISTORY_DB))
+        database.connection = sqlite3.connect(filename)
+        database.connection.executescript(SCHEMA)
+    return database.connection
+
+def record_turn(turn : int):
+    """
+    Writes the whole game at the end of turn, in a single transaction.
+    If this turn was recorded before (because the game was recovered to an
+    earlier turn since), the old rows are replaced.
+    """
+    from ALTANTIS.subs.state import get_sub_objects
+    from ALTANTIS.npcs.npc import live_registry, npc_to_dict
+    from ALTANTIS.world import world
+
+    db = get_connection()
+    if db is None:
+        return
+    subs = [(turn, sub._name, json.dumps(sub.to_dict())) for sub in get_sub_objects()]
+    registry = live_registry()
+    npcs = [(turn, npcid, json.dumps(npc_to_dict(registry.lookup(npcid)))) for npcid in registry.ids()]
+    cells = []
+    world_map = world.live_map()
+    for x in range(world_map.x_limit):
+        for y in range(world_map.y_limit):
+            cell = world_map.cells[x][y]
+            if cell.treasure or cell.attributes or cell.explored:
+                cells.append((turn, x, y, json.dumps(cell._to_dict())))
+    with db:
+        for table in ["turns", "subs", "npcs", "cells"]:
+            db.execute(f"DELETE FROM {table} WHERE turn = ?", (turn,))
+        db.execute("INSERT INTO turns VALUES (?, ?)", (turn, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        db.executemany("INSERT INTO subs VALUES (?, ?, ?)", subs)
+        db.executemany("INSERT INTO npcs VALUES (?, ?, ?)", npcs)
+        db.executemany("INSERT INTO cells VALUES (?, ?, ?, ?)", cells)
+
+def was_recorded(turn : int) -> bool:
+    db = get_connection()
+    if db is None:
+        return False
+    return db.execute("SELECT 1 FROM turns WHERE turn = ?", (turn,)).fetchone() is not None
+
+def sub_at(name : str, turn : int) -> Optional[Dict[str, Any]]:
+    db = get_connection()
+    if db is None:
+        return None
+    row = db.execute("SELECT data FROM subs WHERE name = ? AND turn = ?", (name, turn)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def npc_at(npcid : int, turn : int) -> Optional[Dict[str, Any]]:
+    db = get_connection()
+    if db is None:
+        return None
+    row = db.execute("SELECT data FROM npcs WHERE id = ? AND turn = ?", (npcid, turn)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def cells_at(x0 : int, y0 : int, x1 : int, y1 : int, turn : int) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """
+    Gets the non-empty squares between (x0, y0) and (x1, y1) inclusive.
+    """
+    db = get_connection()
+    if db is None:
+        return {}
+    rows = db.execute(
+        "SELECT x, y, data FROM cells WHERE turn = ? AND x BETWEEN ? AND ? AND y BETWEEN ? AND ?",
+        (turn, x0, x1, y0, y1)
+    )
+    return {(x, y): json.loads(data) for (x, y, data) in rows}
+
+def sub_history(name : str, count : int) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    The last count turns recorded for a sub, newest first.
+    """
+    db = get_connection()
+    if db is None:
+        return []
+    rows = db.execute("SELECT turn, data FROM subs WHERE name = ? ORDER BY turn DESC LIMIT ?", (name, count))
+    return [(turn, json.loads(data)) for (turn, data) in rows]
+
+def npc_history(npcid : int, count : int) -> List[Tuple[int, Dict[str, Any]]]:
+    db = get_connection()
+    if db is None:
+        return []
+    rows = db.execute("SELECT turn, data FROM npcs WHERE id = ? ORDER BY turn DESC LIMIT ?", (npcid, count))
+    return [(turn, json.loads(data)) for (turn, data) in rows]
+
+def restore_sub(name : str, turn : int, client) -> bool:
+    """
+    Puts a sub back how it was at the end of turn, keeping its channels.
+    """
+    from ALTANTIS.subs.state import get_sub, replace_sub
+    from ALTANTIS.subs.sub import sub_from_dict
+    data = sub_at(name, turn)
+    if data is None:
+        return False
+    sub = sub_from_dict(data, client)
+    current = get_sub(name)
+    if current is not None:
+        sub.channels = current.channels
+    replace_sub(sub)
+    return True
+
+def restore_npc(npcid : int, turn : int) -> bool:
+    from ALTANTIS.npcs.npc import restore_npc as put_back
+    data = npc_at(npcid, turn)
+    if data is None:
+        return False
+    put_back(data)
+    return True
+
+def restore_region(x0 : int, y0 : int, x1 : int, y1 : int, turn : int) -> bool:
+    """
+    Puts the squares from (x0, y0) to (x1, y1) inclusive back how they were
+    at the end of turn. Squares with no row were empty.
+    """
+    from ALTANTIS.world.world import Cell, replace_square, in_world
+    if not was_recorded(turn):
+        return False
+    cells = cells_at(x0, y0, x1, y1, turn)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            if in_world(x, y):
+                replace_square(x, y, Cell._from_dict(cells[(x, y)]) if (x, y) in cells else Cell())
+    return True
@@ -0,0 +1,114 @@
+"""
+Queues commands that change the game while the loop is running, and applies
+them together at the start of the next turn, rather than whenever they happen
+to arrive (which might be halfway through a turn, while it waits on Discord).
+Every journalled command is queued, as replaying the journal could only put
+one run halfway through a turn after the turn instead. Commands marked with
+queued can also say how to check them and which earlier ones they replace.
+A queued command is checked as soon as it arrives, so obvious mistakes are
+still rejected straight away, and is otherwise acknowledged with QUEUED.
+At the start of each turn, control's commands are applied first, then the
+players', each in the order they arrived. Commands with a collapse key replace
+any earlier queued command with the same key, so only the last !setdir a sub
+sends in a turn counts.
+Applying a command journals it as usual, so replaying the journal applies it
+at the same point between turns.
+"""
+
+import inspect
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from ALTANTIS.utils.actions import React, FAIL_REACT
+from ALTANTIS.utils.consts import QUEUED
+from ALTANTIS.utils.journal import record_command, full_name, JOURNALLED
+from ALTANTIS.utils.snapshot import writes
+from ALTANTIS.utils.games import game_part
+
+class Intent():
+    def __init__(self, fn : Callable, ctx, args : List[Any], key : Optional[Tuple[str, Any]]):
+        self.fn = fn
+        self.ctx = ctx
+        self.args = args
+        self.key = key
+
+# Every queued function by name, with its validator and collapse function.
+QUEUED_FNS : Dict[str, Tuple[Callable[..., bool], Optional[Callable[..., Any]]]] = {}
+
+class Lanes():
+    def __init__(self):
+        self.control : List[Intent] = []
+        self.player : List[Intent] = []
+
+live_lanes = game_part("intents", Lanes)
+
+def queued(validate : Callable[..., bool], collapse : Optional[Callable[..., Any]] = None) -> Callable:
+    """
+    Marks fn as waiting for the start of the next turn when the loop is
+    running. validate takes the same arguments as fn, and says whether the
+    command makes sense at all. If given, collapse also takes the same
+    arguments, and gives a key (usually the team) that later commands replace
+    earlier ones on.
+    """
+    def register(fn : Callable) -> Callable:
+        QUEUED_FNS[full_name(fn)] = (validate, collapse)
+        return fn
+    return register
+
+async def run(fn : Callable, ctx, args : List[Any]):
+    """
+    Runs fn straight away (journalling it), then performs the Discord action
+    it returns.
+    """
+    with record_command(fn, args):
+        if getattr(fn, "reads_snapshot", False):
+            status = await call(fn, args)
+        else:
+            with writes():
+                status = await call(fn, args)
+    if status: await status.do_status(ctx)
+
+async def call(fn : Callable, args : List[Any]):
+    status = fn(*args)
+    if inspect.isawaitable(status):
+        status = await status
+    return status
+
+async def submit(fn : Callable, ctx, args : List[Any], control : bool, loop_running : bool):
+    """
+    Runs fn, or queues it until the next turn if it's queued or journalled and
+    the loop is running.
+    """
+    name = full_name(fn)
+    if not loop_running or (name not in QUEUED_FNS and name not in JOURNALLED):
+        await run(fn, ctx, args)
+        return
+    (validate, collapse) = QUEUED_FNS.get(name, (None, None))
+    if validate is not None and not validate(*args):
+        await FAIL_REACT.do_status(ctx)
+        return
+    lanes = live_lanes()
+    lane = lanes.control if control else lanes.player
+    key = None
+    if collapse is not None:
+        key = (name, collapse(*args))
+        lane[:] = [intent for intent in lane if intent.key != key]
+    lane.append(Intent(fn, ctx, args, key))
+    await React(QUEUED).do_status(ctx)
+
+async def apply_intents():
+    """
+    Applies everything queued since the last turn. Anything queued while we're
+    doing so waits for the turn after.
+    """
+    lanes = live_lanes()
+    intents = lanes.control[:] + lanes.player[:]
+    lanes.control.clear()
+    lanes.player.clear()
+    for intent in intents:
+        try:
+            await run(intent.fn, intent.ctx, intent.args)
+        except Exception as error:
+            # Before queueing, a broken command only failed itself, and it
+            # mustn't take the turn down with it now.
+            print(f"Queued command {full_name(intent.fn)} failed: {error!r}")
+            await FAIL_REACT.do_status(intent.ctx)
@@ -0,0 +1,205 @@
+"""
+Keeps a journal of everything that changes the game, so that any turn can be
+rebuilt without Discord.
+Every turn and every state-changing command is appended to the journal along
+with the seed it ran with, so running them again gives exactly the same
+results. A command's seed only lasts as long as the command, so one run while
+a turn is waiting on something doesn't change the turn's. Full saves then only need to be
+made every CHECKPOINT_INTERVAL turns: to rebuild a turn, load the checkpoint
+before it and replay the journal from there (see recover_game in game.py).
+"""
+
+import json, os, random, secrets
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from ALTANTIS.utils.games import game_part, current_game
+
+def journal_file() -> str:
+    return os.path.join(current_game().save_directory(), "journal.jsonl")
+
+# Every function whose calls are journalled, by name.
+JOURNALLED : Dict[str, Callable] = {}
+
+class Progress():
+    def __init__(self):
+        # The number of the last turn run. Unlike the main loop's counter,
+        # this carries on counting across restarts.
+        self.turn : Optional[int] = None
+        # While replaying, nothing is journalled and nothing is sent to Discord.
+        self.replaying = False
+        # The seed of the turn being run (see ALTANTIS.utils.rng).
+        self.seed : Optional[int] = None
+
+live = game_part("journal", Progress)
+
+# The seed of the command being run, if any, which it uses instead of the
+# turn's. Like the game being played (see games.py), this is per task.
+command_seed : ContextVar[Optional[int]] = ContextVar("command_seed", default=None)
+
+def full_name(fn : Callable) -> str:
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+def journalled(fn : Callable) -> Callable:
+    """
+    Marks fn as changing the game, so every call to it through perform is
+    journalled. Its arguments must be JSON-friendly, apart from Discord
+    objects, which are replayed as None.
+    """
+    JOURNALLED[full_name(fn)] = fn
+    return fn
+
+def is_replaying() -> bool:
+    return live().replaying
+
+@contextmanager
+def replay_mode():
+    progress = live()
+    progress.replaying = True
+    try:
+        yield
+    finally:
+        progress.replaying = False
+
+def encode_arg(arg : Any) -> Any:
+    if arg is None or type(arg) in [str, int, float, bool]:
+        return arg
+    if type(arg) in [list, tuple]:
+        return list(map(encode_arg, arg))
+    if type(arg) is dict:
+        return {key: encode_arg(arg[key]) for key in arg}
+    return None
+
+def append(entry : Dict[str, Any]):
+    if live().replaying:
+        return
+    os.makedirs(os.path.dirname(journal_file()), exist_ok=True)
+    with open(journal_file(), "a") as journal:
+        journal.write(json.dumps(entry) + "\n")
+
+def new_seed() -> int:
+    """
+    Picks a seed, recording it by seeding random with it.
+    """
+    chosen = secrets.randbits(64)
+    use_seed(chosen)
+    return chosen
+
+def use_seed(value : int):
+    """
+    Seeds random and the entity streams (see ALTANTIS.utils.rng), when
+    running or replaying a turn.
+    """
+    live().seed = value
+    random.seed(value)
+
+@contextmanager
+def seeded(value : int):
+    """
+    Seeds the entity streams for a command, until the end of the block.
+    """
+    token = command_seed.set(value)
+    try:
+        yield
+    finally:
+        command_seed.reset(token)
+
+def current_seed() -> int:
+    seed = command_seed.get()
+    if seed is None:
+        seed = live().seed
+    return 0 if seed is None else seed
+
+def last_entry() -> Optional[Dict[str, Any]]:
+    """
+    Reads just the end of the journal to find the last entry.
+    """
+    if not os.path.exists(journal_file()):
+        return None
+    with open(journal_file(), "rb") as journal:
+        journal.seek(0, os.SEEK_END)
+        end = journal.tell()
+        chunk = 4096
+        while True:
+            start = max(0, end - chunk)
+            journal.seek(start)
+            lines = journal.read(end - start).splitlines()
+            if len(lines) > 1 or start == 0:
+                return json.loads(lines[-1]) if lines else None
+            chunk *= 2
+
+def current_turn() -> int:
+    progress = live()
+    if progress.turn is None:
+        entry = last_entry()
+        progress.turn = entry["turn"] if entry else 0
+    return progress.turn
+
+def set_turn(value : int):
+    live().turn = value
+
+def begin_turn() -> int:
+    """
+    Starts a new turn, seeding random for it.
+    """
+    turn = current_turn() + 1
+    set_turn(turn)
+    append({"type": "turn", "turn": turn, "seed": new_seed()})
+    return turn
+
+@contextmanager
+def record_command(fn : Callable, args : List[Any]):
+    """
+    Journals a call to fn if it changes the game, and gives it a seed of its
+    own. Call fn inside this block.
+    """
+    name = full_name(fn)
+    if live().replaying or name not in JOURNALLED:
+        yield
+        return
+    seed = secrets.randbits(64)
+    append({"type": "command", "turn": current_turn(), "seed": seed, "fn": name, "args": list(map(encode_arg, args))})
+    with seeded(seed):
+        yield
+
+def record_checkpoint(save : str):
+    append({"type": "checkpoint", "turn": current_turn(), "save": save})
+
+def record_load(which : str, save : str):
+    append({"type": "load", "turn": current_turn(), "which": which, "save": save})
+
+def read_journal() -> List[Dict[str, Any]]:
+    if not os.path.exists(journal_file()):
+        return []
+    with open(journal_file(), "r") as journal:
+        return [json.loads(line) for line in journal if line.strip()]
+
+def plan_replay(target : Optional[int], save_exists : Callable[[str], bool]) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """
+    Finds the latest checkpoint at or before turn target (or the latest of
+    all if target is None), and the entries to replay after it to reach the
+    end of that turn. Returns None if there is no usable checkpoint.
+    """
+    entries = read_journal()
+    start = None
+    for i in range(len(entries)):
+        entry = entries[i]
+        # After a recovery the turns count again from an earlier turn, so we
+        # want the last suitable checkpoint in the file rather than the first.
+        if target is not None and entry["turn"] > target:
+            continue
+        if entry["type"] == "checkpoint" and save_exists(entry["save"]):
+            start = i
+        # Saves get thinned out over time, and we can't replay past loading
+        # one that has gone, so we must start after it.
+        elif entry["type"] == "load" and not save_exists(entry["save"]):
+            start = None
+    if start is None:
+        return None
+    to_replay = []
+    for entry in entries[start + 1:]:
+        if target is not None and entry["turn"] > target:
+            break
+        to_replay.append(entry)
+    return entries[start], to_replay
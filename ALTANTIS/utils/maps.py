@@ -0,0 +1,79 @@
+"""
+Uploads drawn maps to the map server.
+We keep one pooled client for the lifetime of the bot, and remember the URL of
+every map we have uploaded so that an unchanged map is never sent twice.
+"""
+
+import hashlib, json, httpx
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any
+
+from ALTANTIS.utils.consts import MAP_DOMAIN, MAP_TOKEN
+
+# How many uploaded maps we remember. Each perspective only needs one entry
+# per turn, so this comfortably covers every team plus control.
+MAX_REMEMBERED_MAPS = 256
+
+client : Optional[httpx.AsyncClient] = None
+# Maps content hashes to the URL the map server gave us for that content.
+uploaded : "OrderedDict[str, str]" = OrderedDict()
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Gets the shared client, creating it if this is the first upload (or if
+    it was closed when the bot last shut down).
+    """
+    global client
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+            timeout=httpx.Timeout(10.0)
+        )
+    return client
+
+async def close_client():
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+def map_key(domain : str, map_string : str, names : str) -> str:
+    """
+    The content address of a map: a hash of the map itself and its names,
+    along with the server it was uploaded to (as its URLs are only good there).
+    """
+    digest = hashlib.sha256()
+    digest.update(domain.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(map_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(names.encode("utf-8"))
+    return digest.hexdigest()
+
+async def upload_map(map_string : str, map_arr : List[Dict[str, Any]], domain : Optional[str] = None) -> Optional[str]:
+    """
+    Uploads a map (as produced by draw_map) and returns the URL it can be
+    viewed at, or None if the upload failed.
+    If this exact map has been uploaded before, we return the old URL without
+    touching the network.
+    """
+    if domain is None:
+        domain = MAP_DOMAIN
+    names = json.dumps(map_arr)
+    key = map_key(domain, map_string, names)
+    if key in uploaded:
+        uploaded.move_to_end(key)
+        return uploaded[key]
+
+    try:
+        res = await get_client().post(domain+"/api/map/", data={"map": map_string, "key": MAP_TOKEN, "names": names})
+    except httpx.HTTPError:
+        return None
+    if res.status_code != 200:
+        return None
+
+    url = domain+res.json()['url']
+    uploaded[key] = url
+    if len(uploaded) > MAX_REMEMBERED_MAPS:
+        uploaded.popitem(last=False)
+    return url
@@ -0,0 +1,133 @@
+"""
+Draws maps to PNG files locally, as an alternative to the map server.
+This needs Pillow, which is optional: if it isn't installed, render_map
+returns None and the caller should fall back to uploading the map.
+Drawing happens in an executor, so a big map doesn't hold up the bot, and only
+the MAX_RENDERS most recently used renders are kept.
+"""
+
+import asyncio, os, json, tempfile, threading, time
+from typing import Optional, List, Dict, Any, Tuple
+
+from ALTANTIS.utils.maps import map_key
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+TILE_SIZE = 16
+MAP_DIRECTORY = os.path.join(tempfile.gettempdir(), "altantis-maps")
+# How many renders we keep on disk. As with uploads (see maps.py), this covers
+# every team plus control for a few turns.
+MAX_RENDERS = 64
+# How long (in seconds) a render is safe from pruning after it was last handed
+# out, so whoever asked for it has time to send it.
+RENDER_GRACE = 120
+
+# Background colours for each map character, as produced by Cell.to_char.
+# Submarines (digits and symbols) and anything unknown use the fallback.
+TILE_COLOURS : Dict[str, Tuple[int, int, int]] = {
+    ".": (24, 74, 128),
+    "C": (70, 140, 200),
+    "R": (18, 52, 96),
+    "S": (40, 40, 70),
+    "W": (90, 90, 90),
+    "b": (110, 100, 90), "h": (100, 110, 90), "z": (90, 100, 110),
+    "v": (110, 90, 100), "p": (100, 90, 110), "l": (120, 120, 120),
+    "D": (40, 150, 60),
+    "T": (210, 180, 40),
+    "A": (140, 100, 60),
+    "J": (120, 110, 100),
+    "M": (150, 150, 170),
+    "E": (40, 170, 130),
+    "N": (190, 60, 60)
+}
+SUB_COLOUR = (240, 220, 60)
+
+# Tiles are drawn once per character and then pasted wherever they're needed,
+# so every perspective shares the same handful of tile images. Renders are
+# drawn in several threads at once, so the cache is guarded by tile_lock.
+tile_cache : Dict[str, Any] = {}
+tile_lock = threading.Lock()
+
+def available() -> bool:
+    return Image is not None
+
+def get_tile(char : str):
+    with tile_lock:
+        if char not in tile_cache:
+            tile_cache[char] = draw_tile(char)
+        return tile_cache[char]
+
+def draw_tile(char : str):
+    colour = TILE_COLOURS.get(char, SUB_COLOUR)
+    tile = Image.new("RGB", (TILE_SIZE, TILE_SIZE), colour)
+    draw = ImageDraw.Draw(tile)
+    draw.rectangle([0, 0, TILE_SIZE - 1, TILE_SIZE - 1], outline=(0, 0, 0))
+    if char not in ".CRS":
+        # Walls, features and subs get their letter drawn on top.
+        draw.text((TILE_SIZE // 4, TILE_SIZE // 8), char, fill=(0, 0, 0), font=ImageFont.load_default())
+    return tile
+
+async def render_map(map_string : str, map_arr : List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Renders a map (as produced by draw_map) to a PNG, returning its filename.
+    Renders are named by their content, so an unchanged map is not redrawn.
+    """
+    if not available():
+        return None
+    # Renders live in MAP_DIRECTORY rather than on a map server.
+    filename = os.path.join(MAP_DIRECTORY, f"{map_key(MAP_DIRECTORY, map_string, json.dumps(map_arr))}.png")
+    if os.path.exists(filename):
+        # Marks it as recently used, so it isn't pruned.
+        os.utime(filename)
+        return filename
+    await asyncio.get_event_loop().run_in_executor(None, draw_png, map_string, map_arr, filename)
+    prune_renders()
+    return filename
+
+def draw_png(map_string : str, map_arr : List[Dict[str, Any]], filename : str):
+    rows = map_string.splitlines()
+    width = max(map(len, rows), default=0)
+    image = Image.new("RGB", (max(width, 1) * TILE_SIZE, max(len(rows), 1) * TILE_SIZE))
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            image.paste(get_tile(char), (x * TILE_SIZE, y * TILE_SIZE))
+
+    # Then label every named square, with a shadow so it reads on any tile.
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    for entry in map_arr:
+        position = (entry["x"] * TILE_SIZE + TILE_SIZE, entry["y"] * TILE_SIZE + 2)
+        draw.text((position[0] + 1, position[1] + 1), entry["name"], fill=(0, 0, 0), font=font)
+        draw.text(position, entry["name"], fill=(255, 255, 255), font=font)
+
+    os.makedirs(MAP_DIRECTORY, exist_ok=True)
+    # Saved under another name first, so nobody sees half a render.
+    partial = f"{filename}.{os.getpid()}.{id(image)}.part"
+    image.save(partial, "PNG")
+    os.replace(partial, filename)
+
+def prune_renders():
+    """
+    Deletes all but the MAX_RENDERS most recently used renders, sparing any
+    handed out in the last RENDER_GRACE seconds (which may not be sent yet).
+    """
+    cutoff = time.time() - RENDER_GRACE
+    renders = []
+    for name in os.listdir(MAP_DIRECTORY):
+        if name.endswith(".png"):
+            path = os.path.join(MAP_DIRECTORY, name)
+            try:
+                renders.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+    renders.sort(reverse=True)
+    for (used, path) in renders[MAX_RENDERS:]:
+        if used > cutoff:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,199 @@
+"""
+Keeps the saves directories from growing forever.
+The newest KEEP_ALL_SAVES saves are left as loose files. Older saves are
+thinned to the first of each minute and packed into one archive per hour.
+Once an hour is more than KEEP_MINUTELY_HOURS old, its archive is compacted
+down to the first save in it, leaving one save per hour.
+Archives are append-only: each record holds one part of one save, behind a
+small header, so an archive's index is read by hopping from header to header.
+"""
+
+import datetime, json, os, struct
+from typing import Dict, List, Optional, Tuple
+
+from ALTANTIS.utils.consts import KEEP_ALL_SAVES, KEEP_MINUTELY_HOURS
+from ALTANTIS.world.binmap import EXTENSION as MAP_EXTENSION
+from ALTANTIS.utils.games import current_game
+
+def save_prefix() -> str:
+    return f"{os.curdir}/{current_game().save_directory()}"
+ARCHIVE_EXTENSION = ".altar"
+
+# The directory of each part of a save, and the extensions it may have.
+PARTS : Dict[str, Tuple[str, List[str]]] = {
+    "state": ("state", [".json.gz"]),
+    "map": ("map", [MAP_EXTENSION, ".json.gz"]),
+    "npcs": ("npc", [".json.gz"])
+}
+
+# magic, header length, data length
+RECORD = struct.Struct("<4sHI")
+MAGIC = b"ASAV"
+
+# Maps each save name to where each of its parts is: (extension, offset, length).
+Index = Dict[str, Dict[str, Tuple[str, int, int]]]
+
+# The index of each archive, and how far into the archive it goes.
+indexes : Dict[str, Tuple[int, Index]] = {}
+
+def archive_dir() -> str:
+    return f"{save_prefix()}/archive"
+
+def archive_for(name : str) -> str:
+    # Names start with "%Y-%m-%d %H", so this is the save's hour.
+    return f"{archive_dir()}/{name[:13]}{ARCHIVE_EXTENSION}"
+
+def loose_file(name : str, part : str) -> Optional[Tuple[str, str]]:
+    """
+    Finds a part of a save that hasn't been archived, as (filename, extension).
+    """
+    (directory, extensions) = PARTS[part]
+    for extension in extensions:
+        filename = f"{save_prefix()}/{directory}/{name}{extension}"
+        if os.path.exists(filename):
+            return filename, extension
+    return None
+
+def read_index(archive : str) -> Index:
+    """
+    Reads an archive's index, carrying on from wherever we read up to last
+    time. A record cut short (say, by a crash) ends the index early.
+    """
+    (end, index) = indexes.get(archive, (0, {}))
+    if not os.path.exists(archive):
+        return {}
+    size = os.path.getsize(archive)
+    if size < end:
+        (end, index) = (0, {})
+    with open(archive, "rb") as file:
+        file.seek(end)
+        while end + RECORD.size <= size:
+            (magic, header_length, data_length) = RECORD.unpack(file.read(RECORD.size))
+            if magic != MAGIC or end + RECORD.size + header_length + data_length > size:
+                break
+            header = json.loads(file.read(header_length))
+            offset = end + RECORD.size + header_length
+            index.setdefault(header["name"], {})[header["part"]] = (header["extension"], offset, data_length)
+            file.seek(data_length, os.SEEK_CUR)
+            end = offset + data_length
+    indexes[archive] = (end, index)
+    return index
+
+def append_save(archive : str, name : str, parts : Dict[str, Tuple[str, bytes]]):
+    read_index(archive)
+    (end, _) = indexes.get(archive, (0, {}))
+    os.makedirs(archive_dir(), exist_ok=True)
+    with open(archive, "ab") as file:
+        # Drop anything after the last whole record before adding to it.
+        file.truncate(end)
+        for part in parts:
+            (extension, data) = parts[part]
+            header = json.dumps({"name": name, "part": part, "extension": extension}).encode("utf-8")
+            file.write(RECORD.pack(MAGIC, len(header), len(data)) + header + data)
+    read_index(archive)
+
+def read_archived(archive : str, name : str, part : str) -> Optional[Tuple[str, bytes]]:
+    index = read_index(archive)
+    if name not in index or part not in index[name]:
+        return None
+    (extension, offset, length) = index[name][part]
+    with open(archive, "rb") as file:
+        file.seek(offset)
+        return extension, file.read(length)
+
+def read_part(name : str, part : str) -> Tuple[str, bytes]:
+    """
+    Reads one part ("state", "map" or "npcs") of a save, wherever it is.
+    Returns the part's extension (which says how to decode it) and contents.
+    """
+    loose = loose_file(name, part)
+    if loose is not None:
+        (filename, extension) = loose
+        with open(filename, "rb") as file:
+            return extension, file.read()
+    archived = read_archived(archive_for(name), name, part)
+    if archived is None:
+        raise FileNotFoundError(f"No {part} in save {name}.")
+    return archived
+
+def loose_saves() -> List[str]:
+    directory = f"{save_prefix()}/{PARTS['state'][0]}"
+    if not os.path.isdir(directory):
+        return []
+    return [filename.split(".")[0] for filename in os.listdir(directory)]
+
+def archives() -> List[str]:
+    if not os.path.isdir(archive_dir()):
+        return []
+    return [f"{archive_dir()}/{filename}" for filename in os.listdir(archive_dir()) if filename.endswith(ARCHIVE_EXTENSION)]
+
+def list_saves() -> List[str]:
+    """
+    Every save we still have, loose or archived, newest first.
+    """
+    names = set(loose_saves())
+    for archive in archives():
+        names.update(read_index(archive))
+    return sorted(names, reverse=True)
+
+def save_exists(name : str) -> bool:
+    if loose_file(name, "state") is not None and loose_file(name, "npcs") is not None:
+        return True
+    index = read_index(archive_for(name))
+    return name in index and "state" in index[name] and "npcs" in index[name]
+
+def delete_loose(name : str):
+    for part in PARTS:
+        loose = loose_file(name, part)
+        while loose is not None:
+            os.remove(loose[0])
+            loose = loose_file(name, part)
+
+def archive_loose(name : str):
+    """
+    Moves a loose save into its archive, unless the archive already has a
+    save from the same minute, in which case it is simply deleted.
+    """
+    archive = archive_for(name)
+    minute = name[:16]
+    if not any(saved[:16] == minute for saved in read_index(archive)):
+        parts = {}
+        for part in PARTS:
+            loose = loose_file(name, part)
+            if loose is not None:
+                with open(loose[0], "rb") as file:
+                    parts[part] = (loose[1], file.read())
+        append_save(archive, name, parts)
+    delete_loose(name)
+
+def compact(archive : str):
+    """
+    Rewrites an archive with only its first save, replacing it atomically.
+    """
+    index = read_index(archive)
+    first = min(index)
+    parts = {}
+    for part in index[first]:
+        parts[part] = read_archived(archive, first, part)
+    temporary = archive + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    append_save(temporary, first, parts)
+    os.replace(temporary, archive)
+    indexes.pop(temporary, None)
+    indexes.pop(archive, None)
+
+def prune_saves(now : Optional[datetime.datetime] = None):
+    """
+    Applies the retention policy. Called after every save.
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    # Oldest first, so that we keep the first save of each minute.
+    for name in sorted(loose_saves(), reverse=True)[KEEP_ALL_SAVES:][::-1]:
+        archive_loose(name)
+    cutoff = (now - datetime.timedelta(hours=KEEP_MINUTELY_HOURS)).strftime("%Y-%m-%d %H")
+    for archive in archives():
+        hour = os.path.basename(archive)[:-len(ARCHIVE_EXTENSION)]
+        if hour < cutoff and len(read_index(archive)) > 1:
+            compact(archive)
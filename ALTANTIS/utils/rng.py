@@ -0,0 +1,90 @@
+"""
+Random numbers for the game, as one stream per entity and phase rather than
+the random module shared by everything.
+Each stream is derived (with BLAKE2b) from the seed the journal recorded for
+the current turn or command, the turn number, the phase and the owner (see
+Entity.owner), so what an entity rolls doesn't depend on who rolled before it.
+Subs, NPCs and squares can then be handled in any order (or all at once)
+and get the same results, and a faster engine can be checked against this one
+bit for bit.
+Streams are kept (by seed, as commands have seeds of their own) until the
+turn changes, so asking for the same stream twice in a turn or command
+carries on where it left off.
+"""
+
+import random
+from hashlib import blake2b
+from typing import Dict, Any, Tuple
+
+from ALTANTIS.utils import journal
+from ALTANTIS.utils.games import game_part
+
+class Stream(random.Random):
+    """
+    A random.Random (so choice, shuffle, gauss and friends all work) whose
+    bits come from hashing its key with a counter.
+    """
+    def __init__(self, key : bytes):
+        self.key = key
+        self.counter = 0
+        self.buffer = b""
+        super().__init__()
+
+    def seed(self, *args, **kwargs):
+        # Our key is our seed.
+        pass
+
+    def _bytes(self, count : int) -> bytes:
+        while len(self.buffer) < count:
+            self.buffer += blake2b(self.counter.to_bytes(8, "little"), key=self.key).digest()
+            self.counter += 1
+        (taken, self.buffer) = (self.buffer[:count], self.buffer[count:])
+        return taken
+
+    def getrandbits(self, k : int) -> int:
+        if k <= 0:
+            return 0
+        return int.from_bytes(self._bytes((k + 7) // 8), "little") >> (-k % 8)
+
+    def random(self) -> float:
+        return self.getrandbits(53) * 2 ** -53
+
+    def getstate(self):
+        return (self.key, self.counter, self.buffer)
+
+    def setstate(self, state):
+        (self.key, self.counter, self.buffer) = state
+
+class Streams():
+    def __init__(self):
+        # By seed, then by name.
+        self.streams : Dict[int, Dict[Tuple[Any, ...], Stream]] = {}
+        # The turn the streams were made for.
+        self.made_for : Any = None
+
+live = game_part("streams", Streams)
+
+def forget_streams():
+    """
+    Starts every stream afresh, as replaying a turn or command must.
+    """
+    made = live()
+    made.streams.clear()
+    made.made_for = None
+
+def stream(owner : Tuple[str, Any], phase : str, *detail : Any) -> Stream:
+    """
+    The stream for owner in this phase of the turn (or command). detail
+    splits it further, say by who a message is for.
+    """
+    made = live()
+    now = (journal.current_seed(), journal.current_turn())
+    if now[1] != made.made_for:
+        made.streams.clear()
+        made.made_for = now[1]
+    streams = made.streams.setdefault(now[0], {})
+    name = (owner, phase) + detail
+    if name not in streams:
+        key = blake2b(repr(now + name).encode(), digest_size=32).digest()
+        streams[name] = Stream(key)
+    return streams[name]
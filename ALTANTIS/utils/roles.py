@@ -1,8 +1,38 @@
 import discord
+from typing import List
 
 async def create_or_return_role(guild : discord.Guild, role : str, **kwargs) -> discord.Role:
     all_roles = await guild.fetch_roles()
     for r in all_roles:
         if r.name == role:
             return r
-    return await guild.create_role(name=role, **kwargs)
\ No newline at end of file
+    return await guild.create_role(name=role, **kwargs)
+
+def crew_of(guild : discord.Guild, team : str) -> List[discord.Member]:
+    """
+    Everyone with the team's role.
+    """
+    return [member for member in guild.members if team in [role.name for role in member.roles]]
+
+async def dock_crew(guild, team : str, location : str):
+    """
+    Gives the team's crew the docked-at-{location} role.
+    In the engine, guild is a RemoteGuild (see utils/engine.py), which asks
+    the bot to do this instead.
+    """
+    if not isinstance(guild, discord.Guild):
+        await guild.dock_crew(team, location)
+        return
+    role = await create_or_return_role(guild, f"docked-at-{location.lower()}")
+    for member in crew_of(guild, team):
+        await member.add_roles(role)
+
+async def undock_crew(guild, team : str):
+    """
+    Takes every docked-at-{x} role from the team's crew.
+    """
+    if not isinstance(guild, discord.Guild):
+        await guild.undock_crew(team)
+        return
+    for member in crew_of(guild, team):
+        await member.remove_roles(*[role for role in member.roles if role.name.startswith("docked-at-")])
@@ -0,0 +1,67 @@
+"""
+Keeps the last few saves in memory, so that undoing a recent mistake with
+!load doesn't have to read, decompress and parse the save files.
+Each sub, NPC and square is held as its own JSON string, and every string is
+interned, so anything that didn't change between saves (and every identical
+square, like empty sea) is only held once however many saves we keep.
+"""
+
+import json, sys
+from collections import deque
+from typing import Deque, Dict, List, Any, Optional
+
+from ALTANTIS.utils.consts import ROLLBACK_SAVES
+from ALTANTIS.utils.games import game_part
+
+class Snapshot():
+    def __init__(self, name : str, subs : Dict[str, str], npcs : List[str], next_id : int, cells : List[List[str]]):
+        self.name = name
+        self.subs = subs
+        self.npcs = npcs
+        self.next_id = next_id
+        self.cells = cells
+
+live_ring = game_part("rollback", lambda: deque(maxlen=ROLLBACK_SAVES))
+
+def encode(value : Any) -> str:
+    return sys.intern(json.dumps(value))
+
+def remember(name : str, state_dict : Dict[str, Dict[str, Any]], npcs_dict : Dict[str, Any]):
+    """
+    Keeps the save just made, given the dicts that were written to disk.
+    The map is read straight from its squares.
+    """
+    from ALTANTIS.world import world
+    subs = {subname: encode(state_dict[subname]) for subname in state_dict}
+    npcs = list(map(encode, npcs_dict["npcs"]))
+    cells = [[encode(cell._to_dict()) for cell in column] for column in world.live_map().cells]
+    ring : Deque[Snapshot] = live_ring()
+    ring.append(Snapshot(name, subs, npcs, npcs_dict["next_id"], cells))
+
+def recall(name : str) -> Optional[Snapshot]:
+    for snapshot in live_ring():
+        if snapshot.name == name:
+            return snapshot
+    return None
+
+def restore(snapshot : Snapshot, which : str, client):
+    """
+    Loads part or all of a snapshot, like load_save in game.py.
+    """
+    from ALTANTIS.subs.state import state_from_dict
+    from ALTANTIS.npcs.npc import npcs_from_json
+    from ALTANTIS.world.world import map_from_dict
+    if which in ["all", "map"]:
+        # Most squares are the same few strings, so we only parse each once.
+        # This is safe as Cell._from_dict copies what it's given.
+        parsed : Dict[str, Any] = {}
+        def parse(cell : str) -> Any:
+            if cell not in parsed:
+                parsed[cell] = json.loads(cell)
+            return parsed[cell]
+        map_dicts = [[parse(cell) for cell in column] for column in snapshot.cells]
+        map_from_dict({"map": map_dicts, "x_limit": len(map_dicts), "y_limit": len(map_dicts[0]) if map_dicts else 0})
+    if which in ["all", "state"]:
+        state_from_dict({subname: json.loads(snapshot.subs[subname]) for subname in snapshot.subs}, client)
+    if which in ["all", "npcs"]:
+        npcs_from_json({"next_id": snapshot.next_id, "npcs": list(map(json.loads, snapshot.npcs))})
@@ -0,0 +1,151 @@
+"""
+Runs the game's turns on a fixed schedule, like discord.ext.tasks.loop (and
+with the same start/stop/is_running/next_iteration/change_interval), but
+keeping an eye on how long each turn takes.
+A turn that takes longer than the interval is an overrun, which control is
+told about, and what we do next depends on TURN_OVERRUN_POLICY:
+* "skip" drops the turns we've missed, keeping to the original schedule.
+* "compress" runs the missed turns straight away (at most MAX_CATCH_UP of
+  them), so the game catches up to where it should be.
+* "stretch" starts a full interval after the slow turn ended, so the late
+  turn pushes every later one back.
+The interval can be changed at any time (see !set_speed) without restarting.
+"""
+
+import asyncio, datetime, math, sys, time, traceback
+from typing import Callable, Awaitable, Optional
+
+from ALTANTIS.utils.consts import TURN_OVERRUN_POLICY, MAX_CATCH_UP
+from ALTANTIS.utils.control import notify_control
+from ALTANTIS.utils.engine import call
+
+POLICIES = ["skip", "compress", "stretch"]
+
+class TurnScheduler():
+    def __init__(self, coro : Callable[[], Awaitable[None]], seconds : float, policy : str = TURN_OVERRUN_POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overrun policy {policy}, expected one of {POLICIES}.")
+        self.coro = coro
+        self.seconds = seconds
+        self.policy = policy
+        self.current_loop = 0
+        self.overruns = 0
+        self.last_duration = 0.0
+        self.next_iteration : Optional[datetime.datetime] = None
+        self.task : Optional[asyncio.Task] = None
+        self.stopping = False
+        # Set to wake us up early when stopping or changing the interval.
+        self.wakeup = asyncio.Event()
+        self.last_start = 0.0
+        self.next_start = 0.0
+        # Whether a turn is running now, in which case run moves next_start
+        # on once it's done.
+        self.in_turn = False
+
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self) -> asyncio.Task:
+        if self.is_running():
+            raise RuntimeError("Task is already launched and is not completed.")
+        self.stopping = False
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.get_event_loop().create_task(self.run())
+        return self.task
+
+    def stop(self):
+        """
+        Stops after the current turn, or straight away if between turns.
+        """
+        self.stopping = True
+        self.wakeup.set()
+
+    def cancel(self):
+        if self.is_running():
+            self.task.cancel()
+
+    def change_interval(self, *, seconds : float):
+        """
+        Changes the interval from now on. The next turn is moved to one new
+        interval after the last turn started (or now, if that has passed).
+        During a turn, run does this when the turn ends.
+        """
+        self.seconds = seconds
+        if self.is_running() and not self.in_turn:
+            self.next_start = max(self.last_start + seconds, time.monotonic())
+            self.update_next_iteration()
+            self.wakeup.set()
+
+    def update_next_iteration(self):
+        delay = max(0.0, self.next_start - time.monotonic())
+        self.next_iteration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=delay)
+
+    async def wait(self) -> bool:
+        """
+        Waits until the next turn is due. Returns False if we were stopped.
+        """
+        while not self.stopping:
+            delay = self.next_start - time.monotonic()
+            if delay <= 0:
+                return True
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def run(self):
+        self.next_start = time.monotonic()
+        try:
+            while True:
+                self.update_next_iteration()
+                if not await self.wait():
+                    break
+                self.last_start = time.monotonic()
+                self.in_turn = True
+                try:
+                    await self.coro()
+                finally:
+                    self.in_turn = False
+                self.current_loop += 1
+                self.last_duration = time.monotonic() - self.last_start
+                self.next_start += self.seconds
+                if self.last_duration > self.seconds:
+                    await self.overrun()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            print("Unhandled exception in the turn scheduler.", file=sys.stderr)
+            traceback.print_exc()
+            await call(notify_control, "The main loop has stopped after an error! Check the logs, then use !startloop.")
+        finally:
+            self.next_iteration = None
+
+    async def overrun(self):
+        self.overruns += 1
+        now = time.monotonic()
+        missed = math.ceil((now - self.next_start) / self.seconds) if now > self.next_start else 0
+        if self.policy == "skip":
+            self.next_start += missed * self.seconds
+            consequence = f"skipping {missed} turn(s) to stay on schedule" if missed else "the next turn is on time"
+        elif self.policy == "compress":
+            # Don't try to catch up more than MAX_CATCH_UP turns.
+            behind = min(missed, MAX_CATCH_UP)
+            self.next_start += (missed - behind) * self.seconds
+            consequence = f"running {behind} turn(s) straight away to catch up" if behind else "the next turn is on time"
+        else:
+            self.next_start = now + self.seconds
+            consequence = f"the next turn is in {self.seconds}s"
+        await call(notify_control,
+            f"Turn took {self.last_duration:.1f}s, over its {self.seconds}s budget "
+            f"(overrun {self.overruns} so far); {consequence}."
+        )
+
+def turn_loop(seconds : float) -> Callable[[Callable[[], Awaitable[None]]], TurnScheduler]:
+    """
+    Use in place of tasks.loop(seconds=...).
+    """
+    def schedule(coro : Callable[[], Awaitable[None]]) -> TurnScheduler:
+        return TurnScheduler(coro, seconds)
+    return schedule
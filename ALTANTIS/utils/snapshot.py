@@ -0,0 +1,193 @@
+"""
+Publishes a read-only copy of the game at the end of every turn, for the
+commands that only look at it (!status, !scan, !map, !zoom and so on).
+A turn yields to the event loop whenever it sends a message, so without this
+a command run mid-turn could see some subs moved and others not.
+Read commands are wrapped with reads_snapshot, which points the accessors
+(get_sub, get_subs_at, get_square, get_npcs_at, query and friends) at the
+published copy while they run. This uses a ContextVar, so the turn (running in its own
+task) carries on using the live game.
+Commands that change the game always act on the live game, and mark the copy
+as stale so that it is taken again before the next read - unless a turn is
+running, in which case readers keep seeing the end of the last turn.
+Each snapshot shares everything that hasn't changed with the one before. The
+live game hands out subs and NPCs through its accessors, which note each one
+(see handed_out) as whoever asked might change it, and only those are copied
+again. The map notes which squares change in the same way (see WorldMap).
+Creatures are only numbers, so their columns are copied whole.
+"""
+
+import copy, functools, inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Any, Callable, Set, Tuple
+
+Owner = Tuple[str, Any]
+
+from ALTANTIS.utils.games import game_part
+
+class Snapshot():
+    def __init__(self, state : Dict[str, Any], indexes : Any, undersea_map : List[List[Any]], registry : Any, components : Any):
+        self.state = state
+        self.indexes = indexes
+        self.undersea_map = undersea_map
+        self.registry = registry
+        self.components = components
+
+# The snapshot being read by the current task, if any.
+reading : ContextVar[Optional[Snapshot]] = ContextVar("reading", default=None)
+# Everything handed out to the command running in the current task, if any.
+writing : ContextVar[Optional[Set[Owner]]] = ContextVar("writing", default=None)
+
+class Publication():
+    def __init__(self):
+        self.published : Optional[Snapshot] = None
+        self.stale = True
+        self.turn_running = False
+        # The owners (see Entity.owner) of everything handed out since we
+        # last published.
+        self.handed_out : Set[Owner] = set()
+        # Each entity in the published snapshot, and the live one it copies.
+        self.copies : Dict[Owner, Tuple[Any, Any]] = {}
+
+live = game_part("snapshot", Publication)
+
+def handed_out(entity):
+    """
+    Call on every sub or NPC the live game hands out, so that the next
+    snapshot copies it again. Gives back entity.
+    """
+    if reading.get() is None:
+        owner = entity.owner()
+        live().handed_out.add(owner)
+        mine = writing.get()
+        if mine is not None:
+            mine.add(owner)
+    return entity
+
+def take() -> Snapshot:
+    from ALTANTIS.subs import state
+    from ALTANTIS.npcs import npc
+    from ALTANTIS.world import world
+    from ALTANTIS.world.components import ComponentStore
+
+    publication = live()
+    previous = publication.published
+    changed = publication.handed_out
+    publication.handed_out = set()
+    # Anything that hasn't been handed out (and is still the same object) is
+    # already in the memo, so deepcopy gives back its last copy. Subs can
+    # refer to each other (when trading), so everything shares one memo.
+    # Channels are Discord objects, and must not be copied.
+    memo : Dict[int, Any] = {}
+    for (owner, (source, copied)) in publication.copies.items():
+        if owner not in changed:
+            memo[id(source)] = copied
+    copies : Dict[Owner, Tuple[Any, Any]] = {}
+    def copy_of(entity):
+        copied = copy.deepcopy(entity, memo)
+        copies[entity.owner()] = (entity, copied)
+        return copied
+
+    live_subs = state.live().state
+    for sub in live_subs.values():
+        for channel in sub.channels.values():
+            memo[id(channel)] = channel
+    subs = {name: copy_of(live_subs[name]) for name in live_subs}
+    components = ComponentStore()
+    indexes = state.SubIndexes(components)
+    for sub in subs.values():
+        indexes.add(sub)
+
+    # Columns are only copied when one of their squares changed.
+    world_map = world.live_map()
+    squares = world_map.changes("snapshot")
+    if squares is None or previous is None:
+        undersea_map = [[cell.copy() for cell in column] for column in world_map.cells]
+    else:
+        undersea_map = list(previous.undersea_map)
+        copied_columns : Set[int] = set()
+        for (x, y) in squares:
+            if x not in copied_columns:
+                undersea_map[x] = list(undersea_map[x])
+                copied_columns.add(x)
+            undersea_map[x][y] = world_map.cells[x][y].copy()
+
+    registry = npc.NPCRegistry(components)
+    live_registry = npc.live_registry()
+    for npcid in live_registry.ids():
+        if npcid in live_registry.npcs:
+            registry.add(copy_of(live_registry.npcs[npcid]))
+    registry.adopt(live_registry.population.copy())
+    registry.next_id = live_registry.next_id
+    publication.copies = copies
+    return Snapshot(subs, indexes, undersea_map, registry, components)
+
+def publish():
+    publication = live()
+    publication.published = take()
+    publication.stale = False
+
+def mark_stale():
+    live().stale = True
+
+@contextmanager
+def writes():
+    """
+    Wraps a command that changes the game. Everything handed out to it counts
+    as changed until it's done (it might change them after a publish), and
+    the snapshot is stale after it.
+    """
+    mine : Set[Owner] = set()
+    token = writing.set(mine)
+    try:
+        yield
+    finally:
+        writing.reset(token)
+        live().handed_out.update(mine)
+        mark_stale()
+
+def hold():
+    """
+    Called as a turn starts. Anything changed since the last turn is
+    published first, then readers see that until the turn ends.
+    """
+    publication = live()
+    if publication.stale or publication.published is None:
+        publish()
+    publication.turn_running = True
+
+def release():
+    publish()
+    live().turn_running = False
+
+def current() -> Snapshot:
+    publication = live()
+    if publication.published is None or (publication.stale and not publication.turn_running):
+        publish()
+    return publication.published
+
+def reads_snapshot(fn : Callable) -> Callable:
+    """
+    Makes fn (which must not change the game) read the published snapshot.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def read_async(*args):
+            token = reading.set(current())
+            try:
+                return await fn(*args)
+            finally:
+                reading.reset(token)
+        read_async.reads_snapshot = True
+        return read_async
+
+    @functools.wraps(fn)
+    def read(*args):
+        token = reading.set(current())
+        try:
+            return fn(*args)
+        finally:
+            reading.reset(token)
+    read.reads_snapshot = True
+    return read
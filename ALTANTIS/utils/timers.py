@@ -0,0 +1,189 @@
+"""
+One timer wheel for everything in the game that should happen on a later
+turn, once or every so many turns, rather than every sub and NPC counting
+down turns itself.
+The wheel is hierarchical: level 0 has a slot for each of the next SLOTS
+turns, level 1 a slot for each of the next SLOTS blocks of SLOTS turns, and
+so on. Each turn we only look at the slots that have come due (cascading a
+higher slot down a level when we reach it), so a turn costs nothing for
+anyone without a timer due, however many timers there are.
+Timers belong to an owner, like ("sub", name) or ("npc", id), and call a
+handler registered with timer_handler by name, so that they can be saved
+along with their owner (see encode_owner and decode_owner).
+Timers fire in one of the PHASES of a turn (see run_turn in game.py), in order
+of owner and then of scheduling, so replaying a turn fires them identically.
+"""
+
+import inspect
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from ALTANTIS.utils.games import game_part
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+LEVELS = 4
+
+PHASES = ["npcs", "subs"]
+
+Owner = Tuple[str, Any]
+
+class Timer():
+    def __init__(self, owner : Owner, handler : str, due : int, period : Optional[int], args : List[Any], label : str, phase : str, order : int):
+        self.owner = owner
+        self.handler = handler
+        self.due = due
+        self.period = period
+        self.args = args
+        self.label = label
+        self.phase = phase
+        self.order = order
+        self.cancelled = False
+
+# Every handler by name. Each is called with the timer's owner and its args.
+HANDLERS : Dict[str, Callable] = {}
+
+def timer_handler(fn : Callable) -> Callable:
+    HANDLERS[fn.__name__] = fn
+    return fn
+
+class TimerWheel():
+    def __init__(self):
+        # Turns since the wheel started. Only the differences matter, as saves
+        # store how many turns each timer has left.
+        self.now = 0
+        self.levels : List[List[List[Timer]]] = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self.by_owner : Dict[Owner, List[Timer]] = {}
+        self.due : List[Timer] = []
+        self.next_order = 0
+
+    def _insert(self, timer : Timer):
+        if timer.due <= self.now:
+            self.due.append(timer)
+            return
+        for level in range(LEVELS):
+            shift = level * SLOT_BITS
+            if (timer.due >> shift) - (self.now >> shift) < SLOTS:
+                break
+        # Anything too far away sits at the top, and is put back each time its
+        # slot comes round until it's close enough.
+        self.levels[level][(timer.due >> shift) % SLOTS].append(timer)
+
+    def schedule(self, owner : Owner, handler : str, delay : int, args : List[Any] = [], period : Optional[int] = None, label : str = "", phase : str = "subs") -> Timer:
+        """
+        Calls handler delay turns from now (at least one), and then every
+        period turns if period is given.
+        """
+        if handler not in HANDLERS:
+            raise ValueError(f"Unknown timer handler {handler}.")
+        if phase not in PHASES:
+            raise ValueError(f"Unknown timer phase {phase}, expected one of {PHASES}.")
+        timer = Timer(owner, handler, self.now + max(1, delay), period, list(args), label, phase, self.next_order)
+        self.next_order += 1
+        self.by_owner.setdefault(owner, []).append(timer)
+        self._insert(timer)
+        return timer
+
+    def cancel(self, timer : Timer):
+        # The timer stays in its slot, and is dropped when the slot is reached.
+        timer.cancelled = True
+        timers = self.by_owner.get(timer.owner)
+        if timers is not None and timer in timers:
+            timers.remove(timer)
+            if not timers:
+                del self.by_owner[timer.owner]
+
+    def cancel_owner(self, owner : Owner):
+        for timer in self.by_owner.pop(owner, []):
+            timer.cancelled = True
+
+    def cancel_kind(self, kind : str):
+        """
+        Cancels the timers of every owner of a kind, like "sub" or "npc".
+        """
+        for owner in [owner for owner in self.by_owner if owner[0] == kind]:
+            self.cancel_owner(owner)
+
+    def timers_of(self, owner : Owner) -> List[Timer]:
+        return list(self.by_owner.get(owner, []))
+
+    def advance(self):
+        """
+        Moves on a turn, collecting the timers now due.
+        """
+        self.now += 1
+        # Highest level first, so that cascaded timers can cascade again.
+        for level in range(LEVELS - 1, 0, -1):
+            shift = level * SLOT_BITS
+            if self.now % (1 << shift) == 0:
+                index = (self.now >> shift) % SLOTS
+                cascading, self.levels[level][index] = self.levels[level][index], []
+                for timer in cascading:
+                    if not timer.cancelled:
+                        self._insert(timer)
+        index = self.now % SLOTS
+        for timer in self.levels[0][index]:
+            if not timer.cancelled:
+                self.due.append(timer)
+        self.levels[0][index] = []
+
+    async def fire(self, phase : str):
+        """
+        Fires the due timers of a phase.
+        """
+        firing = [timer for timer in self.due if timer.phase == phase]
+        self.due = [timer for timer in self.due if timer.phase != phase]
+        firing.sort(key=lambda timer: (timer.owner, timer.order))
+        for timer in firing:
+            # An earlier handler may have cancelled it.
+            if timer.cancelled:
+                continue
+            if timer.period is None:
+                self.cancel(timer)
+            else:
+                timer.due = self.now + timer.period
+                self._insert(timer)
+            result = HANDLERS[timer.handler](timer.owner, *timer.args)
+            if inspect.isawaitable(result):
+                await result
+
+    def encode_owner(self, owner : Owner) -> List[Dict[str, Any]]:
+        return [{"handler": timer.handler, "in": timer.due - self.now, "period": timer.period,
+                 "args": timer.args, "label": timer.label, "phase": timer.phase}
+                for timer in self.by_owner.get(owner, [])]
+
+    def decode_owner(self, owner : Owner, data : List[Dict[str, Any]]):
+        """
+        Replaces the timers of owner with those from encode_owner.
+        """
+        self.cancel_owner(owner)
+        for timer in data:
+            self.schedule(owner, timer["handler"], timer["in"], timer["args"], timer["period"], timer["label"], timer["phase"])
+
+live_wheel = game_part("timers", TimerWheel)
+
+def schedule(owner : Owner, handler : str, delay : int, args : List[Any] = [], period : Optional[int] = None, label : str = "", phase : str = "subs") -> Timer:
+    return live_wheel().schedule(owner, handler, delay, args, period, label, phase)
+
+def cancel_owner(owner : Owner):
+    live_wheel().cancel_owner(owner)
+
+def cancel_kind(kind : str):
+    live_wheel().cancel_kind(kind)
+
+def timers_of(owner : Owner) -> List[Timer]:
+    return live_wheel().timers_of(owner)
+
+def turns_left(timer : Timer) -> int:
+    return timer.due - live_wheel().now
+
+def advance():
+    live_wheel().advance()
+
+async def fire(phase : str):
+    await live_wheel().fire(phase)
+
+def encode_owner(owner : Owner) -> List[Dict[str, Any]]:
+    return live_wheel().encode_owner(owner)
+
+def decode_owner(owner : Owner, data : List[Dict[str, Any]]):
+    live_wheel().decode_owner(owner, data)
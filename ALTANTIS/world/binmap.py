@@ -0,0 +1,385 @@
+"""
+A compact binary format for saving the world map.
+Rather than a dict per square, the map is stored in columns. Weather,
+hiddenness and flag attributes are run-length encoded planes, names, docking
+stations and treasure are sparse tables of just the squares that have them,
+and each sub's explored squares are a bitset. Anything else (including any
+value the planes can't hold) goes in a sparse table of JSON values, so
+converting to and from the dict form loses nothing.
+
+Each section is compressed separately, and files are read with mmap, so only
+the sections actually asked for are read and decompressed.
+
+Run `python -m ALTANTIS.world.binmap convert <files>` to convert .json.gz map
+saves, or `python -m ALTANTIS.world.binmap bench <file>` to compare formats.
+"""
+
+import json, mmap, struct, sys, zlib
+from array import array
+from typing import Dict, List, Any, Tuple, Iterable, Optional, Union
+
+MAGIC = b"ALTM"
+VERSION = 1
+EXTENSION = ".altm"
+# magic, version, number of sections, x limit, y limit
+HEADER = struct.Struct("<4sHHII")
+# tag, offset, length
+ENTRY = struct.Struct("<4sQQ")
+COUNT = struct.Struct("<I")
+
+# Attributes that are usually present with no value, stored as one bit each.
+FLAGS = ["deposit", "diverse", "obstacle", "ruins", "junk"]
+# Attributes stored as a string per square in their own sparse table.
+SPARSE = {"name": b"NAME", "docking": b"DOCK"}
+
+def to_array(typecode : str, data : bytes = b"") -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def from_array(values : array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+class StringTable():
+    def __init__(self):
+        self.ids : Dict[str, int] = {}
+        self.strings : List[str] = []
+
+    def intern(self, string : str) -> int:
+        if string not in self.ids:
+            self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return self.ids[string]
+
+    def encode(self) -> bytes:
+        encoded = [string.encode("utf-8") for string in self.strings]
+        lengths = array("I", map(len, encoded))
+        return COUNT.pack(len(encoded)) + from_array(lengths) + b"".join(encoded)
+
+def decode_strings(data : bytes) -> List[str]:
+    (count,) = COUNT.unpack_from(data)
+    lengths = to_array("I", data[4:4 + 4*count])
+    strings = []
+    position = 4 + 4*count
+    for length in lengths:
+        strings.append(data[position:position + length].decode("utf-8"))
+        position += length
+    return strings
+
+def rle_encode(values : Iterable[int]) -> bytes:
+    lengths, runs = array("I"), array("H")
+    for value in values:
+        if runs and runs[-1] == value:
+            lengths[-1] += 1
+        else:
+            runs.append(value)
+            lengths.append(1)
+    return COUNT.pack(len(runs)) + from_array(lengths) + from_array(runs)
+
+def rle_runs(data : bytes) -> Tuple[array, array]:
+    (count,) = COUNT.unpack_from(data)
+    return to_array("I", data[4:4 + 4*count]), to_array("H", data[4 + 4*count:4 + 6*count])
+
+def rle_decode(data : bytes) -> List[int]:
+    (lengths, runs) = rle_runs(data)
+    values : List[int] = []
+    for (length, value) in zip(lengths, runs):
+        values.extend([value] * length)
+    return values
+
+def rle_at(data : bytes, index : int) -> int:
+    (lengths, runs) = rle_runs(data)
+    for (length, value) in zip(lengths, runs):
+        if index < length:
+            return value
+        index -= length
+    return 0
+
+def encode_table(columns : List[List[int]]) -> bytes:
+    """
+    A sparse table is a row count followed by each column of u32s in turn.
+    The first column is always the square index, in increasing order.
+    """
+    data = COUNT.pack(len(columns[0]))
+    for column in columns:
+        data += from_array(array("I", column))
+    return data
+
+def decode_table(data : bytes, width : int) -> List[array]:
+    (count,) = COUNT.unpack_from(data)
+    return [to_array("I", data[4 + 4*count*i:4 + 4*count*(i + 1)]) for i in range(width)]
+
+def encode_map(cells : Iterable[Tuple[List[str], Dict[str, Any], Iterable[str]]], x_limit : int, y_limit : int) -> bytes:
+    """
+    Encodes squares given as (treasure, attributes, explored) triples, in
+    order of x then y (so square (x, y) is number x*y_limit + y).
+    """
+    strings = StringTable()
+    weather, hiddenness, flags = [], [], []
+    sparse : Dict[str, Tuple[List[int], List[int]]] = {attr: ([], []) for attr in SPARSE}
+    other : Tuple[List[int], List[int], List[int]] = ([], [], [])
+    treasure : Tuple[List[int], List[int], List[int]] = ([], [], [])
+    explored : Dict[str, bytearray] = {}
+    size = x_limit * y_limit
+
+    for (index, (items, attributes, explorers)) in enumerate(cells):
+        (weather_value, hidden_value, flag_value) = (0, 0, 0)
+        for (attr, value) in attributes.items():
+            if attr == "weather" and type(value) is str and strings.intern(value) < 0xFFFF:
+                weather_value = strings.intern(value) + 1
+            elif attr == "hiddenness" and type(value) is int and 0 <= value < 0xFFFF:
+                hidden_value = value + 1
+            elif attr in FLAGS and value == "":
+                flag_value |= 1 << FLAGS.index(attr)
+            elif attr in SPARSE and type(value) is str:
+                sparse[attr][0].append(index)
+                sparse[attr][1].append(strings.intern(value))
+            else:
+                other[0].append(index)
+                other[1].append(strings.intern(attr))
+                other[2].append(strings.intern(json.dumps(value)))
+        weather.append(weather_value)
+        hiddenness.append(hidden_value)
+        flags.append(flag_value)
+        if items:
+            treasure[0].append(index)
+            treasure[1].append(len(treasure[2]))
+            treasure[2].extend(map(strings.intern, items))
+        for sub in explorers:
+            if sub not in explored:
+                explored[sub] = bytearray((size + 7) // 8)
+            explored[sub][index // 8] |= 1 << (index % 8)
+
+    explorers = list(explored)
+    sections = [
+        (b"WTHR", rle_encode(weather)),
+        (b"HIDE", rle_encode(hiddenness)),
+        (b"FLAG", rle_encode(flags)),
+        (b"ATTR", encode_table(list(other))),
+        # Treasure offsets get a final entry so every row knows where it ends.
+        (b"TRSR", encode_table([treasure[0], treasure[1]]) + encode_table([treasure[2] + [len(treasure[2])]])),
+        (b"EXPL", encode_table([list(map(strings.intern, explorers))]) + b"".join(explored[sub] for sub in explorers))
+    ]
+    for attr in SPARSE:
+        sections.append((SPARSE[attr], encode_table(list(sparse[attr]))))
+    # Strings go last, as every other section adds to them.
+    sections.append((b"STRS", strings.encode()))
+
+    offset = HEADER.size + ENTRY.size * len(sections)
+    header = HEADER.pack(MAGIC, VERSION, len(sections), x_limit, y_limit)
+    directory = b""
+    compressed = [(tag, zlib.compress(data)) for (tag, data) in sections]
+    for (tag, data) in compressed:
+        directory += ENTRY.pack(tag, offset, len(data))
+        offset += len(data)
+    return header + directory + b"".join(data for (_, data) in compressed)
+
+class MapFile():
+    """
+    A binary map opened for reading. Use as a context manager.
+    Takes either a file name, or the file's contents (for archived saves).
+    """
+    def __init__(self, source : Union[str, bytes]):
+        self.file = None
+        if isinstance(source, str):
+            self.file = open(source, "rb")
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = source
+        (magic, version, count, self.x_limit, self.y_limit) = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{'Data' if self.file is None else source} is not a version {VERSION} map file.")
+        self.sections : Dict[bytes, Tuple[int, int]] = {}
+        for i in range(count):
+            (tag, offset, length) = ENTRY.unpack_from(self.data, HEADER.size + ENTRY.size * i)
+            self.sections[tag] = (offset, length)
+        self._strings : Optional[List[str]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.data.close()
+            self.file.close()
+
+    def section(self, tag : bytes) -> bytes:
+        (offset, length) = self.sections[tag]
+        return zlib.decompress(self.data[offset:offset + length])
+
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            self._strings = decode_strings(self.section(b"STRS"))
+        return self._strings
+
+    def treasure(self) -> Dict[int, List[str]]:
+        strings = self.strings()
+        data = self.section(b"TRSR")
+        (cells, starts) = decode_table(data, 2)
+        (items,) = decode_table(data[4 + 8*len(cells):], 1)
+        ends = list(starts[1:]) + [items[-1]]
+        return {cells[i]: [strings[item] for item in items[starts[i]:ends[i]]] for i in range(len(cells))}
+
+    def explored(self) -> Dict[str, bytes]:
+        strings = self.strings()
+        data = self.section(b"EXPL")
+        (names,) = decode_table(data, 1)
+        width = (self.x_limit * self.y_limit + 7) // 8
+        start = 4 + 4*len(names)
+        return {strings[name]: data[start + width*i:start + width*(i + 1)] for (i, name) in enumerate(names)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Decodes the whole map into the form made by map_to_dict.
+        """
+        strings = self.strings()
+        size = self.x_limit * self.y_limit
+        cells : List[Dict[str, Any]] = [{"treasure": [], "attributes": {}, "explored": []} for _ in range(size)]
+        for (index, value) in enumerate(rle_decode(self.section(b"WTHR"))):
+            if value:
+                cells[index]["attributes"]["weather"] = strings[value - 1]
+        for (index, value) in enumerate(rle_decode(self.section(b"HIDE"))):
+            if value:
+                cells[index]["attributes"]["hiddenness"] = value - 1
+        for (index, value) in enumerate(rle_decode(self.section(b"FLAG"))):
+            for (bit, attr) in enumerate(FLAGS):
+                if value & (1 << bit):
+                    cells[index]["attributes"][attr] = ""
+        for attr in SPARSE:
+            for (index, value) in zip(*decode_table(self.section(SPARSE[attr]), 2)):
+                cells[index]["attributes"][attr] = strings[value]
+        for (index, attr, value) in zip(*decode_table(self.section(b"ATTR"), 3)):
+            cells[index]["attributes"][strings[attr]] = json.loads(strings[value])
+        for (index, items) in self.treasure().items():
+            cells[index]["treasure"] = items
+        for (sub, bits) in self.explored().items():
+            for (byte_index, byte) in enumerate(bits):
+                if byte:
+                    for bit in range(8):
+                        if byte & (1 << bit):
+                            cells[byte_index*8 + bit]["explored"].append(sub)
+        return {
+            "map": [cells[x*self.y_limit:(x + 1)*self.y_limit] for x in range(self.x_limit)],
+            "x_limit": self.x_limit,
+            "y_limit": self.y_limit
+        }
+
+    def cell(self, x : int, y : int) -> Dict[str, Any]:
+        """
+        Decodes a single square, in the form made by Cell._to_dict.
+        """
+        strings = self.strings()
+        index = x*self.y_limit + y
+        attributes : Dict[str, Any] = {}
+        weather = rle_at(self.section(b"WTHR"), index)
+        if weather:
+            attributes["weather"] = strings[weather - 1]
+        hiddenness = rle_at(self.section(b"HIDE"), index)
+        if hiddenness:
+            attributes["hiddenness"] = hiddenness - 1
+        flags = rle_at(self.section(b"FLAG"), index)
+        for (bit, attr) in enumerate(FLAGS):
+            if flags & (1 << bit):
+                attributes[attr] = ""
+        for attr in SPARSE:
+            for (cell, value) in zip(*decode_table(self.section(SPARSE[attr]), 2)):
+                if cell == index:
+                    attributes[attr] = strings[value]
+        for (cell, attr, value) in zip(*decode_table(self.section(b"ATTR"), 3)):
+            if cell == index:
+                attributes[strings[attr]] = json.loads(strings[value])
+        explored = [sub for (sub, bits) in self.explored().items() if bits[index // 8] & (1 << (index % 8))]
+        return {"treasure": self.treasure().get(index, []), "attributes": attributes, "explored": explored}
+
+def dict_cells(dictionary : Dict[str, Any]) -> Iterable[Tuple[List[str], Dict[str, Any], Iterable[str]]]:
+    for column in dictionary["map"]:
+        for cell in column:
+            yield (cell["treasure"], cell["attributes"], cell.get("explored", []))
+
+def encode_dict(dictionary : Dict[str, Any]) -> bytes:
+    """
+    Encodes a map in the form made by map_to_dict.
+    """
+    return encode_map(dict_cells(dictionary), dictionary["x_limit"], dictionary["y_limit"])
+
+def save_map(filename : str):
+    """
+    Saves the current world map straight from its squares.
+    """
+    from ALTANTIS.world import world
+    world_map = world.live_map()
+    cells = ((cell.treasure, cell.attributes, cell.explored) for column in world_map.cells for cell in column)
+    with open(filename, "wb") as map_file:
+        map_file.write(encode_map(cells, world_map.x_limit, world_map.y_limit))
+
+def load_map(source : Union[str, bytes]) -> Dict[str, Any]:
+    with MapFile(source) as map_file:
+        return map_file.to_dict()
+
+def convert(filename : str) -> str:
+    """
+    Converts a .json.gz map save into a binary one alongside it.
+    """
+    import gzip
+    with gzip.open(filename, "rt") as json_file:
+        dictionary = json.load(json_file)
+    new_filename = filename[:-len(".json.gz")] + EXTENSION
+    with open(new_filename, "wb") as map_file:
+        map_file.write(encode_dict(dictionary))
+    if normalise(load_map(new_filename)) != normalise(dictionary):
+        raise ValueError(f"Converting {filename} lost information!")
+    return new_filename
+
+def normalise(dictionary : Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Explored lists are really sets, so their order doesn't matter.
+    """
+    for column in dictionary["map"]:
+        for cell in column:
+            cell["explored"] = sorted(cell.get("explored", []))
+    return dictionary
+
+def bench(filename : str, repeats : int = 5):
+    import gzip, os, tempfile, time
+    with gzip.open(filename, "rt") as json_file:
+        dictionary = json.load(json_file)
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (time.perf_counter() - start) / repeats * 1000
+
+    json_bytes = gzip.compress(json.dumps(dictionary).encode("utf-8"))
+    binary = encode_dict(dictionary)
+    with tempfile.NamedTemporaryFile(suffix=EXTENSION, delete=False) as temp:
+        temp.write(binary)
+    try:
+        print(f"{'format':<10}{'size (bytes)':>14}{'encode (ms)':>14}{'decode (ms)':>14}")
+        print(f"{'json.gz':<10}{len(json_bytes):>14}"
+              f"{timed(lambda: gzip.compress(json.dumps(dictionary).encode('utf-8'))):>14.2f}"
+              f"{timed(lambda: json.loads(gzip.decompress(json_bytes))):>14.2f}")
+        print(f"{'binary':<10}{len(binary):>14}"
+              f"{timed(lambda: encode_dict(dictionary)):>14.2f}"
+              f"{timed(lambda: load_map(temp.name)):>14.2f}")
+    finally:
+        os.remove(temp.name)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ["convert", "bench"]:
+        print("Usage: python -m ALTANTIS.world.binmap (convert|bench) <map.json.gz>...")
+        sys.exit(1)
+    for filename in sys.argv[2:]:
+        if sys.argv[1] == "convert":
+            print(f"{filename} -> {convert(filename)}")
+        else:
+            bench(filename)
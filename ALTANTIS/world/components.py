@@ -0,0 +1,192 @@
+"""
+One store of every sub and NPC, by the components they have, so that systems
+which don't care what kind of entity they're dealing with (explosions,
+weapons, scans, comms, deathrattles) are a single pass over the entities with
+the components they need, rather than a loop for subs and another for NPCs.
+Components are bits of a mask, which each kind of entity declares (see
+Entity.components):
+* POSITION: somewhere on the map.
+* HEALTH and PENDING_DAMAGE: can be hurt, with damage dealt on its next tick.
+* STEALTH: harder to see with weak scanners.
+* CARBON: alive, for anticarbon and antiplastic.
+* MESSAGING: can be sent messages (comms, explosions, deathrattles).
+Each entity is a row of dense columns (its position and mask), indexed by
+square too, kept up to date by SubIndexes and NPCRegistry. The other
+components' values stay with their owners (a sub's power, an NPC's attributes,
+the population's columns), and are reached through the Entity interface.
+Queries give entities in order of owner (NPCs by ID, then subs by name), so
+they don't depend on when things were added.
+"""
+
+from typing import Dict, List, Any, Tuple, Iterator, Collection, Optional
+
+from ALTANTIS.utils.snapshot import reading, handed_out
+from ALTANTIS.utils.games import game_part
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+POSITION = 1
+HEALTH = 2
+PENDING_DAMAGE = 4
+STEALTH = 8
+CARBON = 16
+MESSAGING = 32
+
+Owner = Tuple[str, Any]
+
+# Each column and its NumPy type.
+COLUMNS : Dict[str, str] = {"x": "int32", "y": "int32", "mask": "int32"}
+
+class ComponentStore():
+    def __init__(self):
+        self.size = 0
+        self.capacity = 0
+        self.columns : Dict[str, Any] = {}
+        for column in COLUMNS:
+            self.columns[column] = np.zeros(0, dtype=COLUMNS[column]) if np is not None else []
+        self.keys : List[Owner] = []
+        self.entities : List[Any] = []
+        self.row_of : Dict[Owner, int] = {}
+        self.by_square : Dict[Tuple[int, int], Dict[Owner, None]] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self):
+        self.capacity = max(16, self.capacity * 2)
+        for column in COLUMNS:
+            grown = np.zeros(self.capacity, dtype=COLUMNS[column])
+            grown[:self.size] = self.columns[column][:self.size]
+            self.columns[column] = grown
+
+    def add(self, entity):
+        """
+        Adds entity, replacing anything with the same owner.
+        """
+        key = entity.owner()
+        self.remove(key)
+        (x, y) = entity.get_position()
+        values = {"x": x, "y": y, "mask": entity.components}
+        if np is not None:
+            if self.size == self.capacity:
+                self._grow()
+            for column in COLUMNS:
+                self.columns[column][self.size] = values[column]
+        else:
+            for column in COLUMNS:
+                self.columns[column].append(values[column])
+        self.keys.append(key)
+        self.entities.append(entity)
+        self.row_of[key] = self.size
+        self.size += 1
+        self.by_square.setdefault((x, y), {})[key] = None
+
+    def remove(self, key : Owner):
+        """
+        Removes whatever key owns (if anything), by moving the last row into
+        its place.
+        """
+        row = self.row_of.pop(key, None)
+        if row is None:
+            return
+        self._unindex(key, self.position_of(row))
+        last = self.size - 1
+        if row != last:
+            for column in COLUMNS:
+                self.columns[column][row] = self.columns[column][last]
+            self.keys[row] = self.keys[last]
+            self.entities[row] = self.entities[last]
+            self.row_of[self.keys[row]] = row
+        if np is None:
+            for column in COLUMNS:
+                self.columns[column].pop()
+        self.keys.pop()
+        self.entities.pop()
+        self.size -= 1
+
+    def remove_kind(self, kind : str):
+        """
+        Removes every entity whose owner is of a kind, like "sub" or "npc".
+        """
+        for key in [key for key in self.keys if key[0] == kind]:
+            self.remove(key)
+
+    def moved(self, entity):
+        row = self.row_of.get(entity.owner())
+        if row is None or self.entities[row] is not entity:
+            return
+        self._unindex(entity.owner(), self.position_of(row))
+        (x, y) = entity.get_position()
+        self.columns["x"][row] = x
+        self.columns["y"][row] = y
+        self.by_square.setdefault((x, y), {})[entity.owner()] = None
+
+    def _unindex(self, key : Owner, position : Tuple[int, int]):
+        here = self.by_square.get(position)
+        if here is not None:
+            here.pop(key, None)
+            if not here:
+                del self.by_square[position]
+
+    def position_of(self, row : int) -> Tuple[int, int]:
+        return (int(self.columns["x"][row]), int(self.columns["y"][row]))
+
+    def _rows_within(self, position : Tuple[int, int], dist : int) -> List[int]:
+        # Whichever is fewer: the squares in range, or the squares with
+        # anything in them (which we can check all at once with NumPy).
+        (x, y) = position
+        if (2 * dist + 1) ** 2 < len(self.by_square):
+            rows = []
+            for dx in range(-dist, dist + 1):
+                for dy in range(-dist, dist + 1):
+                    rows.extend(self.row_of[key] for key in self.by_square.get((x + dx, y + dy), ()))
+            return rows
+        if np is not None:
+            xs = self.columns["x"][:self.size]
+            ys = self.columns["y"][:self.size]
+            return np.nonzero(np.maximum(np.abs(xs - x), np.abs(ys - y)) <= dist)[0].tolist()
+        return [row for row in range(self.size)
+                if max(abs(self.columns["x"][row] - x), abs(self.columns["y"][row] - y)) <= dist]
+
+    def _rows_with(self, components : int) -> List[int]:
+        if np is not None:
+            return np.nonzero((self.columns["mask"][:self.size] & components) == components)[0].tolist()
+        return [row for row in range(self.size) if self.columns["mask"][row] & components == components]
+
+    def query(self, components : int, position : Optional[Tuple[int, int]] = None, dist : int = 0,
+              exclude : Collection[Owner] = ()) -> Iterator[Any]:
+        """
+        Every entity with all of components (at most dist from position, if
+        given), besides those owned by anything in exclude.
+        """
+        if position is None:
+            rows = self._rows_with(components)
+        else:
+            rows = [row for row in self._rows_within(position, dist)
+                    if self.columns["mask"][row] & components == components]
+        # Taken before yielding, so that the caller can change the store.
+        found = sorted((self.keys[row], self.entities[row]) for row in rows if self.keys[row] not in exclude)
+        for (_, entity) in found:
+            yield entity
+
+live_store = game_part("components", ComponentStore)
+
+def current_store() -> ComponentStore:
+    """
+    The live store, unless we're serving a read-only command from the
+    published snapshot (see utils/snapshot.py).
+    """
+    view = reading.get()
+    return live_store() if view is None else view.components
+
+def query(components : int, position : Optional[Tuple[int, int]] = None, dist : int = 0,
+          exclude : Collection[Owner] = ()) -> Iterator[Any]:
+    if reading.get() is not None:
+        return current_store().query(components, position, dist, exclude)
+    return (handed_out(entity) for entity in live_store().query(components, position, dist, exclude))
+
+def has(entity, components : int) -> bool:
+    return entity.components & components == components
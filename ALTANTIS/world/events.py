@@ -0,0 +1,80 @@
+"""
+Square events: when a sub or NPC enters or leaves a square, and when a sub
+stays in one for a turn.
+NPCs that care about a square (mines, urchins, crabs and the like) watch it
+(see NPC.watched_squares), and are told about these events through on_enter,
+on_leave and on_stay, rather than checking for subs every turn. Moves into and
+out of squares nobody watches are never recorded at all.
+Events wait until the turn dispatches them (see run_turn in game.py), so that
+moves made between turns (teleports, say) are handled in the next turn.
+"""
+
+from typing import List, Tuple, Set
+
+from ALTANTIS.utils.entity import Entity
+from ALTANTIS.utils.games import game_part
+
+ENTER = "enter"
+LEAVE = "leave"
+STAY = "stay"
+
+# The events waiting for the next dispatch.
+live_pending = game_part("square_events", list)
+
+def moved(entity : Entity, old : Tuple[int, int], new : Tuple[int, int]):
+    """
+    Call whenever an entity changes square.
+    """
+    from ALTANTIS.npcs.npc import live_registry
+    if old == new:
+        return
+    registry = live_registry()
+    pending : List[Tuple[str, Entity, Tuple[int, int]]] = live_pending()
+    if old in registry.by_watched:
+        pending.append((LEAVE, entity, old))
+    if new in registry.by_watched:
+        pending.append((ENTER, entity, new))
+
+def still_here(entity : Entity) -> bool:
+    """
+    Whether entity is still in the game (it might have died or been replaced
+    by a load since the event).
+    """
+    from ALTANTIS.subs.state import get_sub
+    from ALTANTIS.npcs.npc import get_npc
+    from ALTANTIS.subs.sub import Submarine
+    if isinstance(entity, Submarine):
+        return get_sub(entity._name) is entity
+    return get_npc(entity.id) is entity
+
+async def dispatch():
+    """
+    Sends every event since the last dispatch, followed by a stay event for
+    each sub in a watched square that didn't just enter it.
+    """
+    from ALTANTIS.npcs.npc import live_registry
+    from ALTANTIS.subs.state import get_subs_at
+    from ALTANTIS.subs.sub import Submarine
+    registry = live_registry()
+    pending = live_pending()
+    events = pending[:]
+    pending.clear()
+    entered : Set[Tuple[Tuple[int, int], str]] = set()
+    for (kind, entity, square) in events:
+        if kind == ENTER and isinstance(entity, Submarine):
+            entered.add((square, entity._name))
+    # Sorted, so that the order doesn't depend on when NPCs were loaded.
+    for square in sorted(registry.by_watched):
+        for sub in get_subs_at(square):
+            if (square, sub._name) not in entered:
+                events.append((STAY, sub, square))
+
+    registry.begin_tick()
+    try:
+        for (kind, entity, square) in events:
+            if not still_here(entity):
+                continue
+            for npc in registry.watchers(square):
+                await getattr(npc, f"on_{kind}")(entity)
+    finally:
+        registry.end_tick()
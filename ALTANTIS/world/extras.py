@@ -1,27 +1,21 @@
-from typing import Tuple, List
+from typing import Tuple, List, Set
 
 from ALTANTIS.utils.entity import Entity
 from ALTANTIS.utils.direction import diagonal_distance
+from ALTANTIS.world.components import query, POSITION, HEALTH, PENDING_DAMAGE, MESSAGING, Owner
+
+def exclusions(sub_exclusions : List[str], npc_exclusions : List[int]) -> Set[Owner]:
+    """
+    The owners (see Entity.owner) of the excluded subs and NPCs.
+    """
+    return {("sub", name) for name in sub_exclusions} | {("npc", npcid) for npcid in npc_exclusions}
 
 def all_in_submap(pos : Tuple[int, int], dist : int, sub_exclusions : List[str] = [], npc_exclusions : List[int] = []) -> List[Entity]:
-    from ALTANTIS.subs.state import filtered_teams, get_sub
-    from ALTANTIS.npcs.npc import filtered_npcs, get_npc
     """
     Gets all entities some distance from the chosen square.
     Ignores any entities in exclusions.
     """
-    result : List[Entity] = []
-    subs_in_range = filtered_teams(
-        lambda sub: diagonal_distance(sub.movement.get_position(), pos) <= dist and sub._name not in sub_exclusions
-    )
-    for sub in map(get_sub, subs_in_range):
-        if sub: result.append(sub)
-    npcs_in_range = filtered_npcs(
-        lambda npc: diagonal_distance(npc.get_position(), pos) <= dist and npc.id not in npc_exclusions
-    )
-    for npc in map(get_npc, npcs_in_range):
-        if npc: result.append(npc)
-    return result
+    return list(query(POSITION, pos, dist, exclusions(sub_exclusions, npc_exclusions)))
 
 async def explode(pos : Tuple[int, int], power : int, sub_exclusions : List[str] = [], npc_exclusions : List[int] = []):
     """
@@ -29,30 +23,9 @@ async def explode(pos : Tuple[int, int], power : int, sub_exclusions : List[str]
     power-1 to the surrounding ones, power-2 to those that surround and
     so on.
     """
-    from ALTANTIS.subs.state import get_subs, get_sub
-    from ALTANTIS.npcs.npc import get_npcs, get_npc
-    for subname in get_subs():
-        if subname in sub_exclusions:
-            continue
-
-        sub = get_sub(subname)
-        sub_pos = sub.movement.get_position()
-        sub_dist = diagonal_distance(pos, sub_pos)
-        damage = power - sub_dist
-
-        if damage > 0:
-            await sub.send_message(f"Explosion in {pos}!", "captain")
-            sub.damage(damage)
-    
-    for npcid in get_npcs():
-        if npcid in npc_exclusions:
-            continue
-        
-        npc_obj = get_npc(npcid)
-        npc_pos = npc_obj.get_position()
-        npc_dist = diagonal_distance(pos, npc_pos)
-        damage = power - npc_dist
-
-        if damage > 0:
-            await npc_obj.send_message(f"Explosion in {pos}!", "captain")
-            npc_obj.damage(damage)
+    # Only those closer than power are hurt.
+    for entity in query(POSITION | HEALTH | PENDING_DAMAGE, pos, power - 1, exclusions(sub_exclusions, npc_exclusions)):
+        damage = power - diagonal_distance(pos, entity.get_position())
+        if entity.components & MESSAGING:
+            await entity.send_message(f"Explosion in {pos}!", "captain")
+        entity.damage(damage)
@@ -0,0 +1,306 @@
+"""
+Splits each turn's busiest work (ticking squares, and planning what the
+attacking creatures do) between REGION_WORKERS processes, each owning a strip
+of the map's columns, for maps too big to tick in one.
+The game itself stays where it is, which we call the coordinator here: it
+keeps the map, subs and NPCs, and everything that touches more than one
+entity (damage, deaths, scans, weapons, comms). Each worker keeps its own
+copy of what its work needs to know about its squares (which attributes tick,
+whether they've been explored, and whether creatures can enter), so each turn
+the coordinator only sends the squares that changed since (see changes in
+world.py), or every square again if the worker is new or the map was
+replaced. Along with those, each job carries plain tuples:
+* For creatures, those in the region that will do something and the subs
+  they might reach. Creatures move at most two squares and hunt HUNT_RANGE
+  away, so each region also sees that far into its neighbours (its ghost
+  zone), and keeps its neighbours' squares that close too.
+* For squares, nothing more: each worker ticks the squares it has.
+Workers give back plans (see plan in population.py) and the treasure each
+square gained. The coordinator carries them out in ID order (and square
+order), exactly as if it had done them itself: everything comes from the
+entities' own streams (see utils/rng.py), which workers make from the turn's
+seed too. A creature that crosses into another region belongs to it from the
+next turn on, as regions go by where creatures start.
+If a worker fails, the coordinator does the turn's work itself, and starts
+new workers next turn (sending them every square).
+"""
+
+import asyncio, atexit, multiprocessing
+from typing import Dict, List, Any, Optional, Tuple
+
+from ALTANTIS.utils.consts import REGION_WORKERS
+from ALTANTIS.utils.journal import current_seed, current_turn, use_seed, set_turn
+from ALTANTIS.utils.rng import stream
+from ALTANTIS.utils.games import game_part, current_game
+from ALTANTIS.npcs.population import HUNT_RANGE, plan
+from ALTANTIS.world.world import Cell, live_map, map_tick as map_tick_here
+
+# How far into its neighbours each region sees, for subs and for squares.
+SUB_GHOSTS = HUNT_RANGE
+SQUARE_GHOSTS = 2
+# The attributes a square ticks for.
+TICKING = ["deposit", "diverse", "ruins"]
+
+# What a worker knows about a square: the attributes it ticks for, whether
+# it's been explored, and whether creatures are kept out.
+SquareState = Tuple[List[str], bool, bool]
+
+def enabled() -> bool:
+    return REGION_WORKERS > 0
+
+def region_of(x : int, x_limit : int) -> int:
+    return x * REGION_WORKERS // x_limit
+
+def columns(region : int, x_limit : int) -> range:
+    """
+    The columns in a region (those x with region_of(x) == region).
+    """
+    return range(-(-region * x_limit // REGION_WORKERS), -(-(region + 1) * x_limit // REGION_WORKERS))
+
+def seen_columns(region : int, x_limit : int) -> range:
+    """
+    The columns a region keeps squares for: its own, and its ghost zone.
+    """
+    owned = columns(region, x_limit)
+    return range(max(0, owned.start - SQUARE_GHOSTS), min(x_limit, owned.stop + SQUARE_GHOSTS))
+
+def square_state(cell : Cell) -> Optional[SquareState]:
+    """
+    What a worker needs to know about cell, or None if it's plain sea.
+    """
+    state = ([attribute for attribute in TICKING if attribute in cell.attributes], bool(cell.explored), not cell.can_npc_enter())
+    return state if any(state) else None
+
+class Region():
+    """
+    A worker's copy of its region of one game's map.
+    """
+    def __init__(self, owned : Tuple[int, int], limits : Tuple[int, int]):
+        self.owned = range(*owned)
+        self.limits = limits
+        self.squares : Dict[Tuple[int, int], SquareState] = {}
+
+    def update(self, squares : List[Tuple[int, int, Optional[SquareState]]]):
+        for (x, y, state) in squares:
+            if state is None:
+                self.squares.pop((x, y), None)
+            else:
+                self.squares[(x, y)] = state
+
+    def blocked(self) -> List[Tuple[int, int]]:
+        return [position for (position, state) in self.squares.items() if state[2]]
+
+class RegionSurroundings():
+    """
+    A region's view of the map and subs, for plan.
+    """
+    def __init__(self, limits : Tuple[int, int], blocked : List[Tuple[int, int]], subs : List[Tuple[str, Tuple[int, int]]]):
+        self.limits = limits
+        self.blocked = set(blocked)
+        # By square in the coordinator's order, and by name.
+        self.by_square : Dict[Tuple[int, int], List[str]] = {}
+        for (name, position) in subs:
+            self.by_square.setdefault(position, []).append(name)
+        self.by_name = sorted(subs)
+
+    def can_enter(self, x : int, y : int) -> bool:
+        return 0 <= x < self.limits[0] and 0 <= y < self.limits[1] and (x, y) not in self.blocked
+
+    def subs_within(self, position : Tuple[int, int], dist : int) -> List[Tuple[int, int]]:
+        (x, y) = position
+        return [sub_position for (_, sub_position) in self.by_name
+                if max(abs(sub_position[0] - x), abs(sub_position[1] - y)) <= dist]
+
+    def subs_at(self, position : Tuple[int, int]) -> List[str]:
+        return list(self.by_square.get(position, []))
+
+def plan_region(region : Region, job : Dict[str, Any]) -> List[Tuple[int, List[Tuple[Any, ...]]]]:
+    surroundings = RegionSurroundings(region.limits, region.blocked(), job["subs"])
+    return [(npcid, plan(movement, position, distance, stream(("npc", npcid), "npcs"), surroundings))
+            for (npcid, movement, position, distance) in job["creatures"]]
+
+def tick_region(region : Region) -> List[Tuple[int, int, List[str], bool]]:
+    """
+    Ticks a stand-in for each of the region's own squares (with just what
+    cell_tick looks at), and gives back what changed.
+    """
+    changes = []
+    for (x, y) in sorted(region.squares):
+        (attributes, explored, blocked) = region.squares[(x, y)]
+        if x not in region.owned or not (attributes or explored):
+            continue
+        cell = Cell()
+        cell.attributes = dict.fromkeys(attributes, "")
+        if explored:
+            cell.explored.add("")
+        cell.cell_tick(stream(("cell", (x, y)), "map"))
+        if cell.treasure or (explored and not cell.explored):
+            changes.append((x, y, cell.treasure, explored and not cell.explored))
+            region.squares[(x, y)] = (attributes, bool(cell.explored), blocked)
+    return changes
+
+def serve_region(connection):
+    """
+    A region's worker, which does whatever job it's sent until told to stop.
+    It keeps a Region for each game it's sent, by the game's key.
+    """
+    regions : Dict[Optional[int], Region] = {}
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            use_seed(job["seed"])
+            set_turn(job["turn"])
+            if job["reset"] is not None:
+                regions[job["game"]] = Region(*job["reset"])
+            # A KeyError here means we were never sent the game's squares.
+            region = regions[job["game"]]
+            region.update(job["squares"])
+            if job["type"] == "creatures":
+                connection.send(("done", plan_region(region, job)))
+            else:
+                connection.send(("done", tick_region(region)))
+        except Exception as error:
+            connection.send(("failed", repr(error)))
+
+# In the coordinator: each region's worker and our end of its Pipe.
+workers : List[Tuple[multiprocessing.Process, Any]] = []
+# Counts the times the workers have stopped, and so forgotten every game.
+generation = 0
+# Games take turns to use the workers.
+lock : Optional[asyncio.Lock] = None
+
+class Residency():
+    def __init__(self):
+        # The generation of workers that have this game's squares, if any.
+        self.generation : Optional[int] = None
+
+live_residency = game_part("regions", Residency)
+
+def start_regions():
+    context = multiprocessing.get_context("spawn")
+    for _ in range(REGION_WORKERS):
+        (ours, theirs) = context.Pipe()
+        process = context.Process(target=serve_region, args=(theirs,), daemon=True)
+        process.start()
+        theirs.close()
+        workers.append((process, ours))
+    print(f"Started {REGION_WORKERS} region workers.")
+
+def stop_regions():
+    global generation
+    for (process, connection) in workers:
+        try:
+            connection.send(None)
+        except (OSError, ValueError):
+            pass
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+        connection.close()
+    workers.clear()
+    generation += 1
+
+atexit.register(stop_regions)
+
+async def run_jobs(jobs : List[Dict[str, Any]]) -> Optional[List[Any]]:
+    """
+    Sends each region its job, and gives back each result. If any fails,
+    gives back None, so the caller can do the work itself (and the workers
+    will be sent every square next time, as we can't tell what they have).
+    """
+    global lock
+    if lock is None:
+        lock = asyncio.Lock()
+    def exchange() -> List[Tuple[str, Any]]:
+        for ((_, connection), job) in zip(workers, jobs):
+            connection.send(job)
+        return [connection.recv() for (_, connection) in workers]
+    async with lock:
+        if not workers:
+            start_regions()
+        try:
+            replies = await asyncio.get_event_loop().run_in_executor(None, exchange)
+        except (EOFError, OSError) as error:
+            # The replies are out of step now, so we start again.
+            print(f"Lost a region worker ({error!r}), so this turn is done here.")
+            stop_regions()
+            live_residency().generation = None
+            return None
+    for (status, result) in replies:
+        if status == "failed":
+            print(f"A region worker failed ({result}), so this turn is done here.")
+            live_residency().generation = None
+            return None
+    return [result for (_, result) in replies]
+
+def new_jobs(kind : str) -> List[Dict[str, Any]]:
+    """
+    A job of kind for each region, with the squares it needs to be sent.
+    """
+    world_map = live_map()
+    residency = live_residency()
+    changed = world_map.changes("regions")
+    jobs = [{"type": kind, "seed": current_seed(), "turn": current_turn(), "game": current_game().key,
+             "reset": None, "squares": []} for _ in range(REGION_WORKERS)]
+    if changed is None or residency.generation != generation:
+        residency.generation = generation
+        for region in range(REGION_WORKERS):
+            owned = columns(region, world_map.x_limit)
+            jobs[region]["reset"] = ((owned.start, owned.stop), (world_map.x_limit, world_map.y_limit))
+            for x in seen_columns(region, world_map.x_limit):
+                for (y, cell) in enumerate(world_map.cells[x]):
+                    state = square_state(cell)
+                    if state is not None:
+                        jobs[region]["squares"].append((x, y, state))
+        return jobs
+    for (x, y) in sorted(changed):
+        state = square_state(world_map.cells[x][y])
+        for region in range(REGION_WORKERS):
+            if x in seen_columns(region, world_map.x_limit):
+                jobs[region]["squares"].append((x, y, state))
+    return jobs
+
+async def plan_creatures(acting : List[Tuple[int, str, Tuple[int, int], int]],
+                         subs : List[Tuple[str, Tuple[int, int]]]) -> Optional[Dict[int, List[Tuple[Any, ...]]]]:
+    """
+    Plans each of acting (their ID, movement, position and distance from the
+    nearest sub) in their regions, given every sub's name and position (in
+    the order get_subs_at gives them). Gives back each creature's plan by
+    ID, or None if the regions couldn't.
+    """
+    world_map = live_map()
+    jobs = new_jobs("creatures")
+    for region in range(REGION_WORKERS):
+        owned = columns(region, world_map.x_limit)
+        jobs[region]["creatures"] = [creature for creature in acting if creature[2][0] in owned]
+        jobs[region]["subs"] = [(name, position) for (name, position) in subs
+                                if owned.start - SUB_GHOSTS <= position[0] < owned.stop + SUB_GHOSTS]
+    results = await run_jobs(jobs)
+    if results is None:
+        return None
+    return {npcid: actions for result in results for (npcid, actions) in result}
+
+async def map_tick():
+    """
+    Ticks every square, in the regions if there are any.
+    """
+    if not enabled():
+        map_tick_here()
+        return
+    world_map = live_map()
+    results = await run_jobs(new_jobs("squares"))
+    if results is None:
+        map_tick_here()
+        return
+    for result in results:
+        for (x, y, treasure, cleared) in result:
+            cell = world_map.cells[x][y]
+            cell.treasure.extend(treasure)
+            if cleared:
+                cell.explored.clear()
+            cell.touched()
@@ -7,11 +7,14 @@ from functools import reduce
 from ALTANTIS.utils.text import list_to_and_separated
 from ALTANTIS.utils.direction import reverse_dir, directions
 from ALTANTIS.utils.consts import X_LIMIT, Y_LIMIT
+from ALTANTIS.utils.snapshot import reading
+from ALTANTIS.utils.rng import stream
+from ALTANTIS.utils.games import game_part
 from ALTANTIS.world.validators import InValidator, NopValidator, TypeValidator, BothValidator, LenValidator, RangeValidator
 from ALTANTIS.world.consts import ATTRIBUTES, WEATHER, WALL_STYLES
 
 import random
-from typing import List, Optional, Tuple, Any, Dict, Collection
+from typing import List, Optional, Tuple, Any, Dict, Collection, Set
 
 
 class Cell():
@@ -32,6 +35,9 @@ class Cell():
         self.attributes = {}
         # The list of subs for whom the hiddenness attribute no longer affects the rendering of the map
         self.explored = set([])
+        # The map this square is on and where, so that it can say when it
+        # changes (see WorldMap.touch). Copies aren't on any map.
+        self.where : Optional[Tuple["WorldMap", int, int]] = None
 
     @classmethod
     def _from_dict(cls, serialisation):
@@ -42,6 +48,13 @@ class Cell():
             p.explored = set(serialisation["explored"])
         return p
 
+    def copy(self):
+        p = Cell()
+        p.treasure = list(self.treasure)
+        p.attributes = dict(self.attributes)
+        p.explored = set(self.explored)
+        return p
+
     def _to_dict(self):
         return {
             "treasure": list(self.treasure),
@@ -49,15 +62,26 @@ class Cell():
             "explored": list(self.explored)
         }
 
-    def cell_tick(self):
-        if "deposit" in self.attributes and random.random() < 0.015:
+    def touched(self):
+        """
+        Call whenever this square changes.
+        """
+        if self.where is not None:
+            (world_map, x, y) = self.where
+            world_map.touch(x, y)
+
+    def cell_tick(self, rng : random.Random):
+        before = (len(self.treasure), len(self.explored))
+        if "deposit" in self.attributes and rng.random() < 0.015:
             self.treasure.append("plating")
-        if "diverse" in self.attributes and random.random() < 0.015:
+        if "diverse" in self.attributes and rng.random() < 0.015:
             self.treasure.append("specimen")
-        if "ruins" in self.attributes and random.random() < 0.015:
-            self.treasure.append(random.choice(["tool", "circuitry"]))
-        if random.random() < 0.01:
+        if "ruins" in self.attributes and rng.random() < 0.015:
+            self.treasure.append(rng.choice(["tool", "circuitry"]))
+        if self.explored and rng.random() < 0.01:
             self.explored.clear()
+        if (len(self.treasure), len(self.explored)) != before:
+            self.touched()
 
     def treasure_string(self) -> str:
         return list_to_and_separated(list(map(lambda t: t.title(), self.treasure)))
@@ -65,17 +89,20 @@ class Cell():
     def square_status(self) -> str:
         return f"This square has treasures {self.treasure_string()} and attributes {self.attributes}."
 
-    def pick_up(self, power: int) -> List[str]:
+    def pick_up(self, power: int, rng: random.Random) -> List[str]:
         power = min(power, len(self.treasure))
         treasures = []
         for _ in range(power):
-            treas = random.choice(self.treasure)
+            treas = rng.choice(self.treasure)
             self.treasure.remove(treas)
             treasures.append(treas)
+        if treasures:
+            self.touched()
         return treasures
 
     def bury_treasure(self, treasure: str) -> bool:
         self.treasure.append(treasure)
+        self.touched()
         return True
 
     def name(self, to_show: Collection[str] = ("d", "a", "m", "e", "j")) -> Optional[str]:
@@ -199,8 +226,9 @@ class Cell():
         return difficulties.get(self.attributes.get('weather', "normal"), 4) + modifier
 
     def has_been_scanned(self, subname: str, strength: int) -> None:
-        if not self._hidden(strength):
+        if not self._hidden(strength) and subname not in self.explored:
             self.explored.add(subname)
+            self.touched()
 
     def _hidden(self, strength: int, ships: Optional[Collection[str]] = None) -> bool:
         if ships and not self.explored.isdisjoint(ships):
@@ -220,6 +248,7 @@ class Cell():
         if attr not in self.attributes or self.attributes[attr] != clean:
             self.attributes[attr] = clean
             self.explored.clear()
+            self.touched()
             return True
         return False
 
@@ -227,38 +256,112 @@ class Cell():
         if attr in self.attributes:
             del self.attributes[attr]
             self.explored.clear()
+            self.touched()
             return True
         return False
 
-undersea_map = [[Cell() for _ in range(Y_LIMIT)] for _ in range(X_LIMIT)]
+class WorldMap():
+    """
+    One game's map, which is as big as that game's save says.
+    The map notes which squares change, for each of its watchers (the
+    snapshot and the feed), so that they only need to look at those.
+    """
+    def __init__(self):
+        self.x_limit = X_LIMIT
+        self.y_limit = Y_LIMIT
+        # The squares changed since each watcher last asked, or None if it
+        # should look at them all.
+        self.changed : Dict[str, Optional[Set[Tuple[int, int]]]] = {}
+        self.replace_cells([[Cell() for _ in range(self.y_limit)] for _ in range(self.x_limit)])
+
+    def replace_cells(self, cells : List[List[Cell]]):
+        self.cells = cells
+        for (x, column) in enumerate(cells):
+            for (y, cell) in enumerate(column):
+                cell.where = (self, x, y)
+        for watcher in self.changed:
+            self.changed[watcher] = None
+
+    def place(self, x : int, y : int, cell : Cell):
+        self.cells[x][y].where = None
+        cell.where = (self, x, y)
+        self.cells[x][y] = cell
+        self.touch(x, y)
+
+    def touch(self, x : int, y : int):
+        for changed in self.changed.values():
+            if changed is not None:
+                changed.add((x, y))
+
+    def changes(self, watcher : str) -> Optional[Set[Tuple[int, int]]]:
+        """
+        The squares changed since watcher last asked, or None if it should
+        look at every square (as it hasn't asked before, or the whole map has
+        been replaced since).
+        """
+        changed = self.changed.get(watcher)
+        self.changed[watcher] = set()
+        return changed
+
+    def unwatch(self, watcher : str):
+        """
+        Stops noting changes for watcher, until it next asks.
+        """
+        self.changed.pop(watcher, None)
+
+live_map = game_part("map", WorldMap)
 
 def in_world(x: int, y: int) -> bool:
-    return 0 <= x < X_LIMIT and 0 <= y < Y_LIMIT
+    world_map = live_map()
+    return 0 <= x < world_map.x_limit and 0 <= y < world_map.y_limit
+
+def world_size() -> Tuple[int, int]:
+    """
+    The width and height of the map being read (see get_square).
+    """
+    view = reading.get()
+    if view is not None:
+        return (len(view.undersea_map), len(view.undersea_map[0]))
+    world_map = live_map()
+    return (world_map.x_limit, world_map.y_limit)
 
 def possible_directions() -> List[str]:
     return list(directions.keys())
 
 def get_square(x: int, y: int) -> Optional[Cell]:
     if in_world(x, y):
-        return undersea_map[x][y]
+        view = reading.get()
+        if view is not None:
+            return view.undersea_map[x][y]
+        return live_map().cells[x][y]
     return None
 
+def replace_square(x: int, y: int, cell: Cell) -> bool:
+    if in_world(x, y):
+        live_map().place(x, y, cell)
+        return True
+    return False
+
 def bury_treasure_at(name: str, pos: Tuple[int, int]) -> bool:
     (x, y) = pos
     if in_world(x, y):
-        return undersea_map[x][y].bury_treasure(name)
+        return live_map().cells[x][y].bury_treasure(name)
     return False
 
-def pick_up_treasure(pos: Tuple[int, int], power: int) -> List[str]:
+def pick_up_treasure(pos: Tuple[int, int], power: int, rng: random.Random) -> List[str]:
     (x, y) = pos
     if in_world(x, y):
-        return undersea_map[x][y].pick_up(power)
+        return live_map().cells[x][y].pick_up(power, rng)
     return []
 
 def map_tick():
-    for x in range(X_LIMIT):
-        for y in range(Y_LIMIT):
-            undersea_map[x][y].cell_tick()
+    world_map = live_map()
+    for x in range(world_map.x_limit):
+        for y in range(world_map.y_limit):
+            cell = world_map.cells[x][y]
+            # Squares with nothing to change don't need a stream.
+            if cell.attributes or cell.explored:
+                cell.cell_tick(stream(("cell", (x, y)), "map"))
 
 def map_to_dict() -> Dict[str, Any]:
     """
@@ -266,19 +369,20 @@ def map_to_dict() -> Dict[str, Any]:
     trivially converted into dicts, we just convert them individually.
     We also append a class identifier so they can be recreated correctly.
     """
-    undersea_map_dicts = [[{} for _ in range(Y_LIMIT)] for _ in range(X_LIMIT)]
-    for i in range(X_LIMIT):
-        for j in range(Y_LIMIT):
-            undersea_map_dicts[i][j] = undersea_map[i][j]._to_dict()
-    return {"map": undersea_map_dicts, "x_limit": X_LIMIT, "y_limit": Y_LIMIT}
+    world_map = live_map()
+    undersea_map_dicts = [[{} for _ in range(world_map.y_limit)] for _ in range(world_map.x_limit)]
+    for i in range(world_map.x_limit):
+        for j in range(world_map.y_limit):
+            undersea_map_dicts[i][j] = world_map.cells[i][j]._to_dict()
+    return {"map": undersea_map_dicts, "x_limit": world_map.x_limit, "y_limit": world_map.y_limit}
 
 def map_from_dict(dictionary: Dict[str, Any]):
     """
     Takes a triple generated by map_to_dict and overwrites our map with it.
     """
-    global X_LIMIT, Y_LIMIT, undersea_map
-    X_LIMIT = dictionary["x_limit"]
-    Y_LIMIT = dictionary["y_limit"]
+    world_map = live_map()
+    world_map.x_limit = dictionary["x_limit"]
+    world_map.y_limit = dictionary["y_limit"]
     map_dicts = dictionary["map"]
-    undersea_map_new = [[Cell._from_dict(map_dicts[x][y]) for y in range(Y_LIMIT)] for x in range(X_LIMIT)]
-    undersea_map = undersea_map_new
+    undersea_map_new = [[Cell._from_dict(map_dicts[x][y]) for y in range(world_map.y_limit)] for x in range(world_map.x_limit)]
+    world_map.replace_cells(undersea_map_new)
@@ -1,3 +1,6 @@
 import ALTANTIS
 
-ALTANTIS.run_bot()
\ No newline at end of file
+# The engine process (see ALTANTIS/utils/engine.py) imports this file too, and
+# mustn't start a bot of its own.
+if __name__ == "__main__":
+    ALTANTIS.run_bot()
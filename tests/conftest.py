@@ -0,0 +1,12 @@
+"""
+The game reads its puzzles from (and writes its saves to) the directory it's
+run from, so the tests run from a scratch one.
+"""
+
+import json, os, tempfile
+
+directory = tempfile.mkdtemp(prefix="altantis-tests-")
+os.makedirs(os.path.join(directory, "puzzles"))
+with open(os.path.join(directory, "puzzles", "answers.json"), "w") as answers:
+    json.dump({}, answers)
+os.chdir(directory)
@@ -0,0 +1,73 @@
+"""
+Tests queries on the component store (see ALTANTIS/world/components.py), with
+NumPy if it's installed and always without.
+"""
+
+import pytest
+
+from ALTANTIS.world import components
+from ALTANTIS.world.components import ComponentStore, POSITION, HEALTH, CARBON, MESSAGING
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BACKENDS = [pytest.param(numpy, id="numpy", marks=pytest.mark.skipif(numpy is None, reason="NumPy isn't installed")),
+            pytest.param(None, id="lists")]
+
+class Thing():
+    def __init__(self, kind : str, key, x : int, y : int, components : int):
+        self.key = (kind, key)
+        self.x = x
+        self.y = y
+        self.components = components
+
+    def owner(self):
+        return self.key
+
+    def get_position(self):
+        return (self.x, self.y)
+
+def stocked() -> ComponentStore:
+    store = ComponentStore()
+    # Added out of order, as they would be over a game.
+    for thing in [Thing("sub", "zulu", 3, 3, POSITION | HEALTH | MESSAGING),
+                  Thing("npc", 12, 2, 3, POSITION | HEALTH | CARBON),
+                  Thing("sub", "alpha", 9, 9, POSITION | HEALTH | MESSAGING),
+                  Thing("npc", 3, 3, 4, POSITION | HEALTH | CARBON | MESSAGING),
+                  Thing("npc", 40, 20, 20, POSITION),
+                  Thing("sub", "mike", 3, 2, POSITION | HEALTH | MESSAGING),
+                  Thing("npc", 7, 3, 3, POSITION | HEALTH)]:
+        store.add(thing)
+    return store
+
+def owners(found):
+    return [thing.owner() for thing in found]
+
+@pytest.mark.parametrize("np", BACKENDS)
+def test_queries_go_by_owner(np, monkeypatch):
+    monkeypatch.setattr(components, "np", np)
+    store = stocked()
+    assert owners(store.query(HEALTH)) == [("npc", 3), ("npc", 7), ("npc", 12), ("sub", "alpha"), ("sub", "mike"), ("sub", "zulu")]
+    assert owners(store.query(MESSAGING, exclude=[("sub", "mike")])) == [("npc", 3), ("sub", "alpha"), ("sub", "zulu")]
+    # Close enough that it's quicker to check the squares in range.
+    assert owners(store.query(HEALTH, (3, 3), 0)) == [("npc", 7), ("sub", "zulu")]
+    # Otherwise we check every entity.
+    assert owners(store.query(HEALTH | CARBON, (3, 3), 1)) == [("npc", 3), ("npc", 12)]
+    assert owners(store.query(POSITION, (10, 10), 10)) == [("npc", 3), ("npc", 7), ("npc", 12), ("npc", 40), ("sub", "alpha"), ("sub", "mike"), ("sub", "zulu")]
+
+@pytest.mark.parametrize("np", BACKENDS)
+def test_queries_follow_moves_and_removals(np, monkeypatch):
+    monkeypatch.setattr(components, "np", np)
+    store = stocked()
+    store.remove(("npc", 3))
+    moved = next(thing for thing in store.entities if thing.owner() == ("sub", "alpha"))
+    (moved.x, moved.y) = (2, 2)
+    store.moved(moved)
+    assert owners(store.query(POSITION, (3, 3), 1)) == [("npc", 7), ("npc", 12), ("sub", "alpha"), ("sub", "mike"), ("sub", "zulu")]
+    assert owners(store.query(POSITION, (2, 2), 0)) == [("sub", "alpha")]
+    assert owners(store.query(POSITION, (9, 9), 2)) == []
+    store.remove_kind("sub")
+    assert owners(store.query(POSITION)) == [("npc", 7), ("npc", 12), ("npc", 40)]
+    assert len(store) == 3
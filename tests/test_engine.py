@@ -0,0 +1,72 @@
+"""
+Tests talking to the engine process (see ALTANTIS/utils/engine.py).
+"""
+
+import asyncio
+
+import pytest
+
+from ALTANTIS.cogs.comms import shout_at_team
+from ALTANTIS.subs.state import add_team
+from ALTANTIS.utils import engine
+from ALTANTIS.utils.actions import OKAY_REACT
+from ALTANTIS.utils.consts import TICK
+from ALTANTIS.utils.engine import EngineError, RemoteCategory, RemoteChannel, call, submit, teams, resolve
+
+class Channel():
+    def __init__(self, id : int, name : str):
+        self.id = id
+        self.name = name
+        self.sent = []
+        self.reactions = []
+
+    async def send(self, content, file=None):
+        self.sent.append(content)
+
+    async def fetch_message(self, id : int):
+        return Message(self, id)
+
+class Message():
+    def __init__(self, channel : Channel, id : int):
+        self.channel = channel
+        self.id = id
+
+    async def add_reaction(self, emoji : str):
+        self.channel.reactions.append((self.id, emoji))
+
+class Client():
+    def __init__(self, channels):
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, id : int):
+        return self.channels.get(id)
+
+class Context():
+    def __init__(self, channel : Channel, message : int):
+        self.channel = channel
+        self.message = Message(channel, message)
+
+def test_requests_round_trip():
+    channels = [Channel(index, role) for (index, role) in enumerate(["captain", "engineer", "scientist"], 1)]
+    category = RemoteCategory("alpha", [RemoteChannel(channel.id, channel.name) for channel in channels])
+
+    async def talk():
+        engine.start_engine(Client(channels))
+        try:
+            assert await call(add_team, "alpha", category, 2, 3, "") is True
+            # Replies carry the teams, so the bot knows them without asking.
+            assert teams() == ["alpha"]
+
+            # Anything the engine sends arrives before its reply.
+            assert (await call(shout_at_team, "alpha", "Ahoy!")).react == OKAY_REACT.react
+            assert [channel.sent for channel in channels] == [["Ahoy!"]] * 3
+
+            # Commands react to the message they came from.
+            await submit(shout_at_team, Context(channels[0], 77), ["alpha", "Again!"], False, False)
+            assert channels[0].reactions == [(77, TICK)]
+
+            with pytest.raises(EngineError):
+                await call(resolve, "os", "getcwd")
+        finally:
+            engine.stop_engine()
+    asyncio.run(talk())
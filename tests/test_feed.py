@@ -0,0 +1,56 @@
+"""
+Tests the change feed's deltas (see ALTANTIS/utils/feed.py).
+"""
+
+import asyncio, json
+
+from ALTANTIS.subs.state import add_team, get_sub
+from ALTANTIS.utils import feed, snapshot
+from ALTANTIS.utils.games import Game, playing
+from ALTANTIS.world.world import get_square, bury_treasure_at
+
+class Category():
+    text_channels = []
+
+def listen() -> asyncio.Queue:
+    """
+    Subscribes to the current game's feed as if a client had connected.
+    """
+    live = feed.live_feed()
+    live.server = object()
+    live.last_view = feed.world_view()
+    queue : asyncio.Queue = asyncio.Queue()
+    live.clients.add(queue)
+    return queue
+
+def next_delta(queue : asyncio.Queue, turn : int):
+    # As at the end of a turn.
+    snapshot.publish()
+    asyncio.run(feed.publish_turn(turn))
+    event = queue.get_nowait().decode("utf-8")
+    assert event.startswith("event: delta\n")
+    return json.loads(event.split("data: ", 1)[1])["changes"]
+
+def test_deltas_only_report_what_changed():
+    with playing(Game(None)):
+        add_team("alpha", Category(), 1, 1, "")
+        get_square(3, 3).add_attribute("deposit")
+        queue = listen()
+
+        assert next_delta(queue, 1) == []
+
+        get_sub("alpha").movement.x = 2
+        bury_treasure_at("tool", (4, 4))
+        assert next_delta(queue, 2) == [
+            {"event": "move", "id": "sub:alpha", "x": 2, "y": 1},
+            {"event": "treasure", "x": 4, "y": 4, "treasure": ["tool"]}
+        ]
+
+        get_square(3, 3).remove_attribute("deposit")
+        assert next_delta(queue, 3) == [{"event": "attributes", "x": 3, "y": 3, "attributes": {}}]
+
+def test_weather_is_reported_once():
+    with playing(Game(None)):
+        queue = listen()
+        get_square(2, 2).add_attribute("weather", "stormy")
+        assert next_delta(queue, 1) == [{"event": "weather", "x": 2, "y": 2, "weather": "stormy"}]
@@ -0,0 +1,91 @@
+"""
+Tests that replaying the journal (see ALTANTIS/utils/journal.py) rebuilds the
+game exactly, even when commands arrive halfway through a turn.
+"""
+
+import asyncio, hashlib, json
+
+from ALTANTIS.game import perform_timestep, save_game, recover_game
+from ALTANTIS.subs.state import add_team, get_sub, state_to_dict
+from ALTANTIS.npcs.npc import npcs_to_json
+from ALTANTIS.world.world import map_to_dict
+from ALTANTIS.utils.games import Game, playing
+from ALTANTIS.utils.intents import submit
+from ALTANTIS.utils.journal import journalled, is_replaying
+from ALTANTIS.utils.timers import timer_handler, schedule
+
+class Channel():
+    def __init__(self, id : int, name : str):
+        self.id = id
+        self.name = name
+
+    async def send(self, content, file=None):
+        pass
+
+class Category():
+    def __init__(self, channels):
+        self.text_channels = channels
+
+class Client():
+    def __init__(self, channels):
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, id : int):
+        return self.channels.get(id)
+
+class Context():
+    def __init__(self):
+        self.message = self
+        self.reactions = []
+
+    async def send(self, content):
+        pass
+
+    async def add_reaction(self, reaction):
+        self.reactions.append(reaction)
+
+# Set while a turn waits partway through, until it's told to carry on.
+pauses = {}
+
+@timer_handler
+async def wait_on_discord(owner):
+    """
+    Stands in for anything in a turn that waits on Discord, before the subs
+    move.
+    """
+    if is_replaying():
+        return
+    pauses["reached"].set()
+    await pauses["resume"].wait()
+
+@journalled
+def steer(team : str, direction : str):
+    get_sub(team).movement.set_direction(direction)
+
+def state_hash() -> str:
+    state = {"subs": state_to_dict(), "npcs": npcs_to_json(), "map": map_to_dict()}
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+def test_recorded_run_replays_to_the_same_state():
+    channels = [Channel(index, role) for (index, role) in enumerate(["captain", "engineer", "scientist"])]
+    with playing(Game(35)):
+        add_team("alpha", Category(channels), 5, 5, "")
+        get_sub("alpha").power.activate(True)
+        schedule(get_sub("alpha").owner(), "wait_on_discord", 1, period=1, phase="npcs")
+        save_game()
+
+        async def play():
+            for direction in ["n", "e", "e", "s"] * 4:
+                pauses["reached"] = asyncio.Event()
+                pauses["resume"] = asyncio.Event()
+                turn = asyncio.create_task(perform_timestep())
+                await pauses["reached"].wait()
+                await submit(steer, Context(), ["alpha", direction], False, True)
+                pauses["resume"].set()
+                await turn
+        asyncio.run(play())
+        played = state_hash()
+        assert get_sub("alpha").movement.get_position() != (5, 5)
+
+        assert asyncio.run(recover_game(None, Client(channels)))
+        assert state_hash() == played
@@ -0,0 +1,72 @@
+"""
+Tests map uploads against a stand-in map server (see ALTANTIS/utils/maps.py).
+"""
+
+import asyncio
+
+import httpx
+
+from ALTANTIS.utils import maps
+
+DOMAIN = "http://maps.test"
+
+def use_server(handler):
+    """
+    Points the shared client at handler, and forgets every upload.
+    """
+    maps.uploaded.clear()
+    maps.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def test_unchanged_map_is_uploaded_once():
+    requests = []
+    def handler(request : httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"url": f"/map/{len(requests)}"})
+    use_server(handler)
+
+    async def upload_three():
+        first = await maps.upload_map("..\n.1\n", [{"x": 1, "y": 1, "name": "Alpha"}], DOMAIN)
+        again = await maps.upload_map("..\n.1\n", [{"x": 1, "y": 1, "name": "Alpha"}], DOMAIN)
+        changed = await maps.upload_map("..\n1.\n", [{"x": 0, "y": 1, "name": "Alpha"}], DOMAIN)
+        await maps.close_client()
+        return (first, again, changed)
+    (first, again, changed) = asyncio.run(upload_three())
+
+    assert first == again == f"{DOMAIN}/map/1"
+    assert changed == f"{DOMAIN}/map/2"
+    assert len(requests) == 2
+    assert all(request.url == f"{DOMAIN}/api/map/" for request in requests)
+
+def test_same_map_on_another_server_is_uploaded_again():
+    requests = []
+    def handler(request : httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"url": "/map/1"})
+    use_server(handler)
+
+    async def upload_twice():
+        here = await maps.upload_map("..\n", [], DOMAIN)
+        there = await maps.upload_map("..\n", [], "http://other.test")
+        await maps.close_client()
+        return (here, there)
+    (here, there) = asyncio.run(upload_twice())
+
+    assert here == f"{DOMAIN}/map/1"
+    assert there == "http://other.test/map/1"
+    assert len(requests) == 2
+
+def test_failed_upload_returns_none():
+    def refuse(request : httpx.Request) -> httpx.Response:
+        return httpx.Response(500)
+    def unreachable(request : httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("No map server.", request=request)
+
+    for handler in [refuse, unreachable]:
+        use_server(handler)
+        async def upload():
+            url = await maps.upload_map("..\n", [], DOMAIN)
+            await maps.close_client()
+            return url
+        assert asyncio.run(upload()) is None
+        # Failures aren't remembered, so the next try goes to the server.
+        assert not maps.uploaded
@@ -0,0 +1,76 @@
+"""
+Tests the columns creatures are kept in (see ALTANTIS/npcs/population.py),
+with NumPy if it's installed and always without.
+"""
+
+import pytest
+
+from ALTANTIS.npcs import population
+from ALTANTIS.npcs.population import Population, SPECIES, SPECIES_IDS, NEVER
+from ALTANTIS.utils.games import Game, playing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BACKENDS = [pytest.param(numpy, id="numpy", marks=pytest.mark.skipif(numpy is None, reason="NumPy isn't installed")),
+            pytest.param(None, id="lists")]
+
+CREATURES = [("squid", 1, 4, 4), ("shark", 2, 10, 3), ("jellyfish", 3, 0, 0), ("eel", 4, 7, 9), ("orca", 5, 12, 12)]
+
+def populate(turn : int = 0) -> Population:
+    creatures = Population()
+    for (classname, npcid, x, y) in CREATURES:
+        creatures.spawn(classname, npcid, x, y, None, turn)
+    return creatures
+
+@pytest.mark.parametrize("np", BACKENDS)
+def test_add_and_remove_keep_rows_in_step(np, monkeypatch):
+    monkeypatch.setattr(population, "np", np)
+    with playing(Game(None)):
+        creatures = populate()
+        creatures.remove(2)
+        creatures.remove(5)
+    assert creatures.size == 3
+    assert sorted(creatures.ids()) == [1, 3, 4]
+    assert 2 not in creatures and 4 in creatures
+    for (classname, npcid, x, y) in CREATURES:
+        if npcid in creatures:
+            assert creatures.species_of(npcid).classname == classname
+            assert (creatures.get(npcid, "x"), creatures.get(npcid, "y")) == (x, y)
+            assert creatures.get(npcid, "health") == SPECIES[SPECIES_IDS[classname]].health
+            assert creatures.to_dict(npcid, 0)["id"] == npcid
+
+@pytest.mark.parametrize("np", BACKENDS)
+def test_queries(np, monkeypatch):
+    monkeypatch.setattr(population, "np", np)
+    with playing(Game(None)):
+        creatures = populate()
+    creatures.set(4, "damage", 2)
+    creatures.set(1, "damage", 1)
+    assert sorted(creatures.damaged()) == [1, 4]
+
+    # Squid and orcas attack every four turns, eels every three, and
+    # jellyfish never.
+    assert creatures.attacking(3) == [4]
+    assert creatures.attacking(4) == [1, 2, 5]
+    assert creatures.attacking(5) == []
+    assert creatures.get(1, "next_attack") == 8
+    assert creatures.get(3, "next_attack") == NEVER
+
+    assert creatures.distances([1, 2, 5], [(4, 6), (12, 10)]) == [2, 6, 2]
+    assert creatures.distances([3], []) == [NEVER]
+
+def test_both_backends_agree(monkeypatch):
+    if numpy is None:
+        pytest.skip("NumPy isn't installed")
+    results = []
+    for np in [numpy, None]:
+        monkeypatch.setattr(population, "np", np)
+        with playing(Game(None)):
+            creatures = populate()
+        creatures.remove(3)
+        attacks = [creatures.attacking(turn) for turn in range(12)]
+        results.append((attacks, [creatures.to_dict(npcid, 12) for npcid in sorted(creatures.ids())]))
+    assert results[0] == results[1]
@@ -0,0 +1,76 @@
+"""
+Tests that splitting turns between region workers (see
+ALTANTIS/world/regions.py) gives exactly what the game would do by itself.
+"""
+
+import asyncio, hashlib, json
+
+from ALTANTIS.game import perform_timestep, save_game, recover_game
+from ALTANTIS.subs.state import add_team, get_sub, state_to_dict
+from ALTANTIS.npcs.npc import add_npc, npcs_to_json
+from ALTANTIS.world.world import get_square, map_to_dict
+from ALTANTIS.world import regions
+from ALTANTIS.utils.games import Game, playing
+from ALTANTIS.utils.intents import run
+from ALTANTIS.utils.journal import journalled
+
+class Channel():
+    def __init__(self, id : int, name : str):
+        self.id = id
+        self.name = name
+
+    async def send(self, content, file=None):
+        pass
+
+class Category():
+    def __init__(self, channels):
+        self.text_channels = channels
+
+class Client():
+    def __init__(self, channels):
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, id : int):
+        return self.channels.get(id)
+
+@journalled
+def reshape():
+    get_square(20, 15).remove_attribute("deposit")
+    get_square(21, 16).add_attribute("obstacle")
+    get_sub("sub2").movement.set_position(21, 15)
+
+def state_hash() -> str:
+    state = {"subs": state_to_dict(), "npcs": npcs_to_json(), "map": map_to_dict()}
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+def test_regions_match_a_single_process(monkeypatch):
+    channels = [Channel(index, role) for (index, role) in enumerate(["captain", "engineer", "scientist"])]
+    monkeypatch.setattr(regions, "REGION_WORKERS", 3)
+    with playing(Game(50)):
+        for x in range(0, 40, 3):
+            for y in range(0, 40, 2):
+                get_square(x, y).add_attribute(["deposit", "diverse", "ruins"][(x + y) % 3])
+                get_square(x, y).has_been_scanned("alpha", 5)
+        for y in range(10, 20):
+            get_square(14, y).add_attribute("obstacle")
+        for (index, x) in enumerate([6, 13, 20, 27, 33]):
+            add_team(f"sub{index}", Category(channels), x, 15, "")
+            for (species, offset) in [("shark", 2), ("eel", -1), ("squid", 0), ("orca", 3)]:
+                add_npc(species, x + offset, 15 + offset, None)
+        save_game()
+
+        async def play():
+            for turn in range(24):
+                if turn == 12:
+                    # Changes between turns reach the workers too.
+                    await run(reshape, None, [])
+                await perform_timestep()
+        try:
+            asyncio.run(play())
+        finally:
+            regions.stop_regions()
+        together = state_hash()
+        # Replaying the journal without workers does everything here.
+        monkeypatch.setattr(regions, "REGION_WORKERS", 0)
+        assert asyncio.run(recover_game(None, Client(channels)))
+        assert state_hash() == together
@@ -0,0 +1,71 @@
+"""
+Tests the per-entity random streams (see ALTANTIS/utils/rng.py).
+"""
+
+from ALTANTIS.utils.rng import stream, forget_streams
+from ALTANTIS.utils.journal import use_seed, set_turn, seeded
+from ALTANTIS.utils.games import Game, playing
+
+def rolls(owner, phase, *detail):
+    return [stream(owner, phase, *detail).random() for _ in range(5)]
+
+def test_streams_are_reproducible():
+    with playing(Game(None)):
+        use_seed(1234)
+        set_turn(7)
+        first = (rolls(("sub", "alpha"), "comms"), stream(("npc", 3), "npcs").choice(range(1000)))
+        forget_streams()
+        again = (rolls(("sub", "alpha"), "comms"), stream(("npc", 3), "npcs").choice(range(1000)))
+    with playing(Game(None)):
+        use_seed(1234)
+        set_turn(7)
+        elsewhere = (rolls(("sub", "alpha"), "comms"), stream(("npc", 3), "npcs").choice(range(1000)))
+    assert first == again == elsewhere
+
+def test_streams_are_independent():
+    with playing(Game(None)):
+        use_seed(99)
+        set_turn(1)
+        alone = rolls(("sub", "beta"), "puzzles")
+    with playing(Game(None)):
+        use_seed(99)
+        set_turn(1)
+        # Whoever rolls first doesn't change what anyone else rolls.
+        rolls(("sub", "alpha"), "puzzles")
+        rolls(("npc", 1), "puzzles")
+        after_others = rolls(("sub", "beta"), "puzzles")
+        other_phase = rolls(("sub", "beta"), "emergencies")
+        other_detail = rolls(("sub", "beta"), "puzzles", "captain")
+    assert after_others == alone
+    assert other_phase != alone
+    assert other_detail != alone
+
+def test_streams_carry_on_within_a_turn_and_change_with_it():
+    with playing(Game(None)):
+        use_seed(5)
+        set_turn(1)
+        both = rolls(("sub", "alpha"), "map") + rolls(("sub", "alpha"), "map")
+        forget_streams()
+        ten = [stream(("sub", "alpha"), "map").random() for _ in range(10)]
+        set_turn(2)
+        next_turn = rolls(("sub", "alpha"), "map")
+        use_seed(6)
+        set_turn(1)
+        other_seed = rolls(("sub", "alpha"), "map")
+    assert both == ten
+    assert next_turn != ten[:5]
+    assert other_seed != ten[:5]
+
+def test_commands_have_streams_of_their_own():
+    with playing(Game(None)):
+        use_seed(5)
+        set_turn(1)
+        before = rolls(("sub", "alpha"), "crane")
+        with seeded(42):
+            during = rolls(("sub", "alpha"), "crane")
+        after = rolls(("sub", "alpha"), "crane")
+        forget_streams()
+        whole_turn = [stream(("sub", "alpha"), "crane").random() for _ in range(10)]
+    assert during != before
+    # The command didn't use up any of the turn's stream.
+    assert before + after == whole_turn
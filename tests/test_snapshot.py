@@ -0,0 +1,56 @@
+"""
+Tests that snapshots (see ALTANTIS/utils/snapshot.py) only copy what changed.
+"""
+
+import asyncio
+
+from ALTANTIS.subs.state import add_team, get_sub
+from ALTANTIS.npcs.npc import add_npc
+from ALTANTIS.utils import snapshot
+from ALTANTIS.utils.games import Game, playing
+from ALTANTIS.utils.intents import run
+from ALTANTIS.world.world import get_square
+
+class Category():
+    text_channels = []
+
+def test_unchanged_entities_and_squares_are_shared():
+    with playing(Game(None)):
+        for index in range(3):
+            add_team(f"sub{index}", Category(), index, 0, "")
+            add_npc("mine", index, 5, None)
+        snapshot.publish()
+        before = snapshot.current()
+
+        def change():
+            get_sub("sub1").movement.x = 4
+            get_square(2, 2).add_attribute("deposit")
+        asyncio.run(run(change, None, []))
+        after = snapshot.current()
+
+    assert after is not before
+    assert after.state["sub1"] is not before.state["sub1"]
+    assert after.state["sub1"].movement.x == 4
+    assert before.state["sub1"].movement.x == 1
+    assert after.state["sub0"] is before.state["sub0"]
+    assert after.state["sub2"] is before.state["sub2"]
+    assert all(after.registry.npcs[npcid] is before.registry.npcs[npcid] for npcid in before.registry.npcs)
+
+    assert "deposit" in after.undersea_map[2][2].attributes
+    assert "deposit" not in before.undersea_map[2][2].attributes
+    assert after.undersea_map[2] is not before.undersea_map[2]
+    assert all(after.undersea_map[x] is before.undersea_map[x] for x in range(len(before.undersea_map)) if x != 2)
+
+def test_entities_handed_out_stay_changed_until_the_command_ends():
+    with playing(Game(None)):
+        add_team("alpha", Category(), 0, 0, "")
+        snapshot.publish()
+
+        async def slow_change():
+            sub = get_sub("alpha")
+            await asyncio.sleep(0)
+            # Someone else published while we were waiting.
+            snapshot.publish()
+            sub.movement.x = 3
+        asyncio.run(run(slow_change, None, []))
+        assert snapshot.current().state["alpha"].movement.x == 3
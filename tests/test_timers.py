@@ -0,0 +1,59 @@
+"""
+Tests the timer wheel (see ALTANTIS/utils/timers.py).
+"""
+
+import asyncio
+
+from ALTANTIS.utils.timers import TimerWheel, timer_handler, SLOTS
+
+fired = []
+
+@timer_handler
+def note(owner, label):
+    fired.append((owner, label))
+
+def run_turns(wheel : TimerWheel, turns : int, phases = ["subs"]):
+    """
+    Advances the wheel turns times, and gives back what fired on each turn.
+    """
+    async def run():
+        by_turn = {}
+        for _ in range(turns):
+            wheel.advance()
+            for phase in phases:
+                await wheel.fire(phase)
+            if fired:
+                by_turn[wheel.now] = list(fired)
+                fired.clear()
+        return by_turn
+    return asyncio.run(run())
+
+def test_timers_cascade_down_to_fire_on_their_turn():
+    wheel = TimerWheel()
+    delays = [1, 2, SLOTS - 1, SLOTS, SLOTS + 1, 3 * SLOTS + 5, SLOTS * SLOTS - 1, SLOTS * SLOTS, SLOTS * SLOTS + 7, 2 * SLOTS * SLOTS + 3]
+    # Starting partway through the wheel's slots, so cascades don't line up.
+    run_turns(wheel, 10)
+    for delay in delays:
+        wheel.schedule(("sub", "alpha"), "note", delay, [delay])
+    by_turn = run_turns(wheel, max(delays) + 1)
+    assert by_turn == {10 + delay: [(("sub", "alpha"), delay)] for delay in delays}
+
+def test_due_timers_fire_by_owner_then_order():
+    wheel = TimerWheel()
+    wheel.schedule(("sub", "beta"), "note", 3, ["beta first"])
+    wheel.schedule(("npc", 2), "note", 3, ["npc 2"], phase="npcs")
+    wheel.schedule(("sub", "alpha"), "note", 3, ["alpha first"])
+    wheel.schedule(("sub", "beta"), "note", 3, ["beta second"])
+    wheel.schedule(("npc", 1), "note", 3, ["npc 1"], phase="npcs")
+    wheel.schedule(("sub", "alpha"), "note", 3, ["alpha second"])
+    by_turn = run_turns(wheel, 3, ["npcs", "subs"])
+    assert [label for (_, label) in by_turn[3]] == ["npc 1", "npc 2", "alpha first", "alpha second", "beta first", "beta second"]
+
+def test_periodic_timers_repeat_until_cancelled():
+    wheel = TimerWheel()
+    timer = wheel.schedule(("sub", "alpha"), "note", 2, ["tick"], period=SLOTS + 1)
+    by_turn = run_turns(wheel, 3 * SLOTS)
+    assert sorted(by_turn) == [2, SLOTS + 3, 2 * SLOTS + 4]
+    wheel.cancel(timer)
+    assert run_turns(wheel, 2 * SLOTS) == {}
+    assert wheel.timers_of(("sub", "alpha")) == []